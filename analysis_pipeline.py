@@ -0,0 +1,163 @@
+import base64
+import io
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Constant values
+ANALYSIS_WORKERS = 2
+DELIVERY_INTERVAL_MS = 100
+FIGURE_DPI = 100
+
+
+class AnalysisCancelled(Exception):
+    """
+    Raised inside a worker when its analysis request has been superseded by a newer one.
+    """
+
+
+class AnalysisPipeline:
+    """
+    Class representing the asynchronous pipeline of the manager Analysis tab.
+    Sales queries and chart rendering run in a worker pool. Progress and results come back to the Tk main thread
+    through window.after. A new request supersedes the running one, whose result is never shown.
+    """
+    def __init__(self, window, max_workers=ANALYSIS_WORKERS):
+        """
+        Initialize an analysis pipeline instance.
+        :param window: (obj) Expects a tkinter window instance that schedules the callbacks.
+        :param max_workers: (int) Number of worker threads.
+        """
+        self.window = window
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Analysis")
+        self.generation = 0
+        self.future = None
+        self.callbacks = None
+        self._messages = queue.Queue()
+        self._lock = threading.Lock()
+        self._after_id = None
+
+    def submit(self, analysis_type, width, height, on_progress, on_result, on_error, start=None, end=None,
+               include_archives=False):
+        """
+        Starts an analysis and cancels the previous one.
+        :param analysis_type: (str) One of the analysis types of the Analysis tab.
+        :param width: (int) Width of the chart in pixels.
+        :param height: (int) Height of the chart in pixels.
+        :param on_progress: (callable) Called with a progress message.
+        :param on_result: (callable) Called with ("text", str) or ("image", base64 PNG data).
+        :param on_error: (callable) Called with the exception of a failed analysis.
+        :param start: (str) First date of the analysed orders as 'YYYY-MM-DD'. None starts at the oldest order.
+        :param end: (str) Last date of the analysed orders as 'YYYY-MM-DD'. None ends at the newest order.
+        :param include_archives: (bool) Unions the archived finished orders into the analysis.
+        :return: (int) Generation number of the request.
+        """
+        self.cancel()
+        with self._lock:
+            self.generation += 1
+            generation = self.generation
+        self.callbacks = (generation, on_progress, on_result, on_error)
+        self.future = self.executor.submit(self._run, generation, analysis_type, width, height, start, end,
+                                           include_archives)
+        if self._after_id is None:
+            self._after_id = self.window.after(DELIVERY_INTERVAL_MS, self._deliver)
+        return generation
+
+    def cancel(self):
+        """
+        Cancels the current request. A request that is already running stops at its next stage.
+        :return: None
+        """
+        with self._lock:
+            self.generation += 1
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+
+    def shutdown(self):
+        """
+        Cancels the current request and stops the worker pool.
+        :return: None
+        """
+        self.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self._after_id is not None:
+            try:
+                self.window.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _check(self, generation):
+        """
+        Stops a worker whose request has been superseded.
+        :param generation: (int) Generation number of the request.
+        :return: None
+        """
+        if generation != self.generation:
+            raise AnalysisCancelled()
+
+    def _post(self, generation, kind, payload):
+        """
+        Queues a message for the main thread.
+        :return: None
+        """
+        self._messages.put((generation, kind, payload))
+
+    def _run(self, generation, analysis_type, width, height, start=None, end=None, include_archives=False):
+        """
+        Worker side of a request: runs the queries, renders the chart to PNG and queues the result.
+        :return: None
+        """
+        sales_data = None
+        try:
+            from analytics import SalesData
+
+            self._check(generation)
+            self._post(generation, "progress", "Loading sales data...")
+            sales_data = SalesData(include_archives=include_archives)
+            kind, result = sales_data.build_analysis(analysis_type, start, end)
+            self._check(generation)
+            if kind == "figure":
+                from analytics import FigureCanvasAgg
+
+                self._post(generation, "progress", "Rendering chart...")
+                result.set_dpi(FIGURE_DPI)
+                result.set_size_inches(max(width, 200) / FIGURE_DPI, max(height, 150) / FIGURE_DPI)
+                result.tight_layout()
+                buffer = io.BytesIO()
+                # print_png renders at the dpi of the figure, it takes no dpi argument
+                FigureCanvasAgg(result).print_png(buffer)
+                kind, result = "image", base64.b64encode(buffer.getvalue()).decode("ascii")
+            self._check(generation)
+            self._post(generation, "result", (kind, result))
+        except AnalysisCancelled:
+            pass
+        except Exception as e:
+            self._post(generation, "error", e)
+        finally:
+            if sales_data is not None:
+                sales_data.close_connection()
+
+    def _deliver(self):
+        """
+        Main thread callback. Hands the messages of the current request to its callbacks and drops the others.
+        :return: None
+        """
+        self._after_id = None
+        while True:
+            try:
+                generation, kind, payload = self._messages.get_nowait()
+            except queue.Empty:
+                break
+            if self.callbacks is None or generation != self.generation or generation != self.callbacks[0]:
+                continue
+            _, on_progress, on_result, on_error = self.callbacks
+            if kind == "progress":
+                on_progress(payload)
+            elif kind == "result":
+                on_result(*payload)
+            else:
+                on_error(payload)
+        if self.future is not None and not (self.future.done() and self._messages.empty()):
+            self._after_id = self.window.after(DELIVERY_INTERVAL_MS, self._deliver)
@@ -0,0 +1,76 @@
+import importlib
+import threading
+from datetime import date, timedelta
+
+# Constant values
+KITCHEN_ANALYSIS_TYPES = ["Prep Times by Hour", "Prep Times by Product"]
+ANALYSIS_TYPES = ["Monthly Sales Summary", "Daily Sales", "Weekly Sales", "Monthly Sales",
+                  "Customer Segments", "Customer Segments Plot", "Top Sellers", "Menu Engineering", "Category Sales",
+                  *KITCHEN_ANALYSIS_TYPES, "Profiling Stats"]
+# Date ranges of the Analysis tab and their length in days (None for the whole history)
+ANALYSIS_RANGES = {"Last 30 Days": 30, "Last 90 Days": 90, "Last 365 Days": 365, "All Time": None}
+# Names served by the facade and the module that defines them. Importing one of them loads pandas and matplotlib.
+LAZY_NAMES = {
+    "SalesData": "dashboard",
+    "KitchenAnalytics": "kitchen_analytics",
+    "Figure": "matplotlib.figure",
+    "FigureCanvasAgg": "matplotlib.backends.backend_agg",
+    "FigureCanvasTkAgg": "matplotlib.backends.backend_tkagg",
+}
+# Modules imported by the warm-up thread, the ones the Analysis tab needs for its first chart
+WARM_UP_MODULES = ("dashboard", "kitchen_analytics", "matplotlib.backends.backend_agg")
+
+_warm_up_thread = None
+_warm_up_lock = threading.Lock()
+
+
+def date_range_bounds(range_name, today=None):
+    """
+    Returns the first and last dates of an Analysis tab date range.
+    :param range_name: (str) One of ANALYSIS_RANGES.
+    :param today: (obj) datetime.date of today.
+    :return: (tuple) 'YYYY-MM-DD' strings, (None, None) for all time.
+    """
+    days = ANALYSIS_RANGES[range_name]
+    if days is None:
+        return None, None
+    today = today or date.today()
+    return (today - timedelta(days=days - 1)).isoformat(), today.isoformat()
+
+
+def __getattr__(name):
+    """
+    Loads the analytics stack the first time one of the LAZY_NAMES is used, so the waiter and chef terminals never
+    import pandas and matplotlib.
+    """
+    if name not in LAZY_NAMES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(LAZY_NAMES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def warm_up():
+    """
+    Imports the analytics stack on a daemon thread, so the first analysis of the manager does not wait for it.
+    Calling it again while the thread runs or after it has finished does nothing.
+    :return: (obj) The warm-up threading.Thread
+    """
+    global _warm_up_thread
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=_import_modules, name="AnalyticsWarmUp", daemon=True)
+            _warm_up_thread.start()
+        return _warm_up_thread
+
+
+def _import_modules():
+    """
+    Target of the warm-up thread. An import error is raised again by the analysis that needs the module.
+    :return: None
+    """
+    for module_name in WARM_UP_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            return
@@ -0,0 +1,346 @@
+import glob
+import os
+import sqlite3
+from datetime import date, datetime, timedelta
+from database import get_connection, release_connection, get_pool
+from schema import ensure_schema, bump_data_version
+from error_handling import get_logger, configure_logging
+
+# Constant values
+ARCHIVE_DIR = "archives"
+ARCHIVE_HORIZON_DAYS = 180
+# Horizon in days of the archive pass run when a terminal starts. Unset, the terminals never archive and the pass is
+# run on demand with python archive.py
+ARCHIVE_ON_STARTUP_ENV = "CRAZY_PIZZA_ARCHIVE_DAYS"
+ARCHIVE_PARTITION = "year"
+ARCHIVE_PARTITION_FORMATS = {"month": "%Y-%m", "year": "%Y"}
+# SQLite attaches at most 10 databases to a connection by default. The last slot is kept for the older archives,
+# which are attached one at a time and copied into temporary tables
+MAX_ATTACHED_ARCHIVES = 8
+OVERFLOW_ARCHIVE = "archive_overflow"
+# Union views of the hot and the archived rows, created by attach_archives
+ARCHIVE_VIEWS = {"finished_orders": "all_finished_orders", "order_details": "all_order_details"}
+# Column indexed in the archive copy of each table
+ARCHIVE_INDEXES = {"finished_orders": "order_taken_at", "order_details": "order_id"}
+
+logger = get_logger("archive")
+
+
+def archive_dir_path(archive_dir=None):
+    """
+    Returns the directory of the archive databases, next to the database of the shared connection pool by default.
+    :param archive_dir: (str) Directory path. None uses ARCHIVE_DIR.
+    :return: (str) Directory path.
+    """
+    if archive_dir is not None:
+        return archive_dir
+    return os.path.join(os.path.dirname(os.path.abspath(get_pool().db_path)), ARCHIVE_DIR)
+
+
+def list_archives(archive_dir=None):
+    """
+    Returns the archive database files, oldest first.
+    :param archive_dir: (str) Directory of the archives.
+    :return: (list) File paths.
+    """
+    return sorted(glob.glob(os.path.join(archive_dir_path(archive_dir), "pizza_restaurant_*.db")))
+
+
+def table_columns(cursor, table_name, schema_name='main'):
+    """
+    Returns the column names of a table in the given database schema.
+    :param cursor: (obj) sqlite3 cursor
+    :param table_name: (str) Name of the table.
+    :param schema_name: (str) 'main' or the name of an attached database.
+    :return: (list) Column names in table order.
+    """
+    return [row[1] for row in cursor.execute(f'PRAGMA {schema_name}.table_info({table_name})')]
+
+
+def create_archive_table(cursor, table_name, schema_name='archive'):
+    """
+    Creates the archive copy of a hot table in an attached database, and adds the columns that were added to the hot
+    table after the archive was created.
+    :param cursor: (obj) sqlite3 cursor
+    :param table_name: (str) Name of the hot table.
+    :param schema_name: (str) Name of the attached archive database.
+    :return: None
+    """
+    columns = cursor.execute(f'PRAGMA main.table_info({table_name})').fetchall()
+    definitions = ', '.join(f"{name} {column_type}{' PRIMARY KEY' if pk else ''}"
+                            for _, name, column_type, _, _, pk in columns)
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {schema_name}.{table_name} ({definitions})')
+    archived_columns = set(table_columns(cursor, table_name, schema_name))
+    for _, name, column_type, _, _, _ in columns:
+        if name not in archived_columns:
+            cursor.execute(f'ALTER TABLE {schema_name}.{table_name} ADD COLUMN {name} {column_type}')
+    column_name = ARCHIVE_INDEXES[table_name]
+    cursor.execute(f'''CREATE INDEX IF NOT EXISTS {schema_name}.idx_{table_name}_{column_name}
+                       ON {table_name} ({column_name})''')
+
+
+def archive_select(cursor, table_name, schema_name, columns):
+    """
+    Returns the SELECT of the rows of an archived table with the columns of the hot table, NULL for the columns the
+    archive does not have yet.
+    :param cursor: (obj) sqlite3 cursor
+    :param table_name: (str) Name of the hot table.
+    :param schema_name: (str) Name of the attached archive database.
+    :param columns: (list) Column names of the hot table.
+    :return: (str) SQL, None if the archive has no such table.
+    """
+    archived_columns = set(table_columns(cursor, table_name, schema_name))
+    if not archived_columns:
+        return None
+    return (f"SELECT {', '.join(c if c in archived_columns else 'NULL' for c in columns)} "
+            f"FROM {schema_name}.{table_name}")
+
+
+def copy_overflow_archives(cursor, archives):
+    """
+    Copies the rows of the archives that do not fit in the attached databases into temporary tables, attaching them
+    one at a time.
+    :param cursor: (obj) sqlite3 cursor
+    :param archives: (list) Archive file paths.
+    :return: None
+    """
+    for table_name in ARCHIVE_VIEWS:
+        columns = table_columns(cursor, table_name)
+        cursor.execute(f'DROP TABLE IF EXISTS temp.archived_{table_name}')
+        cursor.execute(f"CREATE TEMP TABLE archived_{table_name} AS SELECT {', '.join(columns)} "
+                       f"FROM main.{table_name} WHERE 0")
+    for path in archives:
+        cursor.execute(f'ATTACH DATABASE ? AS {OVERFLOW_ARCHIVE}', (path,))
+        try:
+            for table_name in ARCHIVE_VIEWS:
+                select = archive_select(cursor, table_name, OVERFLOW_ARCHIVE, table_columns(cursor, table_name))
+                if select is not None:
+                    cursor.execute(f'INSERT INTO temp.archived_{table_name} {select}')
+            # An archive cannot be detached while the transaction of the INSERT is open
+            cursor.connection.commit()
+        except sqlite3.Error:
+            cursor.connection.rollback()
+            raise
+        finally:
+            cursor.execute(f'DETACH DATABASE {OVERFLOW_ARCHIVE}')
+
+
+def attach_archives(conn, archive_dir=None):
+    """
+    Attaches the archive databases and creates the temporary all_finished_orders and all_order_details views, which
+    union the hot tables with every archive. Live screens keep reading the hot tables only.
+    Beyond MAX_ATTACHED_ARCHIVES - 1 archives, the oldest ones are copied into temporary tables instead.
+    :param conn: (obj) sqlite3 connection
+    :param archive_dir: (str) Directory of the archives.
+    :return: (list) Names of the attached archive databases.
+    """
+    archives = list_archives(archive_dir)
+    overflow = max(len(archives) - (MAX_ATTACHED_ARCHIVES - 1), 0)
+    cursor = conn.cursor()
+    if overflow:
+        copy_overflow_archives(cursor, archives[:overflow])
+    attached = {row[1] for row in cursor.execute('PRAGMA database_list')}
+    names = []
+    for number, path in enumerate(archives[overflow:], start=overflow):
+        name = f"archive_{number}"
+        if name not in attached:
+            cursor.execute(f'ATTACH DATABASE ? AS {name}', (path,))
+        names.append(name)
+
+    for table_name, view_name in ARCHIVE_VIEWS.items():
+        columns = table_columns(cursor, table_name)
+        selects = [f"SELECT {', '.join(columns)} FROM main.{table_name}"]
+        if overflow:
+            selects.append(f"SELECT {', '.join(columns)} FROM temp.archived_{table_name}")
+        for name in names:
+            select = archive_select(cursor, table_name, name, columns)
+            if select is not None:
+                selects.append(select)
+        cursor.execute(f'DROP VIEW IF EXISTS temp.{view_name}')
+        cursor.execute(f'CREATE TEMP VIEW {view_name} AS {" UNION ALL ".join(selects)}')
+    return names
+
+
+def detach_archives(conn, names):
+    """
+    Drops the union views and detaches the archive databases attached by attach_archives.
+    :param conn: (obj) sqlite3 connection
+    :param names: (list) Names returned by attach_archives.
+    :return: None
+    """
+    for table_name, view_name in ARCHIVE_VIEWS.items():
+        conn.execute(f'DROP VIEW IF EXISTS temp.{view_name}')
+        conn.execute(f'DROP TABLE IF EXISTS temp.archived_{table_name}')
+    for name in names:
+        conn.execute(f'DETACH DATABASE {name}')
+
+
+class OrderArchive:
+    """
+    Class representing the archive of the old finished orders.
+    Finished orders taken before the horizon are moved with their order details into one archive database per month
+    or year, so the hot database and the finished orders screen stay bounded. The sales rollups keep their totals.
+    """
+    def __init__(self, archive_dir=None, horizon_days=ARCHIVE_HORIZON_DAYS, partition=ARCHIVE_PARTITION):
+        """
+        Initialize an order archive instance.
+        :param archive_dir: (str) Directory of the archive databases.
+        :param horizon_days: (int) Finished orders older than this number of days are archived.
+        :param partition: (str) 'month' or 'year', the period each archive database holds.
+        """
+        if partition not in ARCHIVE_PARTITION_FORMATS:
+            raise ValueError(f"Unknown archive partition: {partition}")
+        if horizon_days < 1:
+            raise ValueError("Archive horizon must be at least 1 day")
+        self.archive_dir = archive_dir_path(archive_dir)
+        self.horizon_days = horizon_days
+        self.partition = partition
+        ensure_schema()
+        self.conn = get_connection()
+        self.cursor = self.conn.cursor()
+
+    def archive_path(self, partition_key):
+        """
+        Returns the path of the archive database of a partition.
+        :param partition_key: (str) 'YYYY' or 'YYYY-MM'
+        :return: (str) File path.
+        """
+        return os.path.join(self.archive_dir, f"pizza_restaurant_{partition_key}.db")
+
+    def cutoff(self, today=None):
+        """
+        Returns the first epoch second that is kept in the hot database.
+        :param today: (obj) datetime.date of today.
+        :return: (int) Local midnight of the horizon day as epoch seconds.
+        """
+        horizon = (today or date.today()) - timedelta(days=self.horizon_days)
+        return int(datetime.combine(horizon, datetime.min.time()).timestamp())
+
+    def archive_orders(self, today=None):
+        """
+        Moves the finished orders taken before the horizon into their archive databases.
+        :param today: (obj) datetime.date of today.
+        :return: (int) Number of archived orders.
+        """
+        cutoff = self.cutoff(today)
+        partition_format = ARCHIVE_PARTITION_FORMATS[self.partition]
+        partitions = [row[0] for row in self.cursor.execute(
+            'SELECT DISTINCT strftime(?, order_taken_at, \'unixepoch\', \'localtime\') FROM finished_orders '
+            'WHERE order_taken_at < ?', (partition_format, cutoff)).fetchall()]
+        archived = 0
+        for partition_key in partitions:
+            archived += self.archive_partition(partition_key, cutoff)
+        if archived:
+            logger.info("%d finished orders archived to %s", archived, self.archive_dir)
+        return archived
+
+    def archive_partition(self, partition_key, cutoff):
+        """
+        Moves the finished orders of one partition taken before the cutoff into the archive database of the partition.
+        SQLite does not commit a transaction across attached databases atomically in WAL mode, so the move takes two
+        transactions. The rows are first copied with INSERT OR IGNORE and committed to the archive. Then only the
+        orders found in the archive are deleted from the hot database, in a transaction that also bumps the sales data
+        version so the dashboard caches built on the moved orders are refreshed. A move interrupted between the two
+        leaves the orders in both databases, and the next run deletes them without copying them twice.
+        :param partition_key: (str) 'YYYY' or 'YYYY-MM'
+        :param cutoff: (int) First epoch second kept in the hot database.
+        :return: (int) Number of archived orders.
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        self.cursor.execute('ATTACH DATABASE ? AS archive', (self.archive_path(partition_key),))
+        try:
+            self.copy_partition(partition_key, cutoff)
+            return self.delete_archived_orders()
+        finally:
+            self.cursor.execute('DROP TABLE IF EXISTS temp.archived_order_ids')
+            self.cursor.execute('DETACH DATABASE archive')
+
+    def copy_partition(self, partition_key, cutoff):
+        """
+        Copies the finished orders of one partition taken before the cutoff and their details into the attached
+        archive database, and commits the copy. The ids of the copied orders are kept in temp.archived_order_ids.
+        :param partition_key: (str) 'YYYY' or 'YYYY-MM'
+        :param cutoff: (int) First epoch second kept in the hot database.
+        :return: None
+        """
+        partition_format = ARCHIVE_PARTITION_FORMATS[self.partition]
+        try:
+            self.cursor.execute('BEGIN IMMEDIATE')
+            self.cursor.execute('DROP TABLE IF EXISTS temp.archived_order_ids')
+            self.cursor.execute('''CREATE TEMP TABLE archived_order_ids AS
+                                   SELECT id FROM main.finished_orders
+                                   WHERE order_taken_at < ?
+                                   AND strftime(?, order_taken_at, 'unixepoch', 'localtime') = ?''',
+                                (cutoff, partition_format, partition_key))
+            for table_name, key in (('finished_orders', 'id'), ('order_details', 'order_id')):
+                create_archive_table(self.cursor, table_name)
+                columns = ', '.join(table_columns(self.cursor, table_name))
+                self.cursor.execute(f'''INSERT OR IGNORE INTO archive.{table_name} ({columns})
+                                        SELECT {columns} FROM main.{table_name}
+                                        WHERE {key} IN (SELECT id FROM temp.archived_order_ids)''')
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+    def delete_archived_orders(self):
+        """
+        Deletes from the hot database the orders of temp.archived_order_ids that are in the archive database, and
+        bumps the sales data version in the same transaction.
+        :return: (int) Number of deleted orders.
+        """
+        try:
+            self.cursor.execute('BEGIN IMMEDIATE')
+            self.cursor.execute('''DELETE FROM temp.archived_order_ids
+                                   WHERE id NOT IN (SELECT id FROM archive.finished_orders)''')
+            self.cursor.execute('''DELETE FROM main.order_details
+                                   WHERE order_id IN (SELECT id FROM temp.archived_order_ids)''')
+            self.cursor.execute('''DELETE FROM main.finished_orders
+                                   WHERE id IN (SELECT id FROM temp.archived_order_ids)''')
+            archived = self.cursor.rowcount
+            if archived:
+                bump_data_version(self.cursor)
+            self.conn.commit()
+            return archived
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+    def close_connection(self):
+        """
+        Gives the database connection back to the connection pool.
+        :return: None
+        """
+        release_connection(self.conn)
+
+
+def archive_from_environment():
+    """
+    Runs the archive pass when CRAZY_PIZZA_ARCHIVE_DAYS sets its horizon, so a deployment chooses the terminal that
+    archives at startup instead of every terminal doing it.
+    :return: (int) Number of archived orders.
+    """
+    horizon_days = os.environ.get(ARCHIVE_ON_STARTUP_ENV)
+    if not horizon_days:
+        return 0
+    order_archive = OrderArchive(horizon_days=int(horizon_days))
+    try:
+        return order_archive.archive_orders()
+    finally:
+        order_archive.close_connection()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crazy Pizza finished orders archive")
+    parser.add_argument("--horizon-days", type=int, default=ARCHIVE_HORIZON_DAYS,
+                        help="archive the finished orders older than this number of days")
+    parser.add_argument("--partition", choices=sorted(ARCHIVE_PARTITION_FORMATS), default=ARCHIVE_PARTITION,
+                        help="period held by each archive database")
+    parser.add_argument("--archive-dir", help="directory of the archive databases")
+    args = parser.parse_args()
+    configure_logging()
+    order_archive = OrderArchive(args.archive_dir, args.horizon_days, args.partition)
+    order_archive.archive_orders()
+    order_archive.close_connection()
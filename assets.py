@@ -0,0 +1,97 @@
+import os
+import threading
+import tkinter as tk
+from weakref import WeakKeyDictionary, ref
+
+# Constant values
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+ASSET_FILES = {
+    "logo": "crazy_logo.png",
+    "manager_logo": "crazy_manager_logo.png",
+    "waiter_logo": "crazy_waiter_logo.png",
+    "chef_logo": "crazy_chef_logo.png",
+    "error": "crazy_error_logo.png",
+    "info": "crazy_showinfo_logo.png",
+    "askyesno": "crazy_askyesno_logo.png",
+}
+
+_registries = WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+
+class AssetRegistry:
+    """
+    Class representing the decoded images of one Tk root.
+    Each image file is decoded once, and every widget that shows it gets the same PhotoImage. The registry keeps the
+    references, so the images are not garbage collected while a canvas or label still shows them.
+    """
+    def __init__(self, root, asset_dir=ASSET_DIR):
+        """
+        Initialize an asset registry instance.
+        :param root: (obj) Expects the tkinter Tk instance the images belong to.
+        :param asset_dir: (str) Directory of the image files.
+        """
+        # A strong reference would keep the root, the key of the registry in _registries, alive forever
+        self._root = ref(root)
+        self.asset_dir = asset_dir
+        self._images = {}
+
+    def get(self, name):
+        """
+        Returns the decoded image of an asset, decoding it on first use.
+        :param name: (str) One of ASSET_FILES.
+        :return: (obj) tkinter PhotoImage
+        """
+        image = self._images.get(name)
+        if image is None:
+            if name not in ASSET_FILES:
+                raise ValueError(f"Unknown image asset: {name}")
+            root = self._root()
+            if root is None:
+                raise RuntimeError("The Tk root of the asset registry no longer exists")
+            image = tk.PhotoImage(master=root, file=os.path.join(self.asset_dir, ASSET_FILES[name]))
+            self._images[name] = image
+        return image
+
+    def preload(self, names=None):
+        """
+        Decodes the assets ahead of time, so the first popup or menu does not read the disk.
+        :param names: (iterable) Asset names. None preloads every asset.
+        :return: None
+        """
+        for name in ASSET_FILES if names is None else names:
+            self.get(name)
+
+
+def get_assets(widget):
+    """
+    Returns the asset registry of the Tk root of a widget, creating it if needed.
+    :param widget: (obj) Any tkinter widget, or the Tk root itself.
+    :return: (obj) AssetRegistry instance
+    """
+    root = widget._root()
+    with _registries_lock:
+        registry = _registries.get(root)
+        if registry is None:
+            registry = _registries[root] = AssetRegistry(root)
+        return registry
+
+
+def get_image(widget, name):
+    """
+    Returns the shared decoded image of an asset for the Tk root of a widget.
+    :param widget: (obj) Any tkinter widget.
+    :param name: (str) One of ASSET_FILES.
+    :return: (obj) tkinter PhotoImage
+    """
+    return get_assets(widget).get(name)
+
+
+def preload_assets(widget, names=None):
+    """
+    Decodes the assets of the Tk root of a widget ahead of time.
+    :param widget: (obj) Any tkinter widget.
+    :param names: (iterable) Asset names. None preloads every asset.
+    :return: None
+    """
+    get_assets(widget).preload(names)
@@ -0,0 +1,191 @@
+"""
+Benchmarks for the restaurant management system.
+Every benchmark runs against a throwaway database, so the production database is never touched.
+Usage: python benchmarks.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import database
+
+
+def best_time(func, repeat=5):
+    """
+    Runs a function several times and returns the fastest run.
+    :param func: (callable) Function without parameters.
+    :param repeat: (int) Number of runs.
+    :return: (float) Fastest run time in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def use_temp_database():
+    """
+    Points the shared connection pool at a new empty database in a temporary directory.
+    :return: (str) Path of the temporary database.
+    """
+    db_path = os.path.join(tempfile.mkdtemp(prefix="pizza_bench_"), "pizza_restaurant.db")
+    database.configure_pool(db_path)
+    return db_path
+
+
+def seed_orders(order_count, items_per_order=3):
+    """
+    Fills the active_orders table with orders placed by temporary customers.
+    :param order_count: (int) Number of orders to insert.
+    :param items_per_order: (int) Number of order_details rows per order.
+    :return: None
+    """
+    from customers import Customers
+    from orders import ActiveOrders
+
+    customers = Customers()
+    active_orders = ActiveOrders()
+    conn = active_orders.conn
+    customer_ids = [customers.add_temp_customer(i % 30 + 1, "Guest", str(i)) for i in range(order_count)]
+    conn.executemany('''INSERT INTO active_orders (temp_customer_id, total_price, order_taken_date, order_taken_hour)
+                        VALUES (?, 20, '2024-01-01', '12:00:00')''', [(customer_id,) for customer_id in customer_ids])
+    order_ids = [row[0] for row in conn.execute('SELECT id FROM active_orders')]
+    conn.executemany('''INSERT INTO order_details (order_id, item_id, item_type, item_name, quantity)
+                        VALUES (?, ?, 0, 'Margherita', 1)''',
+                     [(order_id, item) for order_id in order_ids for item in range(items_per_order)])
+    conn.commit()
+
+
+def benchmark_order_listing(order_counts=(100, 500, 2000)):
+    """
+    Compares refreshing the active orders view with one get_table_no query per row against the joined listing query.
+    :param order_counts: (iterable) Order counts to measure.
+    :return: None
+    """
+    from customers import Customers
+    from orders import ActiveOrders
+
+    print("Active orders refresh")
+    print(f"{'orders':>8} {'per-row lookup ms':>18} {'joined ms':>10} {'joined us/row':>14}")
+    for order_count in order_counts:
+        use_temp_database()
+        seed_orders(order_count)
+        customers = Customers()
+        active_orders = ActiveOrders()
+
+        def per_row_lookup():
+            rows = active_orders.cursor.execute('''
+                SELECT o.id, o.temp_customer_id, o.total_price, o.order_taken_date, o.order_taken_hour,
+                       GROUP_CONCAT(od.item_name || ' (' || od.quantity || ')', ', ')
+                FROM active_orders AS o
+                JOIN order_details AS od ON o.id = od.order_id
+                GROUP BY o.id''').fetchall()
+            return [(row[0], customers.get_table_no(row[1])) + row[2:] for row in rows]
+
+        lookup_time = best_time(per_row_lookup)
+        joined_time = best_time(active_orders.get_active_orders)
+        print(f"{order_count:>8} {lookup_time * 1000:>18.2f} {joined_time * 1000:>10.2f} "
+              f"{joined_time / order_count * 1e6:>14.2f}")
+
+
+def benchmark_take_order(item_counts=(1, 10, 40)):
+    """
+    Measures the submission time of an order for growing ticket sizes.
+    :param item_counts: (iterable) Numbers of items on the ticket.
+    :return: None
+    """
+    from customers import Customers
+    from orders import ActiveOrders
+    from products import Pizza
+
+    use_temp_database()
+    pizzas = Pizza()
+    for i in range(max(item_counts)):
+        pizzas.add_product(f"Pizza {i}", 10 + i, "")
+    customer_id = Customers().add_temp_customer(1, "Guest", "Bench")
+    active_orders = ActiveOrders()
+    products = pizzas.list_products()
+
+    print("Order submission")
+    print(f"{'items':>8} {'ms':>10}")
+    for item_count in item_counts:
+        items = [(product[0], product[1], product[2], product[3], 1) for product in products[:item_count]]
+        elapsed = best_time(lambda: active_orders.take_order(0, customer_id, items, 0))
+        print(f"{item_count:>8} {elapsed * 1000:>10.2f}")
+
+
+def benchmark_kitchen_analytics(order_count=100000):
+    """
+    Measures the preparation time percentiles on a year of finished orders.
+    :param order_count: (int) Number of finished orders spread over the last 365 days.
+    :return: None
+    """
+    from kitchen_analytics import KitchenAnalytics
+    from schema import ensure_schema
+
+    use_temp_database()
+    ensure_schema()
+    now = int(time.time())
+    conn = database.get_connection()
+    conn.executemany('''INSERT INTO finished_orders (temp_customer_id, total_price, order_taken_date, order_taken_hour,
+                                                     order_prepared_hour, order_taken_at, order_prepared_at)
+                        VALUES (1, 20, '2024-01-01', '12:00:00', '12:20:00', ?, ?)''',
+                     [(now - i * 315, now - i * 315 + 300 + i % 1800) for i in range(order_count)])
+    conn.executemany('''INSERT INTO order_details (order_id, item_id, item_type, item_name, quantity)
+                        VALUES (?, ?, 0, ?, 1)''',
+                     [(i + 1, i % 20, f"Pizza {i % 20}") for i in range(order_count)])
+    conn.commit()
+    database.release_connection(conn)
+    kitchen_analytics = KitchenAnalytics()
+
+    print("Kitchen analytics")
+    print(f"{'orders':>8} {'by hour ms':>11} {'by product ms':>14}")
+    by_hour = best_time(lambda: kitchen_analytics.prep_time_percentiles(
+        kitchen_analytics.query_prep_times(), 'Hour'), 3)
+    by_product = best_time(lambda: kitchen_analytics.prep_time_percentiles(
+        kitchen_analytics.query_product_prep_times(), 'Product'), 3)
+    print(f"{order_count:>8} {by_hour * 1000:>11.2f} {by_product * 1000:>14.2f}")
+
+
+# Modules imported by main.py, without the Tk window so the benchmark runs on headless machines
+STARTUP_IMPORTS = ("import analysis_pipeline, analytics, archive, customers, error_handling, order_polling, orders, "
+                   "products, profiling, schema")
+# Work done by each role before its first screen is ready
+STARTUP_ROLES = {
+    "waiter": "orders.ActiveOrders(); products.MenuRepository.get_instance().list_products(0)",
+    "chef": "orders.ActiveOrders().get_active_orders()",
+    "manager": "orders.ActiveOrders(); analytics.SalesData().build_analysis('Daily Sales')",
+}
+
+
+def benchmark_startup(repeat=3):
+    """
+    Measures the cold start of a new interpreter for each role, from the imports to its first screen data.
+    Every run starts in a fresh temporary directory, so the database is created by the run.
+    :param repeat: (int) Number of runs per role.
+    :return: None
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    environment = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [package_dir,
+                                                                             os.environ.get("PYTHONPATH")])))
+    print("Cold start")
+    print(f"{'role':>8} {'ms':>10}")
+    for role, setup in STARTUP_ROLES.items():
+        def run():
+            subprocess.run([sys.executable, "-c", f"{STARTUP_IMPORTS}\n{setup}"],
+                           cwd=tempfile.mkdtemp(prefix="pizza_bench_"), env=environment, check=True)
+        print(f"{role:>8} {best_time(run, repeat) * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    benchmark_order_listing()
+    benchmark_take_order()
+    try:
+        benchmark_kitchen_analytics()
+    except ImportError as e:
+        print(f"Kitchen analytics benchmark skipped: {e}")
+    benchmark_startup()
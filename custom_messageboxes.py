@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk
 import winsound
+from assets import get_image
 
 
 class CustomMessageBoxes(tk.Toplevel):
@@ -23,7 +24,7 @@ class CustomShowError(CustomMessageBoxes):
     def __init__(self, parent, title, message):
         super().__init__(parent, title, message)
 
-        image = tk.PhotoImage(file="crazy_error_logo.png")
+        image = get_image(self, "error")
         error_label = ttk.Label(self, image=image)
         error_label.image = image
         error_label.grid(row=0, column=0, pady=15)
@@ -41,7 +42,7 @@ class CustomShowInfo(CustomMessageBoxes):
     def __init__(self, parent, title, message):
         super().__init__(parent, title, message)
 
-        image = tk.PhotoImage(file="crazy_showinfo_logo.png")
+        image = get_image(self, "info")
         info_label = ttk.Label(self, image=image)
         info_label.image = image
         info_label.grid(row=0, column=0, pady=15)
@@ -67,7 +68,7 @@ class CustomAskyesno(CustomMessageBoxes):
             self.destroy()
             return False
 
-        image = tk.PhotoImage(file="crazy_askyesno_logo.png")
+        image = get_image(self, "askyesno")
         error_label = ttk.Label(self, image=image)
         error_label.image = image
         error_label.grid(row=0, column=0, pady=15)
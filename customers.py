@@ -1,4 +1,6 @@
 import sqlite3
+from database import get_connection, release_connection
+from schema import ensure_schema
 
 
 class Customers:
@@ -9,34 +11,9 @@ class Customers:
         """
         Initialize a customer instance.
         """
-        self.conn = sqlite3.connect("pizza_restaurant.db")
+        ensure_schema()
+        self.conn = get_connection()
         self.cursor = self.conn.cursor()
-        self.create_table()
-
-    def create_table(self):
-        """
-        Creates necessary tables if they do not exist yet.
-        :return: None
-        """
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                  id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  first_name VARCHAR(100) NOT NULL,
-                  last_name VARCHAR(100) NOT NULL,
-                  email VARCHAR(200) NOT NULL,
-                  address TEXT NOT NULL
-            )
-        ''')
-
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS temp_customers (
-                  id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  table_no TINYINT NOT NULL,
-                  first_name VARCHAR(100),
-                  last_name VARCHAR(100)
-            )
-        ''')
-        self.conn.commit()
 
     def add_perm_customer(self, first_name, last_name, email, address):
         """
@@ -73,3 +50,10 @@ class Customers:
         """
         table_no = self.cursor.execute('SELECT table_no FROM temp_customers WHERE id=?', (customer_id,)).fetchone()
         return table_no[0] if table_no else None
+
+    def close_connection(self):
+        """
+        Gives the database connection back to the connection pool.
+        :return: None
+        """
+        release_connection(self.conn)
@@ -3,113 +3,401 @@ from products import *
 from customers import *
 from error_handling import *
 import sqlite3
+import threading
+from datetime import date
+from collections import OrderedDict
+from database import get_connection, release_connection
+from schema import ensure_schema
+from archive import attach_archives, detach_archives
+from profiling import profiler, timed
+from analytics import KITCHEN_ANALYSIS_TYPES
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+
+logger = get_logger("dashboard")
+
+ANALYSIS_PERIODS = ["Daily Sales", "Weekly Sales", "Monthly Sales"]
+# Rollup columns and expressions that bucket the sales by period
+SALES_BUCKETS = {"Daily Sales": "sales_day", "Weekly Sales": "(sales_day + 3) / 7 * 7 - 3",
+                 "Monthly Sales": "sales_month"}
+PRODUCT_CATEGORIES = {item_type: name for name, item_type in PRODUCT_TYPES.items()}
+TOP_SELLERS = 10
+SALES_CACHE_SIZE = 32
+EPOCH_DATE = date(1970, 1, 1)
+
+
+def sales_bucket(period):
+    # SQL expression of the rollup rows that groups them by period. Day 0 is a Thursday, so (day + 3) / 7 starts the
+    # weeks on Monday, and a week is labelled with the day number of its Monday.
+    if period not in SALES_BUCKETS:
+        raise ValueError(f"Unknown sales period: {period}")
+    return SALES_BUCKETS[period]
+
+
+def bucket_dates(data, period):
+    # Converts the day or month numbers of the OrderDate column to dates
+    if period == 'Monthly Sales':
+        months = data['OrderDate']
+        data['OrderDate'] = pd.to_datetime(pd.DataFrame({'year': months // 12, 'month': months % 12 + 1, 'day': 1}))
+    else:
+        data['OrderDate'] = pd.to_datetime(data['OrderDate'], unit='D')
+    return data
+
+
+def day_number(day):
+    # Converts a 'YYYY-MM-DD' date to the day number used by the daily sales rollup
+    return None if day is None else (date.fromisoformat(day) - EPOCH_DATE).days
+
+
+def date_filter(column, start=None, end=None):
+    # Builds the WHERE clause and parameters of a date range on an indexed date column
+    conditions, params = [], []
+    if start is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{column} <= ?")
+        params.append(end)
+    return (f"WHERE {' AND '.join(conditions)}" if conditions else ""), params
+
+
+def paginate(query, params, limit=None, offset=0):
+    # Appends LIMIT and OFFSET to a query, so only one window of the result reaches pandas
+    if limit is None:
+        return query, params
+    return f"{query} LIMIT ? OFFSET ?", params + [limit, offset]
+
+
+class SalesCache:
+    # LRU cache of query results. An entry is only served while the sales data version it was built on is current,
+    # so finishing or cancelling an order makes every cached result stale at once.
+    def __init__(self, max_size=SALES_CACHE_SIZE):
+        if max_size < 1:
+            raise ValueError("Cache size must be at least 1")
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["max_size"] = self.max_size
+            return stats
+
+
+# Shared by every SalesData instance, including the ones of the analysis worker threads
+sales_cache = SalesCache()
 
 
 class SalesData:
-    def __init__(self):
-        self.db_path = 'pizza_restaurant.db'
+    def __init__(self, include_archives=False):
+        # include_archives unions the archived finished orders into the queries that read finished_orders directly.
+        # The sales rollups always cover the archived orders.
         try:
-            self.conn = sqlite3.connect(self.db_path)
+            ensure_schema()
+            self.conn = get_connection()
             self.cursor = self.conn.cursor()
+            self.archives = attach_archives(self.conn) if include_archives else []
+            self.orders_table = 'all_finished_orders' if include_archives else 'finished_orders'
+            self.details_table = 'all_order_details' if include_archives else 'order_details'
         except sqlite3.Error as e:
-            print(f"Error: {e}")
+            logger.error("Sales data could not be opened: %s", e)
             raise
 
-    def fetch_sales_data(self, period='Daily Sales'):
-        if period == 'Daily Sales':
-            query = '''
-            SELECT order_taken_date AS OrderDate, SUM(total_price) AS TotalSales
-            FROM finished_orders
-            GROUP BY order_taken_date
-            '''
-        elif period == 'Weekly Sales':
-            query = '''
-            SELECT strftime('%Y-%W', order_taken_date) AS OrderDate, SUM(total_price) AS TotalSales
-            FROM finished_orders
-            GROUP BY strftime('%Y-%W', order_taken_date)
-            '''
-        elif period == 'Monthly Sales':
-            query = '''
-            SELECT strftime('%Y-%m', order_taken_date) AS OrderDate, SUM(total_price) AS TotalSales
-            FROM finished_orders
-            GROUP BY strftime('%Y-%m', order_taken_date)
-            '''
-        return pd.read_sql_query(query, self.conn)
-
-    def fetch_customer_segment_data(self):
-        query = '''
+    def cached(self, kind, period, date_range, loader):
+        # Serves a DataFrame from the sales cache while the sales data version is unchanged.
+        # Callers get a copy, so they can modify it without touching the cached result.
+        key = (kind, period, date_range, self.orders_table)
+        version = get_data_version(self.cursor)
+        data = sales_cache.get(key, version)
+        if data is None:
+            data = loader()
+            sales_cache.put(key, version, data)
+        return data.copy()
+
+    @timed
+    def fetch_sales_data(self, period='Daily Sales', start=None, end=None, limit=None, offset=0):
+        # period is the resolution of the rows. start and end are inclusive 'YYYY-MM-DD' bounds.
+        # limit and offset return one window of the rows, ordered by date.
+        return self.cached("sales", period, (start, end, limit, offset),
+                           lambda: self.query_sales_data(period, start, end, limit, offset))
+
+    def query_sales_data(self, period='Daily Sales', start=None, end=None, limit=None, offset=0):
+        # Reads the daily sales rollup, so the cost depends on the number of days instead of the number of orders.
+        # The date range is applied on its primary key, and weeks and months are bucketed with integer arithmetic.
+        where, params = date_filter("sales_day", day_number(start), day_number(end))
+        query = f'''
+        SELECT {sales_bucket(period)} AS OrderDate, SUM(total_sales) AS TotalSales
+        FROM daily_sales_rollup
+        {where}
+        GROUP BY OrderDate
+        ORDER BY OrderDate
+        '''
+        query, params = paginate(query, params, limit, offset)
+        data = pd.read_sql_query(query, self.conn, params=params)
+        return bucket_dates(data, period)
+
+    def rebuild_sales_rollup(self):
+        # Regenerates daily_sales_rollup from the finished orders history
+        try:
+            rebuild_daily_sales_rollup(self.cursor, self.orders_table)
+            rebuild_product_sales_rollup(self.cursor, self.orders_table, self.details_table)
+            bump_data_version(self.cursor)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+
+    @timed
+    def fetch_product_sales(self, group='product', period=None, start=None, end=None, limit=None, offset=0):
+        # Units and revenue per product ('product') or per category ('category'), optionally per period.
+        # Rows are ordered by revenue, or by date and revenue when a period is given.
+        return self.cached(f"product_sales_{group}", period, (start, end, limit, offset),
+                           lambda: self.query_product_sales(group, period, start, end, limit, offset))
+
+    def query_product_sales(self, group='product', period=None, start=None, end=None, limit=None, offset=0):
+        # A single aggregate over the product sales rollup, ranged on its (sales_day, ...) primary key
+        if group == 'product':
+            columns, keys = "item_type AS Category, MAX(item_name) AS Product", "item_type, item_id"
+        elif group == 'category':
+            columns, keys = "item_type AS Category", "item_type"
+        else:
+            raise ValueError(f"Unknown product sales group: {group}")
+        order = "Revenue DESC"
+        if period is not None:
+            columns = f"{sales_bucket(period)} AS OrderDate, {columns}"
+            keys = f"OrderDate, {keys}"
+            order = f"OrderDate, {order}"
+        where, params = date_filter("sales_day", day_number(start), day_number(end))
+        query = f'''
+        SELECT {columns}, SUM(units) AS Units, SUM(revenue) AS Revenue
+        FROM product_sales_rollup
+        {where}
+        GROUP BY {keys}
+        ORDER BY {order}
+        '''
+        query, params = paginate(query, params, limit, offset)
+        data = pd.read_sql_query(query, self.conn, params=params)
+        data['Category'] = data['Category'].map(PRODUCT_CATEGORIES)
+        return data if period is None else bucket_dates(data, period)
+
+    @timed
+    def fetch_customer_segment_data(self, start=None, end=None, limit=None, offset=0):
+        return self.cached("customer_segments", None, (start, end, limit, offset),
+                           lambda: self.query_customer_segment_data(start, end, limit, offset))
+
+    def query_customer_segment_data(self, start=None, end=None, limit=None, offset=0):
+        # The date range uses the order_taken_at index of finished_orders
+        where, params = date_filter("order_taken_at", *epoch_bounds(start, end))
+        query = f'''
         SELECT 
             table_no AS TableNo,
             COUNT(*) AS NumberOfOrders,
             SUM(total_price) AS TotalSpent 
-        FROM finished_orders
+        FROM {self.orders_table} AS finished_orders
         JOIN temp_customers ON finished_orders.temp_customer_id = temp_customers.id
+        {where}
         GROUP BY table_no
+        ORDER BY table_no
         '''
+        query, params = paginate(query, params, limit, offset)
         try:
-            return pd.read_sql_query(query, self.conn)
+            return pd.read_sql_query(query, self.conn, params=params)
         except Exception as e:
-            print(f"Error: {e}")
+            logger.error("Customer segment query failed: %s", e)
             return pd.DataFrame()
 
-    @handle_errors
     def close_connection(self):
-        self.conn.close()
-        print("Database connection closed")
+        # Called from the analysis worker threads, so errors are logged instead of shown in a messagebox
+        if self.archives:
+            try:
+                detach_archives(self.conn, self.archives)
+            except sqlite3.Error as e:
+                logger.error("Archives could not be detached: %s", e)
+            self.archives = []
+        release_connection(self.conn)
+        logger.debug("Database connection released")
 
-    @handle_errors
-    def get_sales_summary(self, period):
-        data = self.fetch_sales_data(period=period)
+    def sales_summary(self, period, start=None, end=None):
+        data = self.fetch_sales_data(period=period, start=start, end=end)
         if data.empty:
             return "No sales data available"
-        summary = data.describe().to_string()
+        summary = data[['TotalSales']].describe().to_string()
         return f"Sales Summary:\n{summary}"
 
-    @handle_errors
-    def plot_sales_trend(self, period):
-        data = self.fetch_sales_data(period=period)
+    def sales_trend_figure(self, period, start=None, end=None):
+        # Figure instead of pyplot, so the chart can be built on a worker thread
+        data = self.fetch_sales_data(period=period, start=start, end=end)
+        fig = Figure()
+        ax = fig.add_subplot()
         if data.empty:
-            fig, ax = plt.subplots()
             ax.text(0.5, 0.5, "No sales data available", ha='center', va='center', fontsize=12)
             return fig
-        if period == 'Daily Sales':
-            data['OrderDate'] = pd.to_datetime(data['OrderDate'])
-        elif period == 'Weekly Sales':
-            data['OrderDate'] = pd.to_datetime(data['OrderDate'] + '-0', format='%Y-%W-%w')
-        elif period == 'Monthly Sales':
-            data['OrderDate'] = pd.to_datetime(data['OrderDate'] + '-01')
-        data = data.sort_values('OrderDate')
-        fig, ax = plt.subplots()
         ax.plot(data['OrderDate'], data['TotalSales'])
         ax.set_title(f'{period} Trend')
         ax.set_xlabel('Order Date')
         ax.set_ylabel('Total Sales')
-        plt.xticks(rotation=30)
-        plt.tight_layout()
+        ax.tick_params(axis='x', labelrotation=30)
+        fig.tight_layout()
         return fig
 
-    @handle_errors
-    def get_customer_segments(self):
-        data = self.fetch_customer_segment_data()
+    def customer_segments(self, start=None, end=None):
+        data = self.fetch_customer_segment_data(start=start, end=end)
         if data.empty:
             return "No customer segment data available"
         segments = data.describe().to_string()
         return f"Customer Segments:\n{segments}"
 
-    @handle_errors
-    def plot_customer_segments(self):
-        data = self.fetch_customer_segment_data()
+    def customer_segments_figure(self, start=None, end=None):
+        data = self.fetch_customer_segment_data(start=start, end=end)
+        fig = Figure()
+        ax = fig.add_subplot()
         if data.empty:
-            fig, ax = plt.subplots()
             ax.text(0.5, 0.5, "No customer segment data available", ha='center', va='center', fontsize=12)
             return fig
-        fig, ax = plt.subplots()
         ax.bar(data['TableNo'], data['TotalSpent'])
         ax.set_title('Customer Segments')
         ax.set_xlabel('Table Number')
         ax.set_ylabel('Total Spent')
-        plt.tight_layout()
+        fig.tight_layout()
         return fig
 
+    def top_sellers_figure(self, start=None, end=None, count=TOP_SELLERS):
+        data = self.fetch_product_sales('product', start=start, end=end)
+        fig = Figure()
+        ax = fig.add_subplot()
+        if data.empty:
+            ax.text(0.5, 0.5, "No product sales data available", ha='center', va='center', fontsize=12)
+            return fig
+        data = data.nlargest(count, 'Units').iloc[::-1]
+        ax.barh(data['Product'], data['Units'])
+        ax.set_title(f'Top {count} Sellers')
+        ax.set_xlabel('Units Sold')
+        fig.tight_layout()
+        return fig
+
+    def menu_engineering_figure(self, start=None, end=None):
+        # Popularity against average price per unit. The mean lines split the menu into the four quadrants of menu
+        # engineering: stars, plowhorses, puzzles and dogs.
+        data = self.fetch_product_sales('product', start=start, end=end)
+        fig = Figure()
+        ax = fig.add_subplot()
+        if data.empty:
+            ax.text(0.5, 0.5, "No product sales data available", ha='center', va='center', fontsize=12)
+            return fig
+        data['UnitPrice'] = data['Revenue'] / data['Units']
+        for category, products in data.groupby('Category'):
+            ax.scatter(products['Units'], products['UnitPrice'], label=category)
+        for product in data.itertuples():
+            ax.annotate(product.Product, (product.Units, product.UnitPrice), fontsize=8,
+                        xytext=(3, 3), textcoords='offset points')
+        ax.axvline(data['Units'].mean(), color='grey', linestyle='--')
+        ax.axhline(data['UnitPrice'].mean(), color='grey', linestyle='--')
+        ax.set_title('Menu Engineering')
+        ax.set_xlabel('Units Sold')
+        ax.set_ylabel('Average Price per Unit')
+        ax.legend()
+        fig.tight_layout()
+        return fig
+
+    def category_sales(self, start=None, end=None):
+        data = self.fetch_product_sales('category', start=start, end=end)
+        if data.empty:
+            return "No product sales data available"
+        products = self.fetch_product_sales('product', start=start, end=end)
+        return f"Sales by Category:\n{data.to_string(index=False)}\n\nSales by Product:\n{products.to_string(index=False)}"
+
+    @staticmethod
+    def profiling_stats():
+        # Wall time table of the decorated functions and the SQL statements recorded in this process
+        if not profiler.enabled:
+            return "Profiling is off, start the application with CRAZY_PIZZA_PROFILE=1"
+        return f"Profiling Stats:\n{profiler.stats_table()}"
+
+    def build_analysis(self, analysis_type, start=None, end=None):
+        # Returns ("text", str) or ("figure", Figure) for an analysis type of the Analysis tab
+        if analysis_type == "Monthly Sales Summary":
+            return "text", self.sales_summary("Monthly Sales", start, end)
+        elif analysis_type in ANALYSIS_PERIODS:
+            return "figure", self.sales_trend_figure(analysis_type, start, end)
+        elif analysis_type == "Customer Segments":
+            return "text", self.customer_segments(start, end)
+        elif analysis_type == "Customer Segments Plot":
+            return "figure", self.customer_segments_figure(start, end)
+        elif analysis_type == "Top Sellers":
+            return "figure", self.top_sellers_figure(start, end)
+        elif analysis_type == "Menu Engineering":
+            return "figure", self.menu_engineering_figure(start, end)
+        elif analysis_type == "Category Sales":
+            return "text", self.category_sales(start, end)
+        elif analysis_type == "Profiling Stats":
+            return "text", self.profiling_stats()
+        elif analysis_type in KITCHEN_ANALYSIS_TYPES:
+            from kitchen_analytics import KitchenAnalytics
+
+            kitchen_analytics = KitchenAnalytics()
+            # Reads the same tables, the archives stay attached to the shared connection until this instance closes
+            kitchen_analytics.orders_table = self.orders_table
+            kitchen_analytics.details_table = self.details_table
+            try:
+                return kitchen_analytics.build_analysis(analysis_type, start, end)
+            finally:
+                kitchen_analytics.close_connection()
+        raise ValueError(f"Unknown analysis type: {analysis_type}")
+
+    @handle_errors
+    def get_sales_summary(self, period, start=None, end=None):
+        return self.sales_summary(period, start, end)
+
+    @handle_errors
+    def plot_sales_trend(self, period, start=None, end=None):
+        return self.sales_trend_figure(period, start, end)
+
+    @handle_errors
+    def get_customer_segments(self, start=None, end=None):
+        return self.customer_segments(start, end)
+
+    @handle_errors
+    def plot_customer_segments(self, start=None, end=None):
+        return self.customer_segments_figure(start, end)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crazy Pizza sales data maintenance")
+    parser.add_argument("--rebuild-rollup", action="store_true",
+                        help="regenerate the sales rollups from the finished orders history, archives included")
+    args = parser.parse_args()
+    configure_logging()
+    if args.rebuild_rollup:
+        sales_data = SalesData(include_archives=True)
+        sales_data.rebuild_sales_rollup()
+        print("Sales rollups rebuilt.")
+        sales_data.close_connection()
+    else:
+        parser.print_help()
@@ -0,0 +1,225 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from profiling import profiler, TimedConnection
+
+# Constant values
+DB_PATH = "pizza_restaurant.db"
+POOL_SIZE = 5
+# Seconds acquire waits for a free connection before it raises, so a full pool never freezes the Tk main thread
+POOL_TIMEOUT = 10.0
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -8000,
+    "temp_store": "MEMORY",
+}
+
+logger = logging.getLogger("crazy_pizza.database")
+
+
+class ConnectionPool:
+    """
+    Class representing a pool of SQLite connections shared by every model class.
+    Each thread borrows one connection and keeps it until every borrower of that thread has released it,
+    so all the model instances of a thread work on the same database handle.
+    """
+    def __init__(self, db_path=DB_PATH, size=POOL_SIZE, pragmas=None, timeout=POOL_TIMEOUT):
+        """
+        Initialize a connection pool instance.
+        :param db_path: (str) Path of the SQLite database file.
+        :param size: (int) Maximum number of connections that can be open at the same time.
+        :param pragmas: (dict) PRAGMA names and values applied to every connection when it is opened.
+        :param timeout: (float) Default seconds acquire waits for a free connection. None waits forever.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.db_path = db_path
+        self.size = size
+        self.pragmas = PRAGMAS if pragmas is None else pragmas
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self._idle = deque()
+        # Every open connection, idle or borrowed
+        self._connections = set()
+        self._opened = 0
+        self._in_use = 0
+        self._local = threading.local()
+        self._stats = {"checkouts": 0, "releases": 0, "opened": 0, "waits": 0, "wait_time": 0.0, "peak_in_use": 0}
+
+    def _open_connection(self):
+        """
+        Opens a new connection and applies the configured pragmas. In profiling mode the statements of the connection
+        are timed.
+        :return: (obj) sqlite3 connection
+        """
+        factory = TimedConnection if profiler.enabled else sqlite3.Connection
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, factory=factory)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def acquire(self, timeout=...):
+        """
+        Borrows the connection of the calling thread, taking one from the pool if the thread has none yet.
+        Blocks while all the connections are used by other threads.
+        :param timeout: (float) Maximum seconds to wait for a free connection. Defaults to the timeout of the pool,
+        None waits forever.
+        :return: (obj) sqlite3 connection
+        """
+        if timeout is ...:
+            timeout = self.timeout
+        with self._condition:
+            local = self._local
+            self._stats["checkouts"] += 1
+            if getattr(local, "conn", None) is not None:
+                local.borrowers += 1
+                return local.conn
+
+            started = None
+            while not self._idle and self._opened >= self.size:
+                if started is None:
+                    started = time.perf_counter()
+                    self._stats["waits"] += 1
+                remaining = None if timeout is None else timeout - (time.perf_counter() - started)
+                if remaining is not None and remaining <= 0:
+                    self._stats["wait_time"] += time.perf_counter() - started
+                    raise sqlite3.OperationalError(f"Timed out waiting for a database connection, all {self.size} "
+                                                   f"connections of the pool are in use")
+                self._condition.wait(remaining)
+            if started is not None:
+                self._stats["wait_time"] += time.perf_counter() - started
+
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                conn = self._open_connection()
+                self._connections.add(conn)
+                self._opened += 1
+                self._stats["opened"] += 1
+            self._in_use += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._in_use)
+            local.conn = conn
+            local.borrowers = 1
+            return conn
+
+    def release(self, conn):
+        """
+        Gives back a borrowed connection. The connection returns to the pool when the last borrower of the
+        calling thread releases it. Only the thread that borrowed a connection can release it.
+        :param conn: (obj) The connection returned by acquire.
+        :return: None
+        """
+        with self._condition:
+            local = self._local
+            if getattr(local, "conn", None) is not conn:
+                # Connections closed by close_all are released by their borrowers afterwards
+                if conn in self._connections:
+                    logger.warning("Connection released by thread %s, which does not hold it",
+                                   threading.current_thread().name)
+                return
+            self._stats["releases"] += 1
+            local.borrowers -= 1
+            if local.borrowers > 0:
+                return
+            local.conn = None
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.append(conn)
+            self._in_use -= 1
+            self._condition.notify()
+
+    def close_all(self):
+        """
+        Closes every connection of the pool, including the ones still borrowed. The borrowing threads get a new
+        connection the next time they acquire one.
+        :return: None
+        """
+        with self._condition:
+            if self._in_use:
+                logger.warning("Closing %d database connections that are still in use", self._in_use)
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+            self._idle.clear()
+            self._opened = 0
+            self._in_use = 0
+            # Forgets the connection of every thread
+            self._local = threading.local()
+            self._condition.notify_all()
+
+    def stats(self):
+        """
+        Returns the usage statistics of the pool.
+        :return: (dict) checkouts, releases, opened connections, waits, total and average wait time,
+        current and peak usage.
+        """
+        with self._condition:
+            stats = dict(self._stats)
+            stats["size"] = self.size
+            stats["open"] = self._opened
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+            stats["avg_wait_time"] = stats["wait_time"] / stats["waits"] if stats["waits"] else 0.0
+            return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure_pool(db_path=DB_PATH, size=POOL_SIZE, pragmas=None, timeout=POOL_TIMEOUT):
+    """
+    Replaces the shared connection pool with a new one. Should be called before any model class is created.
+    :param db_path: (str) Path of the SQLite database file.
+    :param size: (int) Maximum number of connections.
+    :param pragmas: (dict) PRAGMA names and values applied at open time.
+    :param timeout: (float) Default seconds acquire waits for a free connection.
+    :return: (obj) The new ConnectionPool instance.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = ConnectionPool(db_path, size, pragmas, timeout)
+        return _pool
+
+
+def get_pool():
+    """
+    Returns the shared connection pool, creating it with the default settings if needed.
+    :return: (obj) ConnectionPool instance
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
+
+
+def get_connection():
+    """
+    Borrows the connection of the calling thread from the shared pool.
+    :return: (obj) sqlite3 connection
+    """
+    return get_pool().acquire()
+
+
+def release_connection(conn):
+    """
+    Gives a connection back to the shared pool.
+    :param conn: (obj) sqlite3 connection
+    :return: None
+    """
+    get_pool().release(conn)
+
+
+def pool_stats():
+    """
+    Returns the statistics of the shared pool.
+    :return: (dict) Pool statistics
+    """
+    return get_pool().stats()
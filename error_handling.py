@@ -1,19 +1,119 @@
+import atexit
+import logging
+import os
+import queue
+import random
 import sqlite3
+import time
 from functools import wraps
+from logging.handlers import QueueHandler, QueueListener
 import tkinter as tk
 from tkinter import messagebox
+from profiling import profiler
+
+# Constant values
+LOGGER_NAME = "crazy_pizza"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(threadName)s]: %(message)s"
+LOG_LEVEL = os.environ.get("CRAZY_PIZZA_LOG_LEVEL", "INFO").upper()
+# Share of the DEBUG records that are kept (1.0 keeps all of them)
+LOG_SAMPLE_RATE = float(os.environ.get("CRAZY_PIZZA_LOG_SAMPLE_RATE", "1.0"))
+
+logger = logging.getLogger(LOGGER_NAME)
+_listener = None
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random share of the DEBUG records. Records of the other levels always pass.
+    """
+    def __init__(self, sample_rate=LOG_SAMPLE_RATE):
+        super().__init__()
+        if not 0 <= sample_rate <= 1:
+            raise ValueError("Sample rate must be between 0 and 1")
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or self.sample_rate >= 1 or random.random() < self.sample_rate
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Queues the records that pass the level and the sampling filter. The message is merged with its arguments when the
+    record is queued, so a list or an order object logged as an argument shows its state at the time of the call.
+    The timestamp, the log line and the traceback are still formatted by the listener thread.
+    """
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(level=LOG_LEVEL, sample_rate=LOG_SAMPLE_RATE, handler=None):
+    """
+    Sends the records of the application loggers through a queue to a listener thread, so writing them never blocks
+    the Tk main thread.
+    :param level: (str) Lowest logged level (DEBUG, INFO, WARNING, ERROR).
+    :param sample_rate: (float) Share of the DEBUG records that are kept.
+    :param handler: (obj) logging.Handler that writes the records. Defaults to standard error.
+    :return: (obj) The application logger.
+    """
+    global _listener
+    stop_logging()
+    if handler is None:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    records = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(records)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+    for old_handler in list(logger.handlers):
+        logger.removeHandler(old_handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    return logger
+
+
+def stop_logging():
+    """
+    Writes the queued records and stops the listener thread.
+    :return: None
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+def get_logger(name):
+    """
+    Returns the logger of a module of the application.
+    :param name: (str) Module name.
+    :return: (obj) logging.Logger
+    """
+    return logger.getChild(name)
 
 
 def handle_errors(func):
+    name = func.__qualname__
+
     @wraps(func)
     def wrapper(*args, **kwargs):
+        # The arguments are only formatted when DEBUG records are logged
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Calling function %s with args: %r kwargs: %r", func.__name__, args, kwargs)
+        # The wall time is only measured in profiling mode
+        started = time.perf_counter() if profiler.enabled else None
         try:
-            print(f"Calling function {func.__name__} with args: {args} kwargs: {kwargs}")
             return func(*args, **kwargs)
         except (sqlite3.Error, tk.TclError, AttributeError, ValueError, TypeError) as e:
-            print(f"Exception in function {func.__name__}: {e}")
+            logger.error("Exception in function %s: %s", func.__name__, e)
             messagebox.showerror(title="Error!", message=str(e))
+        finally:
+            if started is not None:
+                profiler.record("function", name, time.perf_counter() - started)
     return wrapper
-
-
-
@@ -0,0 +1,94 @@
+from dashboard import *
+
+PREP_TIME_PERCENTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+
+
+class KitchenAnalytics(SalesData):
+    # Preparation time distributions of the finished orders, used to size the kitchen staff.
+    # Shares the connection handling and the result cache of SalesData.
+
+    def fetch_prep_times(self, start=None, end=None):
+        return self.cached("prep_times", None, (start, end), lambda: self.query_prep_times(start, end))
+
+    def query_prep_times(self, start=None, end=None):
+        # One row per finished order with its local hour of day and preparation time in minutes
+        where, params = date_filter("order_taken_at", *epoch_bounds(start, end))
+        query = f'''
+        SELECT
+            CAST(strftime('%H', order_taken_at, 'unixepoch', 'localtime') AS INTEGER) AS Hour,
+            order_taken_at AS TakenAt,
+            order_prepared_at AS PreparedAt
+        FROM {self.orders_table}
+        {where} {"AND" if where else "WHERE"} order_prepared_at IS NOT NULL
+        '''
+        data = pd.read_sql_query(query, self.conn, params=params)
+        data['PrepMinutes'] = (data['PreparedAt'] - data['TakenAt']) / 60
+        return data
+
+    def fetch_product_prep_times(self, start=None, end=None):
+        return self.cached("product_prep_times", None, (start, end),
+                           lambda: self.query_product_prep_times(start, end))
+
+    def query_product_prep_times(self, start=None, end=None):
+        # One row per ordered product with the preparation time of its order in minutes
+        where, params = date_filter("o.order_taken_at", *epoch_bounds(start, end))
+        query = f'''
+        SELECT
+            od.item_name AS Product,
+            o.order_taken_at AS TakenAt,
+            o.order_prepared_at AS PreparedAt
+        FROM {self.orders_table} AS o
+        JOIN {self.details_table} AS od ON od.order_id = o.id
+        {where} {"AND" if where else "WHERE"} o.order_prepared_at IS NOT NULL
+        '''
+        data = pd.read_sql_query(query, self.conn, params=params)
+        data['PrepMinutes'] = (data['PreparedAt'] - data['TakenAt']) / 60
+        return data
+
+    @staticmethod
+    def prep_time_percentiles(data, key):
+        # Orders count and p50, p90, p99 of PrepMinutes for every value of the key column
+        if data.empty:
+            return pd.DataFrame(columns=["Orders", *PREP_TIME_PERCENTILES])
+        grouped = data.groupby(key)['PrepMinutes']
+        percentiles = grouped.quantile(list(PREP_TIME_PERCENTILES.values())).unstack()
+        percentiles.columns = list(PREP_TIME_PERCENTILES)
+        percentiles.insert(0, "Orders", grouped.size())
+        return percentiles.round(1)
+
+    def prep_times_by_hour(self, start=None, end=None):
+        return self.prep_time_percentiles(self.fetch_prep_times(start, end), 'Hour')
+
+    def prep_times_by_product(self, start=None, end=None):
+        return self.prep_time_percentiles(self.fetch_product_prep_times(start, end), 'Product')
+
+    def prep_times_by_hour_figure(self, start=None, end=None):
+        data = self.prep_times_by_hour(start, end)
+        fig = Figure()
+        ax = fig.add_subplot()
+        if data.empty:
+            ax.text(0.5, 0.5, "No preparation time data available", ha='center', va='center', fontsize=12)
+            return fig
+        for name in PREP_TIME_PERCENTILES:
+            ax.plot(data.index, data[name], marker='o', label=name)
+        ax.set_title('Preparation Time by Hour of Day')
+        ax.set_xlabel('Hour')
+        ax.set_ylabel('Minutes')
+        ax.set_xticks(range(0, 24))
+        ax.legend()
+        fig.tight_layout()
+        return fig
+
+    def prep_times_by_product_summary(self, start=None, end=None):
+        data = self.prep_times_by_product(start, end)
+        if data.empty:
+            return "No preparation time data available"
+        data = data.sort_values("p90", ascending=False)
+        return f"Preparation Times by Product (minutes):\n{data.to_string()}"
+
+    def build_analysis(self, analysis_type, start=None, end=None):
+        if analysis_type == "Prep Times by Hour":
+            return "figure", self.prep_times_by_hour_figure(start, end)
+        elif analysis_type == "Prep Times by Product":
+            return "text", self.prep_times_by_product_summary(start, end)
+        return super().build_analysis(analysis_type, start, end)
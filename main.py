@@ -1,7 +1,7 @@
+import csv
+import json
 import sqlite3
 import tkinter as tk
-import pandas as pd
-import matplotlib.pyplot as plt
 from tkinter import ttk
 from tkinter import messagebox
 from tkinter import filedialog
@@ -12,15 +12,36 @@ from customers import *
 from products import *
 from orders import *
 from error_handling import *
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from custom_messageboxes import *
-from dashboard import *
+import analytics
+from analytics import ANALYSIS_TYPES, ANALYSIS_RANGES, date_range_bounds
+from database import configure_pool, get_pool
+from order_polling import OrderPoller
+from analysis_pipeline import AnalysisPipeline, ANALYSIS_WORKERS
+from archive import archive_from_environment
+from schema import maintain_indexes
+from assets import get_image, preload_assets
+from profiling import start_profiling_from_environment, stop_profiling
+from table_view import TableView
 
 # Constant values
 PADX = 5
 PADY = 5
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 600
+MENU_COLUMNS = ("ID", "Type", "Name", "Price", "Ingredients")
+MENU_COLUMN_WIDTHS = {"ID": 25, "Type": 50, "Name": 200, "Price": 50, "Ingredients": 400}
+ACTIVE_ORDER_COLUMNS = ("Order ID", "Table No", "Customer", "Total Price", "Order Date", "Order Hour", "Items")
+FINISHED_ORDER_COLUMNS = ("Order ID", "Table No", "Customer", "Total Price", "Order Date", "Order Hour",
+                          "Prepared Hour", "Items")
+ORDER_COLUMN_WIDTHS = {"Order ID": 80, "Customer": 150, "Items": 300}
+# Windows refreshed by an OrderPoller, the waiter and the chef windows
+POLLED_WINDOWS = 2
+# One connection for the Tk thread, one per analysis worker and two per poller, since a restarted poller can briefly
+# overlap the worker it replaces
+DB_POOL_SIZE = 1 + ANALYSIS_WORKERS + 2 * POLLED_WINDOWS
+
+logger = get_logger("main")
 
 total_price = 0
 
@@ -54,7 +75,9 @@ class GUI:
 
         self.login_canvas = tk.Canvas(self.login_frame, width=200, height=200)
         self.login_canvas.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=PADX, pady=PADY)
-        self.logo_image = tk.PhotoImage(file="crazy_logo.png")
+        # Every logo and message box image is decoded once, the menus and popups reuse them
+        preload_assets(window)
+        self.logo_image = get_image(window, "logo")
         self.login_canvas.create_image(100, 100, image=self.logo_image)
 
         self.user_label = ttk.Label(self.login_frame, text="User: ")
@@ -78,11 +101,6 @@ class GUI:
         self.grip = ttk.Sizegrip(window)
         self.grip.place(relx=1.0, rely=1.0, anchor="se")
 
-        # Storing images for each tab
-        self.manager_images = []
-        self.waiter_images = []
-        self.chef_images = []
-
         # database instances
         self.pizzas = Pizza()
         self.snacks = Snack()
@@ -92,6 +110,9 @@ class GUI:
         self.canceled_orders = CanceledOrders()
         self.order_details = OrderDetails()
         self.customers = Customers()
+        self.menu = MenuRepository.get_instance()
+        # TableView shown in each frame, by frame path
+        self.table_views = {}
         self.items = []
 
     def login_process(self):
@@ -115,6 +136,9 @@ class GUI:
         Creates a Toplevel window for the manager role
         :return: None
         """
+        # pandas and matplotlib are loaded while the manager looks at the first tabs
+        analytics.warm_up()
+
         # Manager Window Setup
         manager_window = tk.Toplevel(self.window)
         manager_window.title("Crazy Pizza Management")
@@ -181,6 +205,11 @@ class GUI:
         remove_product_button.grid(row=3, column=1, padx=PADX, pady=PADY)
         update_product_button = ttk.Button(left_frame1, text="Update Product", command=lambda: self.update_product(self.tree_menu))
         update_product_button.grid(row=4, column=1, padx=PADX, pady=PADY)
+        import_menu_button = ttk.Button(left_frame1, text="Import Menu",
+                                        command=lambda: self.import_menu(manager_window, lambda: show_menu(right_frame1)))
+        import_menu_button.grid(row=5, column=1, padx=PADX, pady=PADY)
+        export_menu_button = ttk.Button(left_frame1, text="Export Menu", command=lambda: self.export_menu(manager_window))
+        export_menu_button.grid(row=6, column=1, padx=PADX, pady=PADY)
 
         @handle_errors
         def show_active_orders(frame):
@@ -189,31 +218,9 @@ class GUI:
             :param frame: (obj) Expects a tkinter frame object.
             :return: None
             """
-            self.cleaning_frame(frame)
-            tree_active_orders = ttk.Treeview(frame, show="headings", selectmode="browse")
-            tree_active_orders["columns"] = (
-                "Order ID", "Table No", "Total Price", "Order Date", "Order Hour", "Items")
-            tree_active_orders.column("Order ID", anchor="center", width=80)
-            tree_active_orders.column("Table No", anchor="center", width=100)
-            tree_active_orders.column("Total Price", anchor="center", width=100)
-            tree_active_orders.column("Order Date", anchor="center", width=100)
-            tree_active_orders.column("Order Hour", anchor="center", width=100)
-            tree_active_orders.column("Items", anchor="center", width=300)
-            tree_active_orders.heading("Order ID", text="Order ID")
-            tree_active_orders.heading("Table No", text="Table No")
-            tree_active_orders.heading("Total Price", text="Total Price")
-            tree_active_orders.heading("Order Date", text="Order Date")
-            tree_active_orders.heading("Order Hour", text="Order Hour")
-            tree_active_orders.heading("Items", text="Items")
-            tree_active_orders.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
-
             active_orders = self.active_orders.get_active_orders()
-            print(f"Active Orders: {active_orders}")
-            for order in active_orders:
-                table_no = self.customers.get_table_no(order[1])
-                print(f"Inserting order: {order}")
-                order_with_table = (order[0], table_no, order[2], order[3], order[4], order[5])
-                tree_active_orders.insert("", "end", values=order_with_table)
+            logger.debug("Active orders: %s", active_orders)
+            self.get_table_view(frame, ACTIVE_ORDER_COLUMNS, ORDER_COLUMN_WIDTHS).set_rows(active_orders)
 
         @handle_errors
         def show_finished_orders(frame):
@@ -223,85 +230,108 @@ class GUI:
             :return: None
             """
             self.cleaning_frame(frame)
-            tree_finished_orders = ttk.Treeview(frame, show="headings", selectmode="browse")
-            tree_finished_orders["columns"] = (
-                "Order ID", "Table No", "Total Price", "Order Date", "Order Hour", "Prepared Hour", "Items")
-            tree_finished_orders.column("Order ID", anchor="center", width=80)
-            tree_finished_orders.column("Table No", anchor="center", width=100)
-            tree_finished_orders.column("Total Price", anchor="center", width=100)
-            tree_finished_orders.column("Order Date", anchor="center", width=100)
-            tree_finished_orders.column("Order Hour", anchor="center", width=100)
-            tree_finished_orders.column("Prepared Hour", anchor="center", width=100)
-            tree_finished_orders.column("Items", anchor="center", width=300)
-            tree_finished_orders.heading("Order ID", text="Order ID")
-            tree_finished_orders.heading("Table No", text="Table No")
-            tree_finished_orders.heading("Total Price", text="Total Price")
-            tree_finished_orders.heading("Order Date", text="Order Date")
-            tree_finished_orders.heading("Order Hour", text="Order Hour")
-            tree_finished_orders.heading("Prepared Hour", text="Prepared Hour")
-            tree_finished_orders.heading("Items", text="Items")
-            tree_finished_orders.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
-
-            finished_orders = self.finished_orders.get_finished_orders()
-            for order in finished_orders:
-                table_no = self.customers.get_table_no(order[1])
-                print(f"Inserting order: {order}")
-                order_with_table = (order[0], table_no, order[2], order[3], order[4], order[5], order[6])
-                tree_finished_orders.insert("", "end", values=order_with_table)
+            self.create_finished_orders_browser(frame)
 
         # Analysis Widgets
         analysis_type_label = tk.Label(left_frame4, text="Select Analysis Type:")
         analysis_type_label.grid(row=1, column=0, padx=PADX, pady=PADY)
 
-        analysis_type_combobox = ttk.Combobox(left_frame4, values=[
-            "Monthly Sales Summary", "Daily Sales", "Weekly Sales", "Monthly Sales",
-            "Customer Segments", "Customer Segments Plot"])
+        analysis_type_combobox = ttk.Combobox(left_frame4, values=ANALYSIS_TYPES)
         analysis_type_combobox.grid(row=1, column=1, padx=PADX, pady=PADY)
         analysis_type_combobox.current(0)
+        analysis_range_label = tk.Label(left_frame4, text="Select Date Range:")
+        analysis_range_label.grid(row=2, column=0, padx=PADX, pady=PADY)
+
+        analysis_range_combobox = ttk.Combobox(left_frame4, values=list(ANALYSIS_RANGES), state="readonly")
+        analysis_range_combobox.grid(row=2, column=1, padx=PADX, pady=PADY)
+        analysis_range_combobox.current(0)
+
+        include_archives_var = tk.BooleanVar(value=False)
+        include_archives_check = ttk.Checkbutton(left_frame4, text="Include Archived Orders",
+                                                 variable=include_archives_var)
+        include_archives_check.grid(row=3, column=1, padx=PADX, pady=PADY)
+
+        def show_selected_analysis():
+            """
+            Shows the analysis selected with the analysis widgets.
+            :return: None
+            """
+            show_analysis(right_frame4, analysis_type_combobox.get(), analysis_range_combobox.get(),
+                          include_archives_var.get())
+
+        # A new selection supersedes the analysis that is still running
+        analysis_type_combobox.bind("<<ComboboxSelected>>", lambda event: show_selected_analysis())
+        analysis_range_combobox.bind("<<ComboboxSelected>>", lambda event: show_selected_analysis())
 
-        analysis_button = ttk.Button(left_frame4, text="Show Analysis",
-                                     command=lambda: show_analysis(right_frame4, analysis_type_combobox.get()))
-        analysis_button.grid(row=2, column=1, columnspan=2, pady=10)
+        analysis_button = ttk.Button(left_frame4, text="Show Analysis", command=show_selected_analysis)
+        analysis_button.grid(row=4, column=1, columnspan=2, pady=10)
+
+        analysis_pipeline = AnalysisPipeline(manager_window)
+        manager_window.bind("<Destroy>",
+                            lambda event: analysis_pipeline.shutdown() if event.widget is manager_window else None,
+                            add="+")
 
         # Analysis Functions
         @handle_errors
-        def show_analysis(frame, analysis_type):
+        def show_analysis(frame, analysis_type, range_name="All Time", include_archives=False):
             """
             Shows the related graph on the provided frame as a parameter.
+            The data is loaded and the graph is rendered on a worker thread while a progress bar is shown.
             :param frame: (obj) Expects a tkinter frame instance.
             :param analysis_type: (str) Expects the type of the analysis as a string. Which is provided in the rest of
             the function.
+            :param range_name: (str) Date range of the analysed orders, one of ANALYSIS_RANGES.
+            :param include_archives: (bool) Unions the archived finished orders into the analysis.
             :return: None
             """
-            for widget in frame.winfo_children():
-                if widget not in {analysis_type_label, analysis_type_combobox, analysis_button}:
-                    widget.destroy()
+            self.cleaning_frame(frame)
+            progress_label = ttk.Label(frame, text="Preparing analysis...")
+            progress_label.pack(pady=PADY*4)
+            progress_bar = ttk.Progressbar(frame, mode="indeterminate", length=200)
+            progress_bar.pack(pady=PADY)
+            progress_bar.start(10)
 
-            sales_data = SalesData()
+            def on_progress(message):
+                """
+                Shows the current stage of the analysis.
+                :param message: (str) Progress message
+                :return: None
+                """
+                progress_label.config(text=message)
 
-            try:
-                if analysis_type == "Monthly Sales Summary":
-                    summary = sales_data.get_sales_summary(period="Monthly Sales")
-                    text_widget = tk.Text(frame, wrap='word')
-                    text_widget.pack(expand=True, fill='both')
-                    text_widget.insert(tk.END, summary)
-                elif analysis_type in ["Daily Sales", "Weekly Sales", "Monthly Sales"]:
-                    fig = sales_data.plot_sales_trend(period=analysis_type)
-                    canvas = FigureCanvasTkAgg(fig, frame)
-                    canvas.draw()
-                    canvas.get_tk_widget().pack(expand=True, fill='both')
-                elif analysis_type == "Customer Segments":
-                    segments = sales_data.get_customer_segments()
+            def on_result(kind, result):
+                """
+                Replaces the progress bar with the analysis result.
+                :param kind: (str) "text" or "image"
+                :param result: (str) Text of the analysis or base64 PNG data of the graph.
+                :return: None
+                """
+                self.cleaning_frame(frame)
+                if kind == "text":
                     text_widget = tk.Text(frame, wrap='word')
                     text_widget.pack(expand=True, fill='both')
-                    text_widget.insert(tk.END, segments)
-                elif analysis_type == "Customer Segments Plot":
-                    fig = sales_data.plot_customer_segments()
-                    canvas = FigureCanvasTkAgg(fig, frame)
-                    canvas.draw()
-                    canvas.get_tk_widget().pack(expand=True, fill='both')
-            finally:
-                sales_data.close_connection()
+                    text_widget.insert(tk.END, result)
+                else:
+                    image = tk.PhotoImage(data=result)
+                    image_label = ttk.Label(frame, image=image)
+                    image_label.image = image
+                    image_label.pack(expand=True, fill='both')
+
+            def on_error(error):
+                """
+                Removes the progress bar and shows the error.
+                :param error: (obj) Exception raised by the analysis.
+                :return: None
+                """
+                self.cleaning_frame(frame)
+                logger.error("Exception in analysis %s: %s", analysis_type, error)
+                messagebox.showerror(title="Error!", message=str(error))
+
+            start, end = date_range_bounds(range_name)
+            frame.update_idletasks()
+            analysis_pipeline.submit(analysis_type, frame.winfo_width(), frame.winfo_height(),
+                                     on_progress, on_result, on_error, start=start, end=end,
+                                     include_archives=include_archives)
 
         # Placing grip at the corner
         grip = ttk.Sizegrip(manager_window)
@@ -314,37 +344,7 @@ class GUI:
             :param frame: (obj) Expects a tkinter frame instance
             :return: None
             """
-            self.cleaning_frame(frame)
-            self.tree_menu = ttk.Treeview(frame, show="headings", selectmode="browse")
-            self.tree_menu["columns"] = ("ID", "Type", "Name", "Price", "Ingredients")
-            self.tree_menu.column("ID", anchor="center", width=25)
-            self.tree_menu.column("Type", anchor="center", width=50)
-            self.tree_menu.column("Name", anchor="center", width=200)
-            self.tree_menu.column("Price", anchor="center", width=50)
-            self.tree_menu.column("Ingredients", anchor="center", width=400)
-            self.tree_menu.heading("ID", text="ID")
-            self.tree_menu.heading("Type", text="Type")
-            self.tree_menu.heading("Name", text="Name")
-            self.tree_menu.heading("Price", text="Price")
-            self.tree_menu.heading("Ingredients", text="Ingredients")
-            self.tree_menu.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
-
-            self.pizza = Pizza()
-            self.snack = Snack()
-            self.drink = Drink()
-
-            pizzas = self.pizza.list_products()
-            snacks = self.snack.list_products()
-            drinks = self.drink.list_products()
-
-            for pizza in pizzas:
-                self.tree_menu.insert("", "end", values=(pizza[0], "Pizza", pizza[2], pizza[3], pizza[4]))
-
-            for snack in snacks:
-                self.tree_menu.insert("", "end", values=(snack[0], "Snack", snack[2], snack[3], snack[4]))
-
-            for drink in drinks:
-                self.tree_menu.insert("", "end", values=(drink[0], "Drink", drink[2], drink[3], drink[4]))
+            self.show_products(frame, ("Pizza", "Snack", "Drink"))
 
         # Second tab buttons
         active_orders_button = ttk.Button(left_frame2, text="Show Active Orders",
@@ -587,6 +587,202 @@ class GUI:
         cancel_button = ttk.Button(remove_product_window, text="Cancel", command=remove_product_window.destroy)
         cancel_button.grid(row=1, column=1, padx=PADX, pady=PADY*2)
 
+    @handle_errors
+    def import_menu(self, parent, on_imported=None):
+        """
+        Imports the products of a CSV or JSON menu file chosen by the manager in a single transaction.
+        Products with the name of an existing product of the same type are updated, the others are added.
+        :param parent: (obj) Expects the tkinter window that owns the dialogs.
+        :param on_imported: (callable) Called without parameters after a successful import.
+        :return: None
+        """
+        path = filedialog.askopenfilename(parent=parent, title="Import Menu",
+                                          filetypes=[("Menu files", "*.csv *.json"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            added, updated = import_menu(path)
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+            raise ValueError(f"Menu file could not be read: {e}")
+        custom_showinfo(parent, title="Success!", message=f"{added} products added\n{updated} products updated")
+        if on_imported is not None:
+            on_imported()
+
+    @handle_errors
+    def export_menu(self, parent):
+        """
+        Exports every product to a CSV or JSON menu file chosen by the manager.
+        :param parent: (obj) Expects the tkinter window that owns the dialogs.
+        :return: None
+        """
+        path = filedialog.asksaveasfilename(parent=parent, title="Export Menu", defaultextension=".csv",
+                                            filetypes=[("CSV files", "*.csv"), ("JSON files", "*.json")])
+        if not path:
+            return
+        try:
+            count = export_menu(path)
+        except OSError as e:
+            raise ValueError(f"Menu file could not be written: {e}")
+        custom_showinfo(parent, title="Success!", message=f"{count} products exported")
+
+    def get_table_view(self, frame, columns, widths=None, key=None):
+        """
+        Returns the TableView shown in a frame, so a refresh only applies the changed rows. The frame is cleaned and
+        gets a new TableView when it shows something else.
+        :param frame: (obj) Expects a tkinter frame instance.
+        :param columns: (tuple) Column names of the table.
+        :param widths: (dict) Column name as key and width in pixels as value.
+        :param key: (callable) Returns the primary key of a row. Defaults to the first value of the row.
+        :return: (obj) TableView instance
+        """
+        table = self.table_views.get(str(frame))
+        if table is None or not table.tree.winfo_exists() or table.columns != tuple(columns):
+            self.cleaning_frame(frame)
+            table = TableView(frame, columns, widths, key)
+            table.tree.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
+            self.table_views[str(frame)] = table
+        return table
+
+    def show_products(self, frame, type_names):
+        """
+        Shows the products of the given product types in a frame. Products are identified by their type and id.
+        :param frame: (obj) Expects a tkinter frame instance
+        :param type_names: (tuple) Product type names of PRODUCT_TYPES, in display order.
+        :return: None
+        """
+        table = self.get_table_view(frame, MENU_COLUMNS, MENU_COLUMN_WIDTHS, key=lambda row: f"{row[1]}-{row[0]}")
+        self.tree_menu = table.tree
+        table.set_rows((product[0], type_name, product[2], product[3], product[4])
+                       for type_name in type_names
+                       for product in self.menu.list_products(PRODUCT_TYPES[type_name]))
+
+    def create_finished_orders_browser(self, frame):
+        """
+        Creates the finished orders browser on a frame. Orders are fetched one page at a time, newest first, as the
+        Treeview is scrolled down, and the date and table filters run in the database.
+        :param frame: (obj) Expects an empty tkinter frame object.
+        :return: (obj) ttk.Treeview instance
+        """
+        browser_state = {"last_id": None, "more": True, "pending": False, "filters": {}}
+
+        filter_frame = ttk.Frame(frame)
+        filter_frame.pack(fill=tk.X, padx=PADX, pady=PADY)
+        ttk.Label(filter_frame, text="From (YYYY-MM-DD):").pack(side="left")
+        start_entry = ttk.Entry(filter_frame, width=12)
+        start_entry.pack(side="left", padx=PADX)
+        ttk.Label(filter_frame, text="To:").pack(side="left")
+        end_entry = ttk.Entry(filter_frame, width=12)
+        end_entry.pack(side="left", padx=PADX)
+        ttk.Label(filter_frame, text="Table No:").pack(side="left")
+        table_entry = ttk.Entry(filter_frame, width=6)
+        table_entry.pack(side="left", padx=PADX)
+
+        tree_frame = ttk.Frame(frame)
+        tree_frame.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
+        finished_orders_table = TableView(tree_frame, FINISHED_ORDER_COLUMNS, ORDER_COLUMN_WIDTHS)
+        tree_finished_orders = finished_orders_table.tree
+        scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=tree_finished_orders.yview)
+        scrollbar.pack(side="right", fill=tk.Y)
+        tree_finished_orders.pack(side="left", expand=True, fill=tk.BOTH)
+
+        @handle_errors
+        def load_page():
+            """
+            Appends the next page of finished orders to the Treeview.
+            :return: None
+            """
+            browser_state["pending"] = False
+            if not browser_state["more"] or not tree_finished_orders.winfo_exists():
+                return
+            orders = self.finished_orders.get_finished_orders_page(browser_state["last_id"],
+                                                                   FINISHED_ORDERS_PAGE_SIZE,
+                                                                   **browser_state["filters"])
+            finished_orders_table.append_rows(orders)
+            browser_state["more"] = len(orders) == FINISHED_ORDERS_PAGE_SIZE
+            if orders:
+                browser_state["last_id"] = orders[-1][0]
+
+        def on_scroll(first, last):
+            """
+            Updates the scrollbar and loads the next page when the end of the loaded orders comes into view.
+            :return: None
+            """
+            scrollbar.set(first, last)
+            if float(last) >= 1.0 and browser_state["more"] and not browser_state["pending"]:
+                browser_state["pending"] = True
+                tree_finished_orders.after_idle(load_page)
+
+        tree_finished_orders.configure(yscrollcommand=on_scroll)
+
+        @handle_errors
+        def apply_filters():
+            """
+            Restarts the browser from the newest order with the entered filters.
+            :return: None
+            """
+            filters = {"start": start_entry.get().strip() or None, "end": end_entry.get().strip() or None,
+                       "table_no": int(table_entry.get()) if table_entry.get().strip() else None}
+            for day in (filters["start"], filters["end"]):
+                if day is not None:
+                    datetime.strptime(day, '%Y-%m-%d')
+            finished_orders_table.clear()
+            browser_state.update({"last_id": None, "more": True, "filters": filters})
+            load_page()
+
+        filter_button = ttk.Button(filter_frame, text="Filter", command=apply_filters)
+        filter_button.pack(side="left", padx=PADX)
+
+        load_page()
+        return tree_finished_orders
+
+    def create_auto_refresh(self, window, left_frame, right_frame, active_orders_view, show_active_orders):
+        """
+        Creates the auto refresh toggle of an active orders tab. While it is on, an OrderPoller fetches the changes on a
+        worker thread and they are applied to the Treeview on the main thread.
+        :param window: (obj) Expects the Toplevel window of the role.
+        :param left_frame: (obj) Expects the frame of the tab buttons.
+        :param right_frame: (obj) Expects the frame of the active orders Treeview.
+        :param active_orders_view: (dict) TableView and change cursor of the active orders tab.
+        :param show_active_orders: (callable) Function that shows the active orders on a frame.
+        :return: (obj) OrderPoller instance
+        """
+        auto_refresh_var = tk.BooleanVar(value=False)
+        auto_refresh_status_label = ttk.Label(left_frame, text="")
+
+        def on_order_changes(change_cursor, added_orders, removed_order_ids):
+            """
+            Applies the changes delivered by the poller unless the view is already past them.
+            :return: None
+            """
+            table = active_orders_view["table"]
+            if table is None or not table.tree.winfo_exists() or change_cursor <= active_orders_view["cursor"]:
+                return
+            table.apply_changes(added_orders, removed_order_ids)
+            active_orders_view["cursor"] = change_cursor
+            auto_refresh_status_label.config(text=f"Display lag: {order_poller.stats()['last_lag']:.1f} s")
+
+        order_poller = OrderPoller(window, on_order_changes)
+
+        @handle_errors
+        def toggle_auto_refresh():
+            """
+            Starts or stops the poller as the checkbutton changes.
+            :return: None
+            """
+            if auto_refresh_var.get():
+                show_active_orders(right_frame)
+                order_poller.start(active_orders_view["cursor"])
+            else:
+                order_poller.stop()
+                auto_refresh_status_label.config(text="")
+
+        auto_refresh_checkbutton = ttk.Checkbutton(left_frame, text="Auto Refresh", variable=auto_refresh_var,
+                                                   command=toggle_auto_refresh)
+        auto_refresh_checkbutton.grid(row=3, column=1, padx=PADX, pady=PADY)
+        auto_refresh_status_label.grid(row=4, column=1, padx=PADX, pady=PADY)
+        window.bind("<Destroy>", lambda event: order_poller.stop() if event.widget is window else None, add="+")
+        return order_poller
+
     def cleaning_frame(self, frame):
         """
         Removes the every widget which are connected to the provided frame as a parameter.
@@ -647,11 +843,6 @@ class GUI:
 
         self.display_waiter_logo(left_frame3)
 
-        # product instances
-        self.pizza = Pizza()
-        self.snack = Snack()
-        self.drink = Drink()
-
         pizzas_button = ttk.Button(left_frame1, text="Pizzas", command=lambda: show_menu(right_frame1, "pizzas"))
         pizzas_button.grid(row=1, column=0, padx=PADX, pady=PADY)
         snacks_button = ttk.Button(left_frame1, text="Snacks", command=lambda: show_menu(right_frame1, "snacks"))
@@ -659,6 +850,9 @@ class GUI:
         drinks_button = ttk.Button(left_frame1, text="Drinks", command=lambda: show_menu(right_frame1, "drinks"))
         drinks_button.grid(row=1, column=2, padx=PADX, pady=PADY)
 
+        # Active orders TableView and the change cursor it is up to date with
+        active_orders_view = {"table": None, "cursor": 0}
+
         # Order related functions
         @handle_errors
         def show_active_orders(frame):
@@ -668,31 +862,22 @@ class GUI:
             :return: None
             """
             global tree_active_orders
-            self.cleaning_frame(frame)
-            tree_active_orders = ttk.Treeview(frame, show="headings", selectmode="browse")
-            tree_active_orders["columns"] = (
-                "Order ID", "Table No", "Total Price", "Order Date", "Order Hour", "Items")
-            tree_active_orders.column("Order ID", anchor="center", width=80)
-            tree_active_orders.column("Table No", anchor="center", width=100)
-            tree_active_orders.column("Total Price", anchor="center", width=100)
-            tree_active_orders.column("Order Date", anchor="center", width=100)
-            tree_active_orders.column("Order Hour", anchor="center", width=100)
-            tree_active_orders.column("Items", anchor="center", width=300)
-            tree_active_orders.heading("Order ID", text="Order ID")
-            tree_active_orders.heading("Table No", text="Table No")
-            tree_active_orders.heading("Total Price", text="Total Price")
-            tree_active_orders.heading("Order Date", text="Order Date")
-            tree_active_orders.heading("Order Hour", text="Order Hour")
-            tree_active_orders.heading("Items", text="Items")
-            tree_active_orders.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
-
-            active_orders = self.active_orders.get_active_orders()
-            print(f"Active Orders: {active_orders}")
-            for order in active_orders:
-                table_no = self.customers.get_table_no(order[1])
-                print(f"Inserting order: {order}")
-                order_with_table = (order[0], table_no, order[2], order[3], order[4], order[5])
-                tree_active_orders.insert("", "end", values=order_with_table)
+            table = active_orders_view["table"]
+            if table is not None and table.tree.winfo_exists():
+                tree_active_orders = table.tree
+                change_cursor, added_orders, removed_order_ids = self.active_orders.get_changes(
+                    active_orders_view["cursor"])
+                table.apply_changes(added_orders, removed_order_ids)
+                active_orders_view["cursor"] = change_cursor
+                return
+
+            table = self.get_table_view(frame, ACTIVE_ORDER_COLUMNS, ORDER_COLUMN_WIDTHS)
+            tree_active_orders = table.tree
+            change_cursor, active_orders = self.active_orders.get_active_orders_snapshot()
+            logger.debug("Active orders: %s", active_orders)
+            table.set_rows(active_orders)
+            active_orders_view["table"] = table
+            active_orders_view["cursor"] = change_cursor
 
         @handle_errors
         def show_finished_orders(frame):
@@ -702,30 +887,7 @@ class GUI:
             :return: None
             """
             self.cleaning_frame(frame)
-            tree_finished_orders = ttk.Treeview(frame, show="headings", selectmode="browse")
-            tree_finished_orders["columns"] = (
-                "Order ID", "Table No", "Total Price", "Order Date", "Order Hour", "Prepared Hour", "Items")
-            tree_finished_orders.column("Order ID", anchor="center", width=80)
-            tree_finished_orders.column("Table No", anchor="center", width=100)
-            tree_finished_orders.column("Total Price", anchor="center", width=100)
-            tree_finished_orders.column("Order Date", anchor="center", width=100)
-            tree_finished_orders.column("Order Hour", anchor="center", width=100)
-            tree_finished_orders.column("Prepared Hour", anchor="center", width=100)
-            tree_finished_orders.column("Items", anchor="center", width=300)
-            tree_finished_orders.heading("Order ID", text="Order ID")
-            tree_finished_orders.heading("Table No", text="Table No")
-            tree_finished_orders.heading("Total Price", text="Total Price")
-            tree_finished_orders.heading("Order Date", text="Order Date")
-            tree_finished_orders.heading("Order Hour", text="Order Hour")
-            tree_finished_orders.heading("Prepared Hour", text="Prepared Hour")
-            tree_finished_orders.heading("Items", text="Items")
-            tree_finished_orders.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
-
-            finished_orders = self.finished_orders.get_finished_orders()
-            for order in finished_orders:
-                table_no = self.customers.get_table_no(order[1])
-                order_with_table = (order[0], table_no, order[2], order[3], order[4], order[5], order[6])
-                tree_finished_orders.insert("", "end", values=order_with_table)
+            self.create_finished_orders_browser(frame)
 
         @handle_errors
         def cancel_order(frame):
@@ -751,12 +913,7 @@ class GUI:
             :return: None
             """
             selected_item_type = item_type_combobox.get()
-            if selected_item_type == "Pizza":
-                items = self.pizza.list_products()
-            elif selected_item_type == "Snack":
-                items = self.snack.list_products()
-            elif selected_item_type == "Drink":
-                items = self.drink.list_products()
+            items = self.menu.list_products(PRODUCT_TYPES.get(selected_item_type))
             item_combobox['values'] = [item[2] for item in items]
 
         @handle_errors
@@ -768,12 +925,7 @@ class GUI:
             """
             selected_item_name = item_combobox.get()
             selected_item_type = item_type_combobox.get()
-            if selected_item_type == "Pizza":
-                product_attributes = self.pizza.select_product(selected_item_name)
-            elif selected_item_type == "Snack":
-                product_attributes = self.snack.select_product(selected_item_name)
-            elif selected_item_type == "Drink":
-                product_attributes = self.drink.select_product(selected_item_name)
+            product_attributes = self.menu.select_product(PRODUCT_TYPES.get(selected_item_type), selected_item_name)
             item_id_label['text'] = product_attributes[0]
             item_name_label['text'] = product_attributes[2]
             item_price_label['text'] = product_attributes[3]
@@ -786,12 +938,7 @@ class GUI:
             """
             selected_item_name = item_combobox.get()
             selected_item_type = item_type_combobox.get()
-            if selected_item_type == "Pizza":
-                product_attributes = self.pizza.select_product(selected_item_name)
-            elif selected_item_type == "Snack":
-                product_attributes = self.snack.select_product(selected_item_name)
-            elif selected_item_type == "Drink":
-                product_attributes = self.drink.select_product(selected_item_name)
+            product_attributes = self.menu.select_product(PRODUCT_TYPES.get(selected_item_type), selected_item_name)
             item_id = product_attributes[0]
             item_type = product_attributes[1]
             item_name = product_attributes[2]
@@ -998,6 +1145,49 @@ class GUI:
         complete_order = ttk.Button(left_frame1, text="Complete Order", command=completing_order)
         complete_order.grid(row=11, column=1, padx=PADX, pady=PADY)
 
+        # Type-ahead search over the product names and ingredients of the whole menu
+        search_results = []
+
+        @handle_errors
+        def search_menu(event):
+            """
+            Lists the products matching the search text as it is typed.
+            :param event: None (Needed for the bind method of tkinter)
+            :return: None
+            """
+            search_results[:] = self.menu.search(search_string.get())
+            type_names = {product_type: name for name, product_type in PRODUCT_TYPES.items()}
+            search_listbox.delete(0, tk.END)
+            for product in search_results:
+                search_listbox.insert(tk.END, f"{product[2]} ({type_names.get(product[1])}) {product[3]}")
+
+        @handle_errors
+        def select_search_result(event):
+            """
+            Selects the clicked search result in the product comboboxes.
+            :param event: None (Needed for the bind method of tkinter)
+            :return: None
+            """
+            selection = search_listbox.curselection()
+            if not selection:
+                return
+            product = search_results[selection[0]]
+            item_type_combobox.set(next(name for name, product_type in PRODUCT_TYPES.items()
+                                        if product_type == product[1]))
+            update_item_list(None)
+            item_combobox.set(product[2])
+            show_product_details(None)
+
+        search_label = ttk.Label(left_frame1, text="Search Menu")
+        search_label.grid(row=12, column=0, padx=PADX, pady=PADY)
+        search_string = tk.StringVar(value="")
+        search_entry = ttk.Entry(left_frame1, textvariable=search_string)
+        search_entry.grid(row=12, column=1, columnspan=2, sticky="ew", padx=PADX, pady=PADY)
+        search_entry.bind("<KeyRelease>", search_menu)
+        search_listbox = tk.Listbox(left_frame1, height=6)
+        search_listbox.grid(row=13, column=0, columnspan=3, sticky="ew", padx=PADX, pady=PADY)
+        search_listbox.bind("<<ListboxSelect>>", select_search_result)
+
         # Placing grip at the corner
         grip = ttk.Sizegrip(waiter_window)
         grip.place(relx=1.0, rely=1.0, anchor="se")
@@ -1010,38 +1200,12 @@ class GUI:
             :param item_type: (str) Expects a string
             :return: None
             """
-            self.cleaning_frame(frame)
-            self.tree_menu = ttk.Treeview(frame, show="headings", selectmode="browse")
-            self.tree_menu["columns"] = ("ID", "Type", "Name", "Price", "Ingredients")
-            self.tree_menu.column("ID", anchor="center", width=25)
-            self.tree_menu.column("Type", anchor="center", width=50)
-            self.tree_menu.column("Name", anchor="center", width=200)
-            self.tree_menu.column("Price", anchor="center", width=50)
-            self.tree_menu.column("Ingredients", anchor="center", width=400)
-            self.tree_menu.heading("ID", text="ID")
-            self.tree_menu.heading("Type", text="Type")
-            self.tree_menu.heading("Name", text="Name")
-            self.tree_menu.heading("Price", text="Price")
-            self.tree_menu.heading("Ingredients", text="Ingredients")
-            self.tree_menu.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
-
-            self.pizza = Pizza()
-            self.snack = Snack()
-            self.drink = Drink()
-
-            pizzas = self.pizza.list_products()
-            snacks = self.snack.list_products()
-            drinks = self.drink.list_products()
-
             if item_type == "pizzas":
-                for pizza in pizzas:
-                    self.tree_menu.insert("", "end", values=(pizza[0], "Pizza", pizza[2], pizza[3], pizza[4]))
+                self.show_products(frame, ("Pizza",))
             elif item_type == "snacks":
-                for snack in snacks:
-                    self.tree_menu.insert("", "end", values=(snack[0], "Snack", snack[2], snack[3], snack[4]))
+                self.show_products(frame, ("Snack",))
             else:
-                for drink in drinks:
-                    self.tree_menu.insert("", "end", values=(drink[0], "Drink", drink[2], drink[3], drink[4]))
+                self.show_products(frame, ("Drink",))
 
         # Second tab buttons
         active_orders_button = ttk.Button(left_frame2, text="Show Active Orders",
@@ -1049,6 +1213,7 @@ class GUI:
         active_orders_button.grid(row=1, column=1, padx=PADX, pady=PADY)
         cancel_order_button = ttk.Button(left_frame2, text="Cancel Order", command=lambda: cancel_order(right_frame2))
         cancel_order_button.grid(row=2, column=1, padx=PADX, pady=PADY)
+        self.create_auto_refresh(waiter_window, left_frame2, right_frame2, active_orders_view, show_active_orders)
 
         # Third tab buttons
         finished_orders_button = ttk.Button(left_frame3, text="Show Finished Orders",
@@ -1120,6 +1285,9 @@ class GUI:
         drinks_button = ttk.Button(left_frame1, text="Drinks", command=lambda: show_menu(right_frame1, "drinks"))
         drinks_button.grid(row=3, column=1, padx=PADX, pady=PADY)
 
+        # Active orders TableView and the change cursor it is up to date with
+        active_orders_view = {"table": None, "cursor": 0}
+
         # Order related Buttons
         @handle_errors
         def order_ready(frame):
@@ -1146,31 +1314,22 @@ class GUI:
             :return: None
             """
             global tree_active_orders
-            self.cleaning_frame(frame)
-            tree_active_orders = ttk.Treeview(frame, show="headings", selectmode="browse")
-            tree_active_orders["columns"] = (
-                "Order ID", "Table No", "Total Price", "Order Date", "Order Hour", "Items")
-            tree_active_orders.column("Order ID", anchor="center", width=80)
-            tree_active_orders.column("Table No", anchor="center", width=100)
-            tree_active_orders.column("Total Price", anchor="center", width=100)
-            tree_active_orders.column("Order Date", anchor="center", width=100)
-            tree_active_orders.column("Order Hour", anchor="center", width=100)
-            tree_active_orders.column("Items", anchor="center", width=300)
-            tree_active_orders.heading("Order ID", text="Order ID")
-            tree_active_orders.heading("Table No", text="Table No")
-            tree_active_orders.heading("Total Price", text="Total Price")
-            tree_active_orders.heading("Order Date", text="Order Date")
-            tree_active_orders.heading("Order Hour", text="Order Hour")
-            tree_active_orders.heading("Items", text="Items")
-            tree_active_orders.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
-
-            active_orders = self.active_orders.get_active_orders()
-            print(f"Active Orders: {active_orders}")
-            for order in active_orders:
-                table_no = self.customers.get_table_no(order[1])
-                print(f"Inserting order: {order}")
-                order_with_table = (order[0], table_no, order[2], order[3], order[4], order[5])
-                tree_active_orders.insert("", "end", values=order_with_table)
+            table = active_orders_view["table"]
+            if table is not None and table.tree.winfo_exists():
+                tree_active_orders = table.tree
+                change_cursor, added_orders, removed_order_ids = self.active_orders.get_changes(
+                    active_orders_view["cursor"])
+                table.apply_changes(added_orders, removed_order_ids)
+                active_orders_view["cursor"] = change_cursor
+                return
+
+            table = self.get_table_view(frame, ACTIVE_ORDER_COLUMNS, ORDER_COLUMN_WIDTHS)
+            tree_active_orders = table.tree
+            change_cursor, active_orders = self.active_orders.get_active_orders_snapshot()
+            logger.debug("Active orders: %s", active_orders)
+            table.set_rows(active_orders)
+            active_orders_view["table"] = table
+            active_orders_view["cursor"] = change_cursor
 
         @handle_errors
         def show_finished_orders(frame):
@@ -1180,31 +1339,7 @@ class GUI:
             :return: None
             """
             self.cleaning_frame(frame)
-            tree_finished_orders = ttk.Treeview(frame, show="headings", selectmode="browse")
-            tree_finished_orders["columns"] = (
-                "Order ID", "Table No", "Total Price", "Order Date", "Order Hour", "Prepared Hour", "Items")
-            tree_finished_orders.column("Order ID", anchor="center", width=80)
-            tree_finished_orders.column("Table No", anchor="center", width=100)
-            tree_finished_orders.column("Total Price", anchor="center", width=100)
-            tree_finished_orders.column("Order Date", anchor="center", width=100)
-            tree_finished_orders.column("Order Hour", anchor="center", width=100)
-            tree_finished_orders.column("Prepared Hour", anchor="center", width=100)
-            tree_finished_orders.column("Items", anchor="center", width=300)
-            tree_finished_orders.heading("Order ID", text="Order ID")
-            tree_finished_orders.heading("Table No", text="Table No")
-            tree_finished_orders.heading("Total Price", text="Total Price")
-            tree_finished_orders.heading("Order Date", text="Order Date")
-            tree_finished_orders.heading("Order Hour", text="Order Hour")
-            tree_finished_orders.heading("Prepared Hour", text="Prepared Hour")
-            tree_finished_orders.heading("Items", text="Items")
-            tree_finished_orders.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
-
-            finished_orders = self.finished_orders.get_finished_orders()
-            for order in finished_orders:
-                table_no = self.customers.get_table_no(order[1])
-                print(f"Inserting order: {order}")
-                order_with_table = (order[0], table_no, order[2], order[3], order[4], order[5], order[6])
-                tree_finished_orders.insert("", "end", values=order_with_table)
+            self.create_finished_orders_browser(frame)
 
         # Placing grip at the corner
         grip = ttk.Sizegrip(chef_window)
@@ -1218,38 +1353,12 @@ class GUI:
             :param item_type: (str) Expects a string
             :return: None
             """
-            self.cleaning_frame(frame)
-            self.tree_menu = ttk.Treeview(frame, show="headings", selectmode="browse")
-            self.tree_menu["columns"] = ("ID", "Type", "Name", "Price", "Ingredients")
-            self.tree_menu.column("ID", anchor="center", width=25)
-            self.tree_menu.column("Type", anchor="center", width=50)
-            self.tree_menu.column("Name", anchor="center", width=200)
-            self.tree_menu.column("Price", anchor="center", width=50)
-            self.tree_menu.column("Ingredients", anchor="center", width=400)
-            self.tree_menu.heading("ID", text="ID")
-            self.tree_menu.heading("Type", text="Type")
-            self.tree_menu.heading("Name", text="Name")
-            self.tree_menu.heading("Price", text="Price")
-            self.tree_menu.heading("Ingredients", text="Ingredients")
-            self.tree_menu.pack(padx=PADX, pady=PADY, expand=True, fill=tk.BOTH)
-
-            self.pizza = Pizza()
-            self.snack = Snack()
-            self.drink = Drink()
-
-            pizzas = self.pizza.list_products()
-            snacks = self.snack.list_products()
-            drinks = self.drink.list_products()
-
             if item_type == "pizzas":
-                for pizza in pizzas:
-                    self.tree_menu.insert("", "end", values=(pizza[0], "Pizza", pizza[2], pizza[3], pizza[4]))
+                self.show_products(frame, ("Pizza",))
             elif item_type == "snacks":
-                for snack in snacks:
-                    self.tree_menu.insert("", "end", values=(snack[0], "Snack", snack[2], snack[3], snack[4]))
+                self.show_products(frame, ("Snack",))
             else:
-                for drink in drinks:
-                    self.tree_menu.insert("", "end", values=(drink[0], "Drink", drink[2], drink[3], drink[4]))
+                self.show_products(frame, ("Drink",))
 
         # Second tab buttons
         active_orders_button = ttk.Button(left_frame2, text="Show Active Orders",
@@ -1257,6 +1366,7 @@ class GUI:
         active_orders_button.grid(row=1, column=1, padx=PADX, pady=PADY)
         order_ready_button = ttk.Button(left_frame2, text="Order Ready", command=lambda: order_ready(right_frame2))
         order_ready_button.grid(row=2, column=1, padx=PADX, pady=PADY)
+        self.create_auto_refresh(chef_window, left_frame2, right_frame2, active_orders_view, show_active_orders)
 
         # Third tab buttons
         finished_orders_button = ttk.Button(left_frame3, text="Show Finished Orders",
@@ -1277,9 +1387,7 @@ class GUI:
         """
         logo_canvas = tk.Canvas(frame, width=374, height=275)
         logo_canvas.grid(row=0, column=0, columnspan=3, padx=PADX, pady=PADY * 2)
-        manager_image = tk.PhotoImage(file="crazy_manager_logo.png")
-        logo_canvas.create_image(187, 138, image=manager_image)
-        self.manager_images.append(manager_image)
+        logo_canvas.create_image(187, 138, image=get_image(frame, "manager_logo"))
 
     def display_waiter_logo(self, frame):
         """
@@ -1289,9 +1397,7 @@ class GUI:
         """
         logo_canvas = tk.Canvas(frame, width=374, height=275)
         logo_canvas.grid(row=0, column=0, columnspan=3, padx=PADX, pady=PADY * 2)
-        waiter_image = tk.PhotoImage(file="crazy_waiter_logo.png")
-        logo_canvas.create_image(187, 138, image=waiter_image)
-        self.waiter_images.append(waiter_image)
+        logo_canvas.create_image(187, 138, image=get_image(frame, "waiter_logo"))
 
     def display_chef_logo(self, frame):
         """
@@ -1301,20 +1407,37 @@ class GUI:
         """
         logo_canvas = tk.Canvas(frame, width=374, height=275)
         logo_canvas.grid(row=0, column=0, columnspan=3, padx=PADX, pady=PADY * 2)
-        chef_image = tk.PhotoImage(file="crazy_chef_logo.png")
-        logo_canvas.create_image(187, 138, image=chef_image)
-        self.chef_images.append(chef_image)
+        logo_canvas.create_image(187, 138, image=get_image(frame, "chef_logo"))
 
 
 def main():
+    configure_logging()
+    configure_pool(size=DB_POOL_SIZE)
+    start_profiling_from_environment()
+    try:
+        # Only the terminal configured with CRAZY_PIZZA_ARCHIVE_DAYS archives, otherwise run python archive.py
+        archive_from_environment()
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logger.error("Finished orders could not be archived: %s", e)
+    app = None
     try:
         window = tk.Tk()
         app = GUI(window)
         app.window.mainloop()
     except Exception as e:
-        print(f"Error: {e}")
+        logger.exception("Application error: %s", e)
     finally:
-        app.pizzas.close_connection()
+        try:
+            if app is not None:
+                try:
+                    maintain_indexes(app.active_orders.conn)
+                except sqlite3.Error as e:
+                    logger.error("Database maintenance failed: %s", e)
+                app.pizzas.close_connection()
+        finally:
+            # The pool and the profiling dump are closed even if the cleanup above fails
+            get_pool().close_all()
+            stop_profiling()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,122 @@
+import bisect
+import re
+import unicodedata
+
+# Constant values
+SEARCH_LIMIT = 10
+# Score of a term matching a word of the product name, the ingredients count once
+NAME_WEIGHT = 3
+INGREDIENT_WEIGHT = 1
+# Multipliers of the exact, prefix and one-typo matches of a term
+EXACT_MATCH = 3
+PREFIX_MATCH = 2
+TYPO_MATCH = 1
+# Shorter terms are only matched exactly or as a prefix, one typo in them matches too many words
+MIN_TYPO_LENGTH = 4
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize(text):
+    """
+    Lowercases a text and removes its accents, so "Jalapeño" and "jalapeno" are the same word.
+    :param text: (str)
+    :return: (str)
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    """
+    Splits a text into normalized words.
+    :param text: (str)
+    :return: (list) Words in text order.
+    """
+    return WORD_PATTERN.findall(normalize(text or ""))
+
+
+def deletes(word):
+    """
+    Returns the word and every variant with one character deleted. Two words within one edit of each other share at
+    least one of these variants.
+    :param word: (str)
+    :return: (set) Variants
+    """
+    return {word} | {word[:index] + word[index + 1:] for index in range(len(word))}
+
+
+class MenuSearchIndex:
+    """
+    Class representing an in-memory inverted index over the names and ingredients of the menu products.
+    It is built from the rows of the menu catalog and answers prefix and one-typo queries without touching the
+    database. The index is immutable, a changed menu gets a new index.
+    """
+    def __init__(self, products):
+        """
+        Initialize a menu search index instance.
+        :param products: (iterable) (id, type, name, price, ingredients) rows of the menu catalog.
+        """
+        self.products = {}
+        self.postings = {}
+        for product in products:
+            key = (product[1], product[0])
+            self.products[key] = product
+            for words, weight in ((tokenize(product[2]), NAME_WEIGHT), (tokenize(product[4]), INGREDIENT_WEIGHT)):
+                for word in words:
+                    weights = self.postings.setdefault(word, {})
+                    weights[key] = max(weights.get(key, 0), weight)
+        self.words = sorted(self.postings)
+        self.typo_variants = {}
+        for word in self.words:
+            if len(word) >= MIN_TYPO_LENGTH - 1:
+                for variant in deletes(word):
+                    self.typo_variants.setdefault(variant, set()).add(word)
+
+    def matching_words(self, term):
+        """
+        Returns the indexed words that match a search term, with the multiplier of the match.
+        :param term: (str) Normalized search term.
+        :return: (dict) Word as key and EXACT_MATCH, PREFIX_MATCH or TYPO_MATCH as value.
+        """
+        matches = {}
+        if len(term) >= MIN_TYPO_LENGTH:
+            for variant in deletes(term):
+                for word in self.typo_variants.get(variant, ()):
+                    matches[word] = TYPO_MATCH
+        start = bisect.bisect_left(self.words, term)
+        for word in self.words[start:]:
+            if not word.startswith(term):
+                break
+            matches[word] = PREFIX_MATCH
+        if term in self.postings:
+            matches[term] = EXACT_MATCH
+        return matches
+
+    def search(self, query, product_type=None, limit=SEARCH_LIMIT):
+        """
+        Returns the products whose name or ingredients match every term of the query, best match first.
+        Each term matches a word exactly, as a prefix (for type-ahead) or with one typo.
+        :param query: (str) Search text.
+        :param product_type: (int) Only returns products of this type. None searches the whole menu.
+        :param limit: (int) Maximum number of products.
+        :return: (list) (id, type, name, price, ingredients) rows
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for word, multiplier in self.matching_words(term).items():
+                for key, weight in self.postings[word].items():
+                    if product_type is None or key[0] == product_type:
+                        term_scores[key] = max(term_scores.get(key, 0), weight * multiplier)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {key: score + term_scores[key] for key, score in scores.items() if key in term_scores}
+            if not scores:
+                return []
+        ranked = sorted(scores, key=lambda key: (-scores[key], self.products[key][2]))
+        return [self.products[key] for key in ranked[:limit]]
@@ -0,0 +1,165 @@
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from error_handling import get_logger
+
+# Constant values
+POLL_INTERVAL_MS = 2000
+MAX_POLL_INTERVAL_MS = 15000
+POLL_BACKOFF = 1.5
+DRAIN_INTERVAL_MS = 200
+
+logger = get_logger("order_polling")
+
+
+class OrderPoller:
+    """
+    Class representing an auto refresh of the active orders views.
+    A worker thread with its own database connection polls the order change feed and queues the changes. The Tk main
+    thread picks them up through window.after, so the user interface never waits on SQLite.
+    """
+    def __init__(self, window, on_changes, interval_ms=POLL_INTERVAL_MS, max_interval_ms=MAX_POLL_INTERVAL_MS,
+                 backoff=POLL_BACKOFF):
+        """
+        Initialize an order poller instance.
+        :param window: (obj) Expects a tkinter window instance that schedules the callbacks.
+        :param on_changes: (callable) Called on the main thread with (change_cursor, added_orders, removed_order_ids).
+        :param interval_ms: (int) Polling interval while orders keep changing.
+        :param max_interval_ms: (int) Longest polling interval when nothing changes.
+        :param backoff: (float) Factor the interval grows by after every poll without changes.
+        """
+        if interval_ms <= 0 or max_interval_ms < interval_ms or backoff < 1:
+            raise ValueError("Invalid polling interval or backoff")
+        self.window = window
+        self.on_changes = on_changes
+        self.interval_ms = interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.backoff = backoff
+        self.current_interval_ms = interval_ms
+        self.change_cursor = 0
+        self._queue = queue.Queue()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._after_id = None
+        self._lock = threading.Lock()
+        self._stats = {"polls": 0, "errors": 0, "deliveries": 0, "last_poll_at": None,
+                       "last_lag": 0.0, "max_lag": 0.0, "total_lag": 0.0}
+
+    def start(self, change_cursor):
+        """
+        Starts polling the changes made after a change cursor.
+        :param change_cursor: (int) Change cursor the view is up to date with.
+        :return: None
+        """
+        if self._thread is not None:
+            return
+        self.change_cursor = change_cursor
+        # Every run gets its own event, so a worker that is still finishing its last wait cannot be revived
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop_event,), name="OrderPoller", daemon=True)
+        self._thread.start()
+        self._after_id = self.window.after(DRAIN_INTERVAL_MS, self._drain)
+
+    def stop(self):
+        """
+        Stops the worker thread and the scheduled callbacks.
+        :return: None
+        """
+        self._stop_event.set()
+        self._thread = None
+        if self._after_id is not None:
+            try:
+                self.window.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def is_running(self):
+        """
+        Checks whether the poller is running.
+        :return: Boolean
+        """
+        return self._thread is not None
+
+    def _run(self, stop_event):
+        """
+        Worker thread loop. Polls the change feed and backs off while nothing changes.
+        :param stop_event: (obj) threading.Event that ends the loop.
+        :return: None
+        """
+        from orders import ActiveOrders
+
+        active_orders = ActiveOrders()
+        try:
+            while not stop_event.wait(self.current_interval_ms / 1000):
+                try:
+                    change_cursor, added_orders, removed_order_ids = active_orders.get_changes(self.change_cursor)
+                    changed_at = None
+                    if change_cursor != self.change_cursor:
+                        row = active_orders.cursor.execute('SELECT changed_at FROM order_changes WHERE id=?',
+                                                           (change_cursor,)).fetchone()
+                        changed_at = row[0] if row else None
+                except sqlite3.Error as e:
+                    logger.warning("Order change poll failed: %s", e)
+                    with self._lock:
+                        self._stats["errors"] += 1
+                    self.current_interval_ms = min(self.current_interval_ms * self.backoff, self.max_interval_ms)
+                    continue
+
+                with self._lock:
+                    self._stats["polls"] += 1
+                    self._stats["last_poll_at"] = time.time()
+                if change_cursor == self.change_cursor:
+                    self.current_interval_ms = min(self.current_interval_ms * self.backoff, self.max_interval_ms)
+                    continue
+                self.change_cursor = change_cursor
+                self.current_interval_ms = self.interval_ms
+                if not stop_event.is_set():
+                    self._queue.put((change_cursor, added_orders, removed_order_ids, changed_at))
+        finally:
+            active_orders.close_connection()
+
+    def _drain(self):
+        """
+        Main thread callback. Hands the queued changes to on_changes and reschedules itself.
+        :return: None
+        """
+        while True:
+            try:
+                change_cursor, added_orders, removed_order_ids, changed_at = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self.on_changes(change_cursor, added_orders, removed_order_ids)
+            self._record_lag(changed_at)
+        if not self._stop_event.is_set():
+            self._after_id = self.window.after(DRAIN_INTERVAL_MS, self._drain)
+
+    def _record_lag(self, changed_at):
+        """
+        Records how long a change took to reach the screen.
+        :param changed_at: (str) Time of the latest delivered change as '%Y-%m-%d %H:%M:%S'.
+        :return: None
+        """
+        if not changed_at:
+            return
+        lag = max(0.0, time.time() - datetime.strptime(changed_at, '%Y-%m-%d %H:%M:%S').timestamp())
+        with self._lock:
+            self._stats["deliveries"] += 1
+            self._stats["last_lag"] = lag
+            self._stats["max_lag"] = max(self._stats["max_lag"], lag)
+            self._stats["total_lag"] += lag
+
+    def stats(self):
+        """
+        Returns the staleness metrics of the display.
+        :return: (dict) polls, errors, deliveries, last/max/average lag between a change and its display in seconds,
+        seconds since the last successful poll and the current polling interval in milliseconds.
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_lag"] = stats["total_lag"] / stats["deliveries"] if stats["deliveries"] else 0.0
+        stats["staleness"] = time.time() - stats["last_poll_at"] if stats["last_poll_at"] else None
+        stats["current_interval_ms"] = self.current_interval_ms
+        return stats
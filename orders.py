@@ -1,7 +1,112 @@
 import sqlite3
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from database import get_connection, release_connection
+from schema import ensure_schema, bump_data_version, get_data_version, PRUNED_CHANGES_VERSION
 from customers import *
 from products import *
+from error_handling import get_logger
+from profiling import timed
+
+logger = get_logger("orders")
+
+
+# Number of finished orders fetched at a time by the finished orders browser
+FINISHED_ORDERS_PAGE_SIZE = 100
+
+# Columns shared by the order tables
+ORDER_COLUMNS = ('id', 'temp_customer_id', 'customer_id', 'total_price', 'order_taken_date', 'order_taken_hour',
+                 'order_prepared_hour', 'order_taken_at', 'order_prepared_at')
+
+# Local calendar day (days since 1970-01-01) and month (year * 12 + month - 1) of an order, computed once per order
+# when it enters the rollup so the dashboard buckets with integer arithmetic
+SALES_DAY_SQL = "CAST(julianday(order_taken_at, 'unixepoch', 'localtime') - 2440587.5 AS INTEGER)"
+SALES_MONTH_SQL = ("(CAST(strftime('%Y', order_taken_at, 'unixepoch', 'localtime') AS INTEGER) * 12 + "
+                   "CAST(strftime('%m', order_taken_at, 'unixepoch', 'localtime') AS INTEGER) - 1)")
+
+
+def epoch_bounds(start=None, end=None):
+    """
+    Converts an inclusive date range to epoch seconds for the order_taken_at columns.
+    :param start: (str) First day as 'YYYY-MM-DD', or None.
+    :param end: (str) Last day as 'YYYY-MM-DD', or None.
+    :return: (tuple) First and last local epoch second of the range (None for an open bound).
+    """
+    def midnight(day):
+        return int(datetime.combine(day, datetime.min.time()).timestamp())
+
+    start_at = None if start is None else midnight(date.fromisoformat(start))
+    end_at = None if end is None else midnight(date.fromisoformat(end) + timedelta(days=1)) - 1
+    return start_at, end_at
+
+
+# Sales rollup functions
+def add_to_daily_sales_rollup(cursor, order_id):
+    """
+    Adds a finished order to the daily sales rollup. The caller is responsible for committing, so the rollup is updated in
+    the same transaction that finishes the order.
+    :param cursor: (obj) sqlite3 cursor
+    :param order_id: (int) id of the finished order.
+    :return: None
+    """
+    cursor.execute(f'''INSERT INTO daily_sales_rollup (sales_day, sales_month, order_count, total_sales)
+                       SELECT {SALES_DAY_SQL}, {SALES_MONTH_SQL}, 1, total_price FROM finished_orders WHERE id=?
+                       ON CONFLICT (sales_day) DO UPDATE SET
+                           order_count = order_count + excluded.order_count,
+                           total_sales = total_sales + excluded.total_sales''', (order_id,))
+
+
+def rebuild_daily_sales_rollup(cursor, orders_table='finished_orders'):
+    """
+    Regenerates the daily sales rollup from the whole finished orders history. The caller is responsible for committing.
+    :param cursor: (obj) sqlite3 cursor
+    :param orders_table: (str) Table or view of the finished orders, all_finished_orders to include the archives.
+    :return: None
+    """
+    cursor.execute('DELETE FROM daily_sales_rollup')
+    cursor.execute(f'''INSERT INTO daily_sales_rollup (sales_day, sales_month, order_count, total_sales)
+                       SELECT {SALES_DAY_SQL} AS day, MIN({SALES_MONTH_SQL}), COUNT(*), SUM(total_price)
+                       FROM {orders_table}
+                       WHERE order_taken_at IS NOT NULL
+                       GROUP BY day''')
+
+
+def add_to_product_sales_rollup(cursor, order_id):
+    """
+    Adds the items of a finished order to the product sales rollup. The caller is responsible for committing.
+    :param cursor: (obj) sqlite3 cursor
+    :param order_id: (int) id of the finished order.
+    :return: None
+    """
+    cursor.execute(f'''INSERT INTO product_sales_rollup (sales_day, item_type, item_id, sales_month, item_name, units,
+                                                         revenue)
+                       SELECT {SALES_DAY_SQL}, od.item_type, od.item_id, {SALES_MONTH_SQL}, od.item_name,
+                              SUM(od.quantity), SUM(od.quantity * od.unit_price)
+                       FROM finished_orders JOIN order_details AS od ON od.order_id = finished_orders.id
+                       WHERE finished_orders.id=?
+                       GROUP BY od.item_type, od.item_id
+                       ON CONFLICT (sales_day, item_type, item_id) DO UPDATE SET
+                           item_name = excluded.item_name,
+                           units = units + excluded.units,
+                           revenue = revenue + excluded.revenue''', (order_id,))
+
+
+def rebuild_product_sales_rollup(cursor, orders_table='finished_orders', details_table='order_details'):
+    """
+    Regenerates the product sales rollup from the whole finished orders history. The caller is responsible for
+    committing.
+    :param cursor: (obj) sqlite3 cursor
+    :param orders_table: (str) Table or view of the finished orders, all_finished_orders to include the archives.
+    :param details_table: (str) Table or view of the order details, all_order_details to include the archives.
+    :return: None
+    """
+    cursor.execute('DELETE FROM product_sales_rollup')
+    cursor.execute(f'''INSERT INTO product_sales_rollup (sales_day, item_type, item_id, sales_month, item_name, units,
+                                                         revenue)
+                       SELECT {SALES_DAY_SQL} AS day, od.item_type, od.item_id, MIN({SALES_MONTH_SQL}),
+                              MAX(od.item_name), SUM(od.quantity), SUM(od.quantity * od.unit_price)
+                       FROM {orders_table} AS o JOIN {details_table} AS od ON od.order_id = o.id
+                       WHERE order_taken_at IS NOT NULL
+                       GROUP BY day, od.item_type, od.item_id''')
 
 
 class OrderDetails:
@@ -12,30 +117,11 @@ class OrderDetails:
         """
         Initialize an order details instance.
         """
-        self.conn = sqlite3.connect("pizza_restaurant.db")
+        ensure_schema()
+        self.conn = get_connection()
         self.cursor = self.conn.cursor()
-        self.create_table()
 
-    def create_table(self):
-        """
-        Creates necessary tables if they do not exist yet.
-        :return: None
-        """
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS order_details (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                order_id INTEGER,
-                item_id INTEGER,
-                item_type INTEGER,
-                item_name VARCHAR(200),
-                quantity INTEGER,
-                FOREIGN KEY (order_id) REFERENCES Orders(id),
-                FOREIGN KEY (item_type) REFERENCES Products(type),
-                FOREIGN KEY (item_id) REFERENCES Products(id)
-            )
-        ''')
-
-    def add_order_details(self, order_id, item_type, item_id, item_name, quantity):
+    def add_order_details(self, order_id, item_type, item_id, item_name, quantity, unit_price=None):
         """
         Adds the order details to which refers to the current order_id parameter.
         :param order_id: id of the order that is referenced from Orders class.
@@ -43,28 +129,47 @@ class OrderDetails:
         :param item_id: id of the product that is referenced from Product class.
         :param item_name: name of the product that is referenced from Product class.
         :param quantity: quantity of the ordered product.
+        :param unit_price: price of the product when it is ordered.
         :return: None
         """
-        self.cursor.execute('INSERT INTO order_details (order_id, item_id, item_type, item_name, quantity) VALUES (?,?,?,?,?)',
-                            (order_id, item_type, item_id, item_name, quantity))
+        self.cursor.execute('''INSERT INTO order_details (order_id, item_id, item_type, item_name, quantity, unit_price)
+                               VALUES (?,?,?,?,?,?)''',
+                            (order_id, item_type, item_id, item_name, quantity, unit_price))
         self.conn.commit()
 
+    def add_order_details_many(self, order_id, items):
+        """
+        Adds all the items of an order with a single statement. The caller is responsible for committing.
+        :param order_id: id of the order that is referenced from Orders class.
+        :param items: (iterable) (item_id, item_type, item_name, quantity, unit_price) tuples of the ordered products.
+        :return: None
+        """
+        self.cursor.executemany('''INSERT INTO order_details (order_id, item_id, item_type, item_name, quantity, unit_price)
+                                   VALUES (?,?,?,?,?,?)''',
+                                [(order_id, item_id, item_type, item_name, quantity, unit_price)
+                                 for item_id, item_type, item_name, quantity, unit_price in items])
+
     # For now, this function is obsolete
     def get_order_items(self, order_id):
         self.cursor.execute('''SELECT 
-                                o.id,
-                                P1.type,
-                                P2.name,
+                                od.order_id,
+                                p.type,
+                                p.name,
                                 od.quantity
                             FROM order_details AS od
-                            JOIN Products AS P1 ON item_type = P1.type
-                            JOIN Products AS P2 ON item_id = P2.id 
-                            JOIN Orders AS O ON order_id = O.id
+                            JOIN products AS p ON od.item_type = p.type AND od.item_id = p.id
                             WHERE od.order_id=?
                             ''', (order_id,))
         order_items = self.cursor.fetchall()
         return order_items
 
+    def close_connection(self):
+        """
+        Gives the database connection back to the connection pool.
+        :return: None
+        """
+        release_connection(self.conn)
+
 
 class Orders:
     """
@@ -76,36 +181,18 @@ class Orders:
         :param table_name (str): The table name which inherits from the orders instance
         """
         self.table_name = table_name
-        self.conn = sqlite3.connect("pizza_restaurant.db")
+        ensure_schema()
+        self.conn = get_connection()
         self.cursor = self.conn.cursor()
         self.order_details = OrderDetails()
-        self.create_table()
         self.current_time = datetime.now()
 
-    # Main order table
-    def create_table(self):
-        """
-        Creates necessary tables if they do not exist yet.
-        :return: None
-        """
-        self.cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS {self.table_name} (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                temp_customer_id INTEGER,
-                customer_id INTEGER,
-                total_price REAL NOT NULL,
-                order_taken_date DATETIME NOT NULL,
-                order_taken_hour DATETIME NOT NULL,
-                order_prepared_hour DATETIME,
-                FOREIGN KEY (temp_customer_id) REFERENCES temp_customers(id)
-                FOREIGN KEY (customer_id) REFERENCES customers(id)
-            )
-        ''')
-        self.conn.commit()
-
+    @timed
     def take_order(self, customer_type, customer_id, items, total_price):
         """
         Takes an order information given from the customer and insert the data to the related table.
+        Names and prices of the items are resolved with a single query and the whole order is written in a single
+        transaction.
         :param customer_type: (int) Type of the customer. (0 is temp_customer and 1 is perm_customer.)
         :param customer_id: (id) id of the customer.
         :param items: (iterable) Ordered items
@@ -113,73 +200,73 @@ class Orders:
         :return: None
         """
         total_price = 0  # Currently total_price is defined in the function with a default 0 value.
-        current_date = datetime.now().strftime('%Y-%m-%d')
-        current_time = datetime.now().strftime('%H:%M:%S')
-        if customer_type == 0:  # temp_customers
-            for item in items:
-                item_id, item_type, item_name, item_price, quantity = item
-                price = self.get_product_price(item_type, item_id)
-                total_price += float(price) * int(quantity)
-                item_name = self.get_product_name(item_type, item_id)
+        now = datetime.now()
+        current_date = now.strftime('%Y-%m-%d')
+        current_time = now.strftime('%H:%M:%S')
+        products = self.get_products(items)
+        order_items = []
+        for item in items:
+            item_id, item_type, item_name, item_price, quantity = item
+            item_name, price = products.get((item_type, item_id), (0, 0))
+            total_price += float(price) * int(quantity)
+            order_items.append((item_id, item_type, item_name, quantity, float(price)))
 
+        customer_column = 'temp_customer_id' if customer_type == 0 else 'customer_id'
+        try:
             self.cursor.execute(f'''INSERT INTO {self.table_name} (
-                temp_customer_id, total_price, order_taken_date, order_taken_hour) VALUES (?,?,?,?)''',
-                                (customer_id, total_price, current_date, current_time))
-            self.conn.commit()
+                {customer_column}, total_price, order_taken_date, order_taken_hour, order_taken_at) VALUES (?,?,?,?,?)''',
+                                (customer_id, total_price, current_date, current_time, int(now.timestamp())))
             order_id = self.cursor.lastrowid
-
-            for item in items:
-                item_id, item_type, item_name, item_price, quantity = item
-                item_name = self.get_product_name(item_type, item_id)
-                self.order_details.add_order_details(order_id, item_id, item_type, item_name, quantity)
-
-        else:  # perm_customers
-            for item in items:
-                item_id, item_type, item_name, item_price, quantity = item
-                price = self.get_product_price(item_type, item_id)
-                total_price += float(price) * int(quantity)
-                item_name = self.get_product_name(item_type, item_id)
-
-            self.cursor.execute(f'''INSERT INTO {self.table_name} (
-                customer_id, total_price, order_taken_date, order_taken_hour) VALUES (?,?,?,?)''',
-                                (customer_id, total_price, current_date, current_time))
-            self.conn.commit()
-            order_id = self.cursor.lastrowid
-
-            for item in items:
-                item_id, item_type, item_name, item_price, quantity = item
-                item_name = self.get_product_name(item_type, item_id)
-                self.order_details.add_order_details(order_id, item_id, item_type, item_name, quantity)
+            self.order_details.add_order_details_many(order_id, order_items)
+            self.record_change(order_id, 'added')
             self.conn.commit()
+        except sqlite3.Error:
+            # To prevent a half written order
+            self.conn.rollback()
+            raise
 
-    def get_active_orders(self):
+    @timed
+    def get_active_orders(self, order_ids=None):
         """
         Returns the orders and the details of the orders via a new query (order_details is used in the query with JOIN)
+        The table no and the customer name are resolved in the same query.
+        :param order_ids: (iterable) Optional ids to return only those orders.
         :return: All the data which responds to the query.
         """
+        where, params = '', ()
+        if order_ids is not None:
+            params = tuple(order_ids)
+            if not params:
+                return []
+            where = f"WHERE o.id IN ({','.join('?' * len(params))})"
         self.cursor.execute(f'''
         SELECT 
             o.id,
-            o.temp_customer_id,
+            tc.table_no,
+            COALESCE(c.first_name || ' ' || c.last_name, tc.first_name || ' ' || tc.last_name) AS customer_name,
             o.total_price,
             o.order_taken_date,
             o.order_taken_hour,
             GROUP_CONCAT(order_details.item_name || ' (' || order_details.quantity || ')', ', ') AS items
         FROM {self.table_name} AS o
         JOIN order_details ON o.id = order_details.order_id
-        GROUP BY o.id, o.temp_customer_id, o.total_price, o.order_taken_date, o.order_taken_hour''')
-        print("Active Orders")
+        LEFT JOIN temp_customers AS tc ON o.temp_customer_id = tc.id
+        LEFT JOIN customers AS c ON o.customer_id = c.id
+        {where}
+        GROUP BY o.id''', params)
         return self.cursor.fetchall()
 
     def get_finished_orders(self):
         """
         Returns the orders and the details of the orders via a new query (order_details is used in the query with JOIN)
+        The table no and the customer name are resolved in the same query.
         :return: All the data which responds to the query.
         """
         self.cursor.execute(f'''
         SELECT 
             o.id,
-            o.temp_customer_id,
+            tc.table_no,
+            COALESCE(c.first_name || ' ' || c.last_name, tc.first_name || ' ' || tc.last_name) AS customer_name,
             o.total_price,
             o.order_taken_date,
             o.order_taken_hour,
@@ -187,10 +274,59 @@ class Orders:
             GROUP_CONCAT(order_details.item_name || ' (' || order_details.quantity || ')', ', ') AS items
         FROM {self.table_name} AS o
         JOIN order_details ON o.id = order_details.order_id
-        GROUP BY o.id, o.temp_customer_id, o.total_price, o.order_taken_date, o.order_taken_hour, o.order_prepared_hour''')
-        print("Finished Orders")
+        LEFT JOIN temp_customers AS tc ON o.temp_customer_id = tc.id
+        LEFT JOIN customers AS c ON o.customer_id = c.id
+        GROUP BY o.id''')
+        return self.cursor.fetchall()
+
+    @timed
+    def get_finished_orders_page(self, before_id=None, limit=FINISHED_ORDERS_PAGE_SIZE, start=None, end=None,
+                                 table_no=None):
+        """
+        Returns one page of the finished orders, newest first, in the layout of get_finished_orders.
+        Pages are keyed on the order id instead of an offset, so every page costs the same however deep it is.
+        :param before_id: (int) id of the last order of the previous page. None returns the first page.
+        :param limit: (int) Number of orders in the page.
+        :param start: (str) First order date as 'YYYY-MM-DD', or None.
+        :param end: (str) Last order date as 'YYYY-MM-DD', or None.
+        :param table_no: (int) Only the orders of this table, or None.
+        :return: (list) Orders of the page.
+        """
+        conditions, params, customer_join = [], [], ''
+        if before_id is not None:
+            conditions.append('f.id < ?')
+            params.append(before_id)
+        start_at, end_at = epoch_bounds(start, end)
+        if start_at is not None:
+            conditions.append('f.order_taken_at >= ?')
+            params.append(start_at)
+        if end_at is not None:
+            conditions.append('f.order_taken_at <= ?')
+            params.append(end_at)
+        if table_no is not None:
+            customer_join = 'JOIN temp_customers AS t ON f.temp_customer_id = t.id'
+            conditions.append('t.table_no = ?')
+            params.append(table_no)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        self.cursor.execute(f'''
+        SELECT 
+            o.id,
+            tc.table_no,
+            COALESCE(c.first_name || ' ' || c.last_name, tc.first_name || ' ' || tc.last_name) AS customer_name,
+            o.total_price,
+            o.order_taken_date,
+            o.order_taken_hour,
+            o.order_prepared_hour,
+            GROUP_CONCAT(order_details.item_name || ' (' || order_details.quantity || ')', ', ') AS items
+        FROM (SELECT f.* FROM {self.table_name} AS f {customer_join} {where} ORDER BY f.id DESC LIMIT ?) AS o
+        JOIN order_details ON o.id = order_details.order_id
+        LEFT JOIN temp_customers AS tc ON o.temp_customer_id = tc.id
+        LEFT JOIN customers AS c ON o.customer_id = c.id
+        GROUP BY o.id
+        ORDER BY o.id DESC''', params + [limit])
         return self.cursor.fetchall()
 
+    @timed
     def cancel_order(self, order_id):
         """
         Cancels and removes the selected order from the database.
@@ -199,8 +335,36 @@ class Orders:
         """
         self.cursor.execute(f"DELETE FROM order_details WHERE order_id = ?", (order_id,))
         self.cursor.execute(f"DELETE FROM {self.table_name} WHERE id = ?", (order_id,))
+        self.record_change(order_id, 'cancelled')
+        bump_data_version(self.cursor)
         self.conn.commit()
 
+    def record_change(self, order_id, change_type):
+        """
+        Appends a change of an active order to the order change feed. The caller is responsible for committing, so the
+        change is written in the same transaction as the order itself.
+        :param order_id: (int) id of the order.
+        :param change_type: (str) 'added', 'finished' or 'cancelled'
+        :return: None
+        """
+        self.cursor.execute('INSERT INTO order_changes (order_id, change_type, changed_at) VALUES (?,?,?)',
+                            (order_id, change_type, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+    def get_products(self, items):
+        """
+        Gets the names and prices of the ordered items with a single query on the products table.
+        :param items: (iterable) Ordered items as (item_id, item_type, item_name, item_price, quantity) tuples.
+        :return: (dict) (item_type, item_id) as key and (name, price) as value.
+        """
+        keys = list({(item[1], item[0]) for item in items})
+        if not keys:
+            return {}
+        placeholders = ','.join('(?,?)' for _ in keys)
+        rows = self.cursor.execute(f'''SELECT type, id, name, price FROM products
+                                       WHERE (type, id) IN (VALUES {placeholders})''',
+                                   [value for key in keys for value in key]).fetchall()
+        return {(item_type, product_id): (name, price) for item_type, product_id, name, price in rows}
+
     def get_product_price(self, item_type, product_id):
         """
         Gets and returns the price of the product which has the same product_id.
@@ -208,8 +372,8 @@ class Orders:
         :param product_id: (int) id of the product.
         :return: (float) Price of the product.
         """
-        table_name = 'pizzas' if item_type == 0 else 'snacks' if item_type == 1 else 'drinks'
-        price = self.cursor.execute(f'SELECT price FROM {table_name} WHERE id=?', (product_id,)).fetchone()
+        price = self.cursor.execute('SELECT price FROM products WHERE type=? AND id=?',
+                                    (item_type, product_id)).fetchone()
         return price[0] if price else 0
 
     def get_product_name(self, item_type, product_id):
@@ -219,14 +383,22 @@ class Orders:
         :param product_id: (int) id of the product.
         :return: (str) Name of the product.
         """
-        table_name = 'pizzas' if item_type == 0 else 'snacks' if item_type == 1 else 'drinks'
-        name = self.cursor.execute(f'SELECT name FROM {table_name} WHERE id=?', (product_id,)).fetchone()
+        name = self.cursor.execute('SELECT name FROM products WHERE type=? AND id=?',
+                                   (item_type, product_id)).fetchone()
         return name[0] if name else 0
 
     # For now, this function is obsolete
     def get_order_details(self, order_id):
         return self.order_details.get_order_items(order_id)
 
+    def close_connection(self):
+        """
+        Gives the database connections of the order and its details back to the connection pool.
+        :return: None
+        """
+        self.order_details.close_connection()
+        release_connection(self.conn)
+
 
 class ActiveOrders(Orders):
     """
@@ -238,29 +410,75 @@ class ActiveOrders(Orders):
         """
         super().__init__('active_orders')
 
+    def get_change_cursor(self):
+        """
+        Returns the id of the latest change of the order change feed.
+        :return: (int) Change cursor (0 if nothing has changed yet)
+        """
+        return self.cursor.execute('SELECT COALESCE(MAX(id), 0) FROM order_changes').fetchone()[0]
+
+    def get_active_orders_snapshot(self):
+        """
+        Returns every active order together with the change cursor the listing is valid from.
+        The cursor is read first, so a change made in between is delivered again by get_changes instead of being lost.
+        :return: (tuple) Change cursor and the active orders.
+        """
+        change_cursor = self.get_change_cursor()
+        return change_cursor, self.get_active_orders()
+
+    @timed
+    def get_changes(self, since):
+        """
+        Returns the active orders added and the ones finished or cancelled after a change cursor.
+        Only the latest change of each order counts, so an order added and finished in between is only removed.
+        A cursor older than the pruned part of the feed gets every active order and None as removed ids instead.
+        :param since: (int) Change cursor returned by an earlier call or by get_active_orders_snapshot.
+        :return: (tuple) New change cursor, added orders, ids of the finished or cancelled orders.
+        """
+        if since < get_data_version(self.cursor, PRUNED_CHANGES_VERSION):
+            return self.get_active_orders_snapshot() + (None,)
+        changes = self.cursor.execute('SELECT id, order_id, change_type FROM order_changes WHERE id > ? ORDER BY id',
+                                      (since,)).fetchall()
+        if not changes:
+            return since, [], []
+
+        latest_changes = {}
+        for change_id, order_id, change_type in changes:
+            latest_changes[order_id] = change_type
+        added_ids = [order_id for order_id, change_type in latest_changes.items() if change_type == 'added']
+        removed_ids = [order_id for order_id, change_type in latest_changes.items() if change_type != 'added']
+        return changes[-1][0], self.get_active_orders(added_ids), removed_ids
+
+    @timed
     def finished_order(self, order_id):
         """
         Transfers an active order to the finished orders table and deletes it from the active orders table.
         :param order_id: (int) id of the order
         :return: Boolean
         """
-        prepared_time = datetime.now().strftime('%H:%M:%S')
+        now = datetime.now()
         if order_id:
             try:
-                self.cursor.execute(f'UPDATE active_orders SET order_prepared_hour=? WHERE id=?',
-                                    (prepared_time, order_id))
+                self.cursor.execute(f'UPDATE active_orders SET order_prepared_hour=?, order_prepared_at=? WHERE id=?',
+                                    (now.strftime('%H:%M:%S'), int(now.timestamp()), order_id))
 
-                self.cursor.execute(f'INSERT INTO finished_orders SELECT * FROM active_orders WHERE id=?', (order_id,))
+                columns = ', '.join(ORDER_COLUMNS)
+                self.cursor.execute(f'INSERT INTO finished_orders ({columns}) SELECT {columns} FROM active_orders WHERE id=?',
+                                    (order_id,))
+                add_to_daily_sales_rollup(self.cursor, order_id)
+                add_to_product_sales_rollup(self.cursor, order_id)
                 self.cursor.execute(f"DELETE FROM active_orders WHERE id = ?", (order_id,))
+                self.record_change(order_id, 'finished')
+                bump_data_version(self.cursor)
                 self.conn.commit()
                 return True
             except Exception as e:
-                print(f"Error: {e}")
+                logger.error("Order %s could not be finished: %s", order_id, e)
                 # To prevent data loss
                 self.conn.rollback()
                 return False
         else:
-            print("Error! Wrong order id!")
+            logger.error("Wrong order id: %r", order_id)
             return False
 
 
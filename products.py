@@ -1,5 +1,67 @@
+import csv
+import json
+import os
 import sqlite3
+import threading
+from database import get_connection, release_connection
+from schema import ensure_schema, bump_data_version, get_data_version
 from error_handling import *
+from menu_search import MenuSearchIndex, SEARCH_LIMIT
+
+logger = get_logger("products")
+
+# Data version counter of the products table, every terminal reloads its menu catalog when it changes
+MENU_VERSION = 'menu'
+# Product tables used before every product moved into the products table
+LEGACY_PRODUCT_TABLES = {0: 'pizzas', 1: 'snacks', 2: 'drinks'}
+
+
+def create_products_table(cursor):
+    """
+    Creates the products table keyed by (type, id) and migrates the rows of the legacy pizzas, snacks and drinks
+    tables into it. The legacy table names are kept as read-only views for compatibility.
+    :param cursor: (obj) sqlite3 cursor
+    :return: None
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            type INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            name VARCHAR(200) NOT NULL,
+            price REAL NOT NULL,
+            ingredients TEXT,
+            PRIMARY KEY (type, id)
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_products_type_name ON products (type, name)')
+    # Keeps the ids of deleted products from being reused like AUTOINCREMENT did
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_sequences (
+            type INTEGER PRIMARY KEY,
+            last_id INTEGER NOT NULL
+        )
+    ''')
+
+    has_sequence_table = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_sequence'").fetchone()
+    for product_type, table_name in LEGACY_PRODUCT_TABLES.items():
+        last_id = 0
+        if has_sequence_table:
+            sequence = cursor.execute('SELECT seq FROM sqlite_sequence WHERE name=?', (table_name,)).fetchone()
+            last_id = sequence[0] if sequence else 0
+
+        is_legacy_table = cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                                         (table_name,)).fetchone()
+        if is_legacy_table:
+            cursor.execute(f'''INSERT OR IGNORE INTO products (type, id, name, price, ingredients)
+                               SELECT ?, id, name, price, ingredients FROM {table_name}''', (product_type,))
+            cursor.execute(f'DROP TABLE {table_name}')
+
+        max_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM products WHERE type=?', (product_type,)).fetchone()[0]
+        cursor.execute('INSERT OR IGNORE INTO product_sequences (type, last_id) VALUES (?, ?)',
+                       (product_type, max(last_id, max_id)))
+        cursor.execute(f'''CREATE VIEW IF NOT EXISTS {table_name} AS
+                           SELECT id, type, name, price, ingredients FROM products WHERE type={product_type}''')
 
 
 class Product:
@@ -14,26 +76,9 @@ class Product:
         """
         self.table_name = table_name
         self.product_type = product_type
-        self.conn = sqlite3.connect("pizza_restaurant.db")
+        ensure_schema()
+        self.conn = get_connection()
         self.cursor = self.conn.cursor()
-        self.create_table()
-
-    # Main product table
-    def create_table(self):
-        """
-        Creates necessary tables if they do not exist yet.
-        :return: None
-        """
-        self.cursor.execute(f'''
-            CREATE TABLE IF NOT EXISTS {self.table_name} (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                type INTEGER NOT NULL,
-                name VARCHAR(200) NOT NULL,
-                price REAL NOT NULL,
-                ingredients TEXT 
-            )
-        ''')
-        self.conn.commit()
 
     # Product related functions
     @handle_errors
@@ -45,10 +90,14 @@ class Product:
         :param ingredients: (str) The ingredients of the product.
         :return: None
         """
-        self.cursor.execute(f'''INSERT INTO {self.table_name} (type, name, price, ingredients) 
-                            VALUES (?,?,?,?)''', (self.product_type, name, price, ingredients))
+        self.cursor.execute('UPDATE product_sequences SET last_id = last_id + 1 WHERE type=?', (self.product_type,))
+        self.cursor.execute('''INSERT INTO products (type, id, name, price, ingredients) 
+                            VALUES (?, (SELECT last_id FROM product_sequences WHERE type=?), ?, ?, ?)''',
+                            (self.product_type, self.product_type, name, price, ingredients))
+        bump_data_version(self.cursor, MENU_VERSION)
         self.conn.commit()
-        print(f"Success! product {name} added")
+        MenuRepository.invalidate()
+        logger.info("Product %s added", name)
 
     def remove_product(self, product_id):
         """
@@ -56,9 +105,11 @@ class Product:
         :param product_id: (int) id of the product
         :return: None
         """
-        self.cursor.execute(f'DELETE FROM {self.table_name} WHERE id=?', (product_id,))
+        self.cursor.execute('DELETE FROM products WHERE type=? AND id=?', (self.product_type, product_id))
+        bump_data_version(self.cursor, MENU_VERSION)
         self.conn.commit()
-        print(f"Success! product deleted.")
+        MenuRepository.invalidate()
+        logger.info("Product deleted")
 
     def update_product(self, product_id, name, price, ingredients):
         """
@@ -69,17 +120,20 @@ class Product:
         :param ingredients: (str) New ingredients of the product.
         :return: None
         """
-        self.cursor.execute(f'UPDATE {self.table_name} SET name=?, price=?, ingredients=? WHERE id=?',
-                            (name, price, ingredients, product_id))
+        self.cursor.execute('UPDATE products SET name=?, price=?, ingredients=? WHERE type=? AND id=?',
+                            (name, price, ingredients, self.product_type, product_id))
+        bump_data_version(self.cursor, MENU_VERSION)
         self.conn.commit()
-        print(f"Success! id {product_id} has been updated.")
+        MenuRepository.invalidate()
+        logger.info("Product %s updated", product_id)
 
     def list_products(self):
         """
         Lists and returns all the products.
         :return: all the products.
         """
-        products = self.cursor.execute(f'SELECT id, {self.product_type}, name, price, ingredients FROM {self.table_name}').fetchall()
+        products = self.cursor.execute('SELECT id, type, name, price, ingredients FROM products WHERE type=? ORDER BY id',
+                                       (self.product_type,)).fetchall()
         return products
 
     def select_product(self, product_id):
@@ -88,18 +142,19 @@ class Product:
         :param product_id: id of the product.
         :return: referring product
         """
-        product = self.cursor.execute(f'''SELECT id, {self.product_type}, name, price, ingredients 
-                                            FROM {self.table_name} WHERE name=?''', (product_id,)).fetchone()
+        product = self.cursor.execute('''SELECT id, type, name, price, ingredients 
+                                            FROM products WHERE type=? AND name=?''',
+                                      (self.product_type, product_id)).fetchone()
         return product
 
     # Closing database connection
     def close_connection(self):
         """
-        Closes the database connection.
+        Gives the database connection back to the connection pool.
         :return: None
         """
-        self.conn.close()
-        print("Database connection closed.")
+        release_connection(self.conn)
+        logger.debug("Database connection released")
 
 
 # Product instances
@@ -134,3 +189,273 @@ class Drink(Product):
         Initialize a drink product instance.
         """
         super().__init__('drinks', 2)
+
+
+# Product type names as they appear in the GUI
+PRODUCT_TYPES = {"Pizza": 0, "Snack": 1, "Drink": 2}
+
+
+class MenuRepository:
+    """
+    Class representing the in-memory menu catalog of the restaurant.
+    The catalog is loaded once from the products table and reloaded only after a product is added, updated or
+    removed, so showing the menu only reads the menu data version while the menu is unchanged. The version is shared
+    through the database, so a change made by another terminal reloads the catalog too.
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        """
+        Initialize a menu repository instance.
+        """
+        self.products = {0: Pizza(), 1: Snack(), 2: Drink()}
+        self._catalog = None
+        self._version = None
+        self._search_index = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Returns the menu repository of the process, creating it on the first call.
+        :return: (obj) MenuRepository instance
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @classmethod
+    def invalidate(cls):
+        """
+        Marks the catalog as stale so it is reloaded on the next read.
+        :return: None
+        """
+        if cls._instance is not None:
+            with cls._instance._lock:
+                cls._instance._catalog = None
+
+    def _get_catalog(self):
+        """
+        Returns the catalog, loading every product type with a single query if it is stale or if the menu data
+        version changed since it was loaded.
+        :return: (dict) Product type as key and the list of its products as value.
+        """
+        with self._lock:
+            cursor = self.products[0].cursor
+            version = get_data_version(cursor, MENU_VERSION)
+            if self._catalog is None or self._version != version:
+                catalog = {product_type: [] for product_type in self.products}
+                rows = cursor.execute('SELECT id, type, name, price, ingredients FROM products ORDER BY type, id')
+                for row in rows.fetchall():
+                    catalog.setdefault(row[1], []).append(row)
+                self._catalog = catalog
+                self._version = version
+            return self._catalog
+
+    def list_products(self, product_type):
+        """
+        Lists and returns all the products of a product type.
+        :param product_type: (int) Type of the product.
+        :return: all the products of the type.
+        """
+        return list(self._get_catalog().get(product_type, []))
+
+    def select_product(self, product_type, name):
+        """
+        Selects and returns the product that matches the product type and name.
+        :param product_type: (int) Type of the product.
+        :param name: (str) Name of the product.
+        :return: referring product or None
+        """
+        for product in self._get_catalog().get(product_type, []):
+            if product[2] == name:
+                return product
+        return None
+
+    def search(self, query, product_type=None, limit=SEARCH_LIMIT):
+        """
+        Searches the names and ingredients of the products with prefix and one-typo matching.
+        The search index is built from the catalog and rebuilt after the menu changes.
+        :param query: (str) Search text.
+        :param product_type: (int) Only returns products of this type. None searches the whole menu.
+        :param limit: (int) Maximum number of products.
+        :return: (list) Matching products, best match first.
+        """
+        catalog = self._get_catalog()
+        with self._lock:
+            # The index belongs to the catalog it was built from
+            if self._search_index is None or self._search_index[0] is not catalog:
+                products = (product for catalog_products in catalog.values() for product in catalog_products)
+                self._search_index = (catalog, MenuSearchIndex(products))
+            search_index = self._search_index[1]
+        return search_index.search(query, product_type, limit)
+
+
+# Columns of the menu files read by import_menu and written by export_menu
+MENU_FIELDS = ("type", "name", "price", "ingredients")
+MENU_FORMATS = (".csv", ".json")
+MAX_REPORTED_ERRORS = 10
+
+
+def menu_file_format(path):
+    """
+    Returns the format of a menu file from its extension.
+    :param path: (str) File path ending with .csv or .json
+    :return: (str) '.csv' or '.json'
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in MENU_FORMATS:
+        raise ValueError(f"Unsupported menu file format: {extension or path}")
+    return extension
+
+
+def read_menu_file(path):
+    """
+    Reads the rows of a CSV file with a header line or of a JSON file holding a list of objects.
+    A byte order mark, which spreadsheet programs write at the start of UTF-8 files, is skipped.
+    :param path: (str) File path ending with .csv or .json
+    :return: (list) One dict per product.
+    """
+    file_format = menu_file_format(path)
+    with open(path, newline='', encoding='utf-8-sig') as file:
+        if file_format == ".csv":
+            return list(csv.DictReader(file))
+        rows = json.load(file)
+    if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+        raise ValueError("A JSON menu file must hold a list of objects")
+    return rows
+
+
+def validate_menu_rows(rows):
+    """
+    Validates the rows of a menu file and converts them to product values.
+    Every row is checked before anything is written, so a file with one bad row changes nothing.
+    :param rows: (iterable) Dicts with the MENU_FIELDS keys. The type is a PRODUCT_TYPES name or number.
+    :return: (list) (type, name, price, ingredients) tuples
+    """
+    product_type_ids = set(PRODUCT_TYPES.values())
+    products, errors, seen = [], [], set()
+    for line, row in enumerate(rows, start=1):
+        product_type = row.get("type")
+        if isinstance(product_type, str):
+            product_type = PRODUCT_TYPES.get(product_type.strip().title(), product_type)
+        try:
+            product_type = int(product_type)
+        except (TypeError, ValueError):
+            pass
+        name = str(row.get("name") or "").strip()
+        ingredients = row.get("ingredients") or ""
+        try:
+            price = float(row.get("price"))
+        except (TypeError, ValueError):
+            price = None
+
+        if product_type not in product_type_ids:
+            errors.append(f"row {line}: unknown product type {row.get('type')!r}")
+        elif not name:
+            errors.append(f"row {line}: missing product name")
+        elif price is None or price < 0:
+            errors.append(f"row {line}: invalid price {row.get('price')!r}")
+        elif (product_type, name) in seen:
+            errors.append(f"row {line}: duplicate product {name!r}")
+        else:
+            seen.add((product_type, name))
+            products.append((product_type, name, price, str(ingredients)))
+    if errors:
+        more = f"\n... and {len(errors) - MAX_REPORTED_ERRORS} more" if len(errors) > MAX_REPORTED_ERRORS else ""
+        raise ValueError("Invalid menu file:\n" + "\n".join(errors[:MAX_REPORTED_ERRORS]) + more)
+    return products
+
+
+def upsert_products(cursor, products):
+    """
+    Updates the products that already exist with the same type and name and adds the others with new ids.
+    Runs two executemany statements and does not commit, the caller owns the transaction.
+    :param cursor: (obj) sqlite3 cursor
+    :param products: (list) (type, name, price, ingredients) tuples
+    :return: (tuple) Numbers of added and updated products.
+    """
+    existing = {(product_type, name): product_id
+                for product_type, product_id, name in cursor.execute('SELECT type, id, name FROM products')}
+    updates, inserts = [], {}
+    for product_type, name, price, ingredients in products:
+        if (product_type, name) in existing:
+            updates.append((price, ingredients, product_type, existing[(product_type, name)]))
+        else:
+            inserts.setdefault(product_type, []).append((name, price, ingredients))
+
+    cursor.executemany('UPDATE products SET price=?, ingredients=? WHERE type=? AND id=?', updates)
+    new_rows = []
+    for product_type, rows in inserts.items():
+        # Reserves one block of ids per product type
+        cursor.execute('UPDATE product_sequences SET last_id = last_id + ? WHERE type=?', (len(rows), product_type))
+        last_id = cursor.execute('SELECT last_id FROM product_sequences WHERE type=?', (product_type,)).fetchone()[0]
+        first_id = last_id - len(rows) + 1
+        new_rows.extend((product_type, first_id + offset, name, price, ingredients)
+                        for offset, (name, price, ingredients) in enumerate(rows))
+    cursor.executemany('INSERT INTO products (type, id, name, price, ingredients) VALUES (?, ?, ?, ?, ?)', new_rows)
+    return len(new_rows), len(updates)
+
+
+def import_menu(path):
+    """
+    Imports a CSV or JSON menu file into the products table in a single transaction.
+    Products are matched by type and name: the matching ones get the new price and ingredients, the others are added.
+    :param path: (str) File path ending with .csv or .json
+    :return: (tuple) Numbers of added and updated products.
+    """
+    products = validate_menu_rows(read_menu_file(path))
+    ensure_schema()
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            added, updated = upsert_products(cursor, products)
+            bump_data_version(cursor, MENU_VERSION)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    finally:
+        release_connection(conn)
+    MenuRepository.invalidate()
+    logger.info("Menu imported from %s: %d products added, %d updated", path, added, updated)
+    return added, updated
+
+
+def export_menu(path):
+    """
+    Writes every product to a CSV or JSON menu file that import_menu reads back.
+    The rows are streamed from the cursor, so the whole menu is never held in memory.
+    :param path: (str) File path ending with .csv or .json
+    :return: (int) Number of exported products.
+    """
+    file_format = menu_file_format(path)
+    type_names = {product_type: name for name, product_type in PRODUCT_TYPES.items()}
+    ensure_schema()
+    conn = get_connection()
+    count = 0
+    try:
+        rows = conn.execute('SELECT type, name, price, ingredients FROM products ORDER BY type, id')
+        with open(path, "w", newline='', encoding='utf-8') as file:
+            if file_format == ".csv":
+                writer = csv.writer(file)
+                writer.writerow(MENU_FIELDS)
+            else:
+                file.write("[")
+            for product_type, name, price, ingredients in rows:
+                row = (type_names.get(product_type, product_type), name, price, ingredients)
+                if file_format == ".csv":
+                    writer.writerow(row)
+                else:
+                    file.write(("," if count else "") + "\n  " + json.dumps(dict(zip(MENU_FIELDS, row))))
+                count += 1
+            if file_format == ".json":
+                file.write("\n]\n")
+    finally:
+        release_connection(conn)
+    logger.info("%d products exported to %s", count, path)
+    return count
@@ -0,0 +1,258 @@
+import bisect
+import csv
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+# Constant values
+PROFILE_ENV = "CRAZY_PIZZA_PROFILE"
+PROFILE_DUMP_ENV = "CRAZY_PIZZA_PROFILE_DUMP"
+PROFILE_DUMP_INTERVAL_ENV = "CRAZY_PIZZA_PROFILE_DUMP_INTERVAL"
+PROFILE_DUMP_INTERVAL = 60
+# Upper bounds of the histogram buckets in milliseconds, the last bucket holds the slower calls
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+SQL_NAME_LENGTH = 120
+STATS_FIELDS = ("kind", "name", "count", "total_ms", "mean_ms", "min_ms", "max_ms", "p50_ms", "p90_ms", "p99_ms")
+
+
+class Histogram:
+    """
+    Class representing the wall time distribution of one function or SQL statement.
+    """
+    def __init__(self):
+        """
+        Initialize an empty histogram.
+        """
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def add(self, elapsed_ms):
+        """
+        Records one call.
+        :param elapsed_ms: (float) Wall time of the call in milliseconds.
+        :return: None
+        """
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, elapsed_ms)] += 1
+        self.count += 1
+        self.total += elapsed_ms
+        self.min = min(self.min, elapsed_ms)
+        self.max = max(self.max, elapsed_ms)
+
+    def percentile(self, fraction):
+        """
+        Estimates a percentile as the upper bound of the bucket that holds it, capped by the slowest call.
+        :param fraction: (float) Percentile between 0 and 1.
+        :return: (float) Milliseconds
+        """
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return min(HISTOGRAM_BOUNDS_MS[index], self.max) if index < len(HISTOGRAM_BOUNDS_MS) else self.max
+        return self.max
+
+
+class Profiler:
+    """
+    Class representing the in-process timing statistics of the decorated functions and the SQL statements.
+    Recording is off unless the profiling mode is enabled, and then costs one clock read and one dictionary lookup.
+    """
+    def __init__(self):
+        """
+        Initialize a profiler instance.
+        """
+        self.enabled = os.environ.get(PROFILE_ENV, "") not in ("", "0")
+        self._histograms = {}
+        self._lock = threading.Lock()
+        self._dump_timer = None
+
+    def record(self, kind, name, elapsed):
+        """
+        Records the wall time of one call.
+        :param kind: (str) "function" or "sql"
+        :param name: (str) Qualified function name or normalized SQL statement.
+        :param elapsed: (float) Seconds
+        :return: None
+        """
+        with self._lock:
+            histogram = self._histograms.get((kind, name))
+            if histogram is None:
+                histogram = self._histograms[(kind, name)] = Histogram()
+            histogram.add(elapsed * 1000)
+
+    def reset(self):
+        """
+        Drops every recorded histogram.
+        :return: None
+        """
+        with self._lock:
+            self._histograms.clear()
+
+    def stats(self):
+        """
+        Returns the statistics table, slowest total time first.
+        :return: (list) One dict per function or statement with the STATS_FIELDS keys.
+        """
+        with self._lock:
+            rows = [{"kind": kind, "name": name, "count": histogram.count, "total_ms": round(histogram.total, 3),
+                     "mean_ms": round(histogram.total / histogram.count, 3), "min_ms": round(histogram.min, 3),
+                     "max_ms": round(histogram.max, 3), "p50_ms": round(histogram.percentile(0.5), 3),
+                     "p90_ms": round(histogram.percentile(0.9), 3), "p99_ms": round(histogram.percentile(0.99), 3)}
+                    for (kind, name), histogram in self._histograms.items()]
+        return sorted(rows, key=lambda row: row["total_ms"], reverse=True)
+
+    def stats_table(self, limit=None):
+        """
+        Returns the statistics as aligned text.
+        :param limit: (int) Number of rows, None for all of them.
+        :return: (str) Text table
+        """
+        rows = self.stats()[:limit]
+        lines = [f"{'kind':<8} {'count':>7} {'total ms':>10} {'mean ms':>9} {'p50 ms':>8} {'p90 ms':>8} "
+                 f"{'p99 ms':>8} {'max ms':>9}  name"]
+        for row in rows:
+            lines.append(f"{row['kind']:<8} {row['count']:>7} {row['total_ms']:>10.1f} {row['mean_ms']:>9.2f} "
+                         f"{row['p50_ms']:>8} {row['p90_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>9.2f}  {row['name']}")
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """
+        Writes the statistics to a JSON or CSV file, chosen by the file extension.
+        :param path: (str) File path ending with .json or .csv
+        :return: None
+        """
+        rows = self.stats()
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", newline="") as file:
+            if path.endswith(".csv"):
+                writer = csv.DictWriter(file, fieldnames=STATS_FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+            else:
+                json.dump({"generated_at": time.time(), "stats": rows}, file, indent=2)
+        # Readers never see a half written dump
+        os.replace(temp_path, path)
+
+    def start_periodic_dump(self, path, interval=PROFILE_DUMP_INTERVAL):
+        """
+        Dumps the statistics every interval seconds on a daemon thread.
+        :param path: (str) File path ending with .json or .csv
+        :param interval: (float) Seconds between two dumps.
+        :return: None
+        """
+        self.stop_periodic_dump()
+
+        def dump_and_reschedule():
+            self.dump(path)
+            self._dump_timer = threading.Timer(interval, dump_and_reschedule)
+            self._dump_timer.daemon = True
+            self._dump_timer.start()
+
+        self._dump_timer = threading.Timer(interval, dump_and_reschedule)
+        self._dump_timer.daemon = True
+        self._dump_timer.start()
+
+    def stop_periodic_dump(self):
+        """
+        Stops the periodic dump.
+        :return: None
+        """
+        if self._dump_timer is not None:
+            self._dump_timer.cancel()
+            self._dump_timer = None
+
+
+profiler = Profiler()
+
+
+def enable_profiling(enabled=True):
+    """
+    Turns the profiling mode on or off. SQL statements are only timed on the connections opened while it is on.
+    :param enabled: (bool)
+    :return: None
+    """
+    profiler.enabled = enabled
+
+
+def start_profiling_from_environment():
+    """
+    Starts the periodic dump configured with CRAZY_PIZZA_PROFILE_DUMP and CRAZY_PIZZA_PROFILE_DUMP_INTERVAL when the
+    profiling mode is on.
+    :return: None
+    """
+    path = os.environ.get(PROFILE_DUMP_ENV)
+    if profiler.enabled and path:
+        profiler.start_periodic_dump(path, float(os.environ.get(PROFILE_DUMP_INTERVAL_ENV, PROFILE_DUMP_INTERVAL)))
+
+
+def stop_profiling(path=None):
+    """
+    Stops the periodic dump and writes the last statistics.
+    :param path: (str) Dump file path. Defaults to CRAZY_PIZZA_PROFILE_DUMP.
+    :return: None
+    """
+    profiler.stop_periodic_dump()
+    path = path or os.environ.get(PROFILE_DUMP_ENV)
+    if profiler.enabled and path:
+        profiler.dump(path)
+
+
+def timed(func):
+    """
+    Decorator that records the wall time of a model method or function while the profiling mode is on.
+    """
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.record("function", name, time.perf_counter() - started)
+    return wrapper
+
+
+def sql_name(sql):
+    """
+    Returns the statement name used in the statistics: the SQL text on one line, shortened.
+    :param sql: (str) SQL statement
+    :return: (str)
+    """
+    return " ".join(sql.split())[:SQL_NAME_LENGTH]
+
+
+class TimedCursor(sqlite3.Cursor):
+    """
+    Cursor that records the wall time of its statements. Fetching the rows is not included.
+    """
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            profiler.record("sql", sql_name(sql), time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            profiler.record("sql", sql_name(sql), time.perf_counter() - started)
+
+
+class TimedConnection(sqlite3.Connection):
+    """
+    Connection whose cursors, including the ones of Connection.execute, are TimedCursor instances.
+    """
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
@@ -0,0 +1,449 @@
+import logging
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+# Orders tables share the same layout
+ORDER_TABLES = ('active_orders', 'finished_orders', 'canceled_orders')
+# Hours the order change feed keeps its changes, a screen whose change cursor is older reloads every active order
+ORDER_CHANGE_RETENTION_HOURS = 24
+# Data version counter holding the id of the latest pruned order change
+PRUNED_CHANGES_VERSION = 'order_changes_pruned'
+
+# Child of the application logger configured in error_handling
+logger = logging.getLogger("crazy_pizza.schema")
+
+
+def table_exists(cursor, table_name):
+    """
+    Checks whether a table exists in the database.
+    :param cursor: (obj) sqlite3 cursor
+    :param table_name: (str) Name of the table.
+    :return: Boolean
+    """
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table_name,)).fetchone() is not None
+
+
+def add_column(cursor, table_name, column_name, definition):
+    """
+    Adds a column to a table unless the table already has it, so a migration can run on any existing database.
+    :param cursor: (obj) sqlite3 cursor
+    :param table_name: (str) Name of the table.
+    :param column_name: (str) Name of the new column.
+    :param definition: (str) Type and constraints of the new column.
+    :return: Boolean (True if the column is added)
+    """
+    columns = {row[1] for row in cursor.execute(f'PRAGMA table_info({table_name})')}
+    if column_name in columns:
+        return False
+    cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}')
+    return True
+
+
+# Migrations
+def create_initial_tables(cursor):
+    """
+    Creates the customer, order and order details tables.
+    :param cursor: (obj) sqlite3 cursor
+    :return: None
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customers (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              first_name VARCHAR(100) NOT NULL,
+              last_name VARCHAR(100) NOT NULL,
+              email VARCHAR(200) NOT NULL,
+              address TEXT NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS temp_customers (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              table_no TINYINT NOT NULL,
+              first_name VARCHAR(100),
+              last_name VARCHAR(100)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_details (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            item_id INTEGER,
+            item_type INTEGER,
+            item_name VARCHAR(200),
+            quantity INTEGER,
+            FOREIGN KEY (order_id) REFERENCES Orders(id),
+            FOREIGN KEY (item_type, item_id) REFERENCES products(type, id)
+        )
+    ''')
+    for table_name in ORDER_TABLES:
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                temp_customer_id INTEGER,
+                customer_id INTEGER,
+                total_price REAL NOT NULL,
+                order_taken_date DATETIME NOT NULL,
+                order_taken_hour DATETIME NOT NULL,
+                order_prepared_hour DATETIME,
+                FOREIGN KEY (temp_customer_id) REFERENCES temp_customers(id)
+                FOREIGN KEY (customer_id) REFERENCES customers(id)
+            )
+        ''')
+
+
+def create_products(cursor):
+    """
+    Creates the products table and moves the legacy pizzas, snacks and drinks tables into it.
+    :param cursor: (obj) sqlite3 cursor
+    :return: None
+    """
+    from products import create_products_table
+    create_products_table(cursor)
+
+
+def create_indexes(cursor):
+    """
+    Creates the secondary indexes of the order screens and the dashboard.
+    Replaces the index_versions bookkeeping of the earlier index migrations.
+    :param cursor: (obj) sqlite3 cursor
+    :return: None
+    """
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_order_details_order_id ON order_details (order_id)')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS idx_finished_orders_taken_date
+                      ON finished_orders (order_taken_date, total_price)''')
+    for table_name in ('active_orders', 'finished_orders'):
+        cursor.execute(f'''CREATE INDEX IF NOT EXISTS idx_{table_name}_temp_customer_id
+                           ON {table_name} (temp_customer_id)''')
+        cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table_name}_customer_id ON {table_name} (customer_id)')
+    cursor.execute('DROP TABLE IF EXISTS index_versions')
+
+
+def create_order_changes(cursor):
+    """
+    Creates the order change feed. Its id is a monotonic change counter the order screens poll from.
+    :param cursor: (obj) sqlite3 cursor
+    :return: None
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS order_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER NOT NULL,
+            change_type VARCHAR(20) NOT NULL,
+            changed_at DATETIME NOT NULL
+        )
+    ''')
+
+
+def create_daily_sales_rollup(cursor):
+    """
+    Creates the daily sales rollup the dashboard reads instead of aggregating finished_orders, and fills it from history.
+    :param cursor: (obj) sqlite3 cursor
+    :return: None
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_sales_rollup (
+            sales_date DATETIME PRIMARY KEY,
+            order_count INTEGER NOT NULL,
+            total_sales REAL NOT NULL
+        )
+    ''')
+    cursor.execute('''INSERT OR REPLACE INTO daily_sales_rollup (sales_date, order_count, total_sales)
+                      SELECT order_taken_date, COUNT(*), SUM(total_price) FROM finished_orders
+                      GROUP BY order_taken_date''')
+
+
+def create_data_versions(cursor):
+    """
+    Creates the data version counters the dashboard cache is validated against.
+    :param cursor: (obj) sqlite3 cursor
+    :return: None
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            name VARCHAR(50) PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO data_versions (name, version) VALUES ('sales', 0)")
+
+
+def bump_data_version(cursor, name='sales'):
+    """
+    Increases a data version counter. Caches built on the data compare against it to know whether they are stale.
+    The caller is responsible for committing, so the version changes in the same transaction as the data.
+    :param cursor: (obj) sqlite3 cursor
+    :param name: (str) Name of the counter.
+    :return: None
+    """
+    cursor.execute('''INSERT INTO data_versions (name, version) VALUES (?, 1)
+                      ON CONFLICT (name) DO UPDATE SET version = version + 1''', (name,))
+
+
+def get_data_version(cursor, name='sales'):
+    """
+    Returns the current value of a data version counter.
+    :param cursor: (obj) sqlite3 cursor
+    :param name: (str) Name of the counter.
+    :return: (int) Version number (0 if the counter was never increased)
+    """
+    row = cursor.execute('SELECT version FROM data_versions WHERE name=?', (name,)).fetchone()
+    return row[0] if row else 0
+
+
+def create_order_timestamps(cursor):
+    """
+    Adds epoch timestamp columns for the taken and prepared times of the orders and fills them from the date and hour
+    strings. An order prepared after midnight gets the next day. The daily sales rollup is rebuilt on integer day and
+    month numbers. Cancelled orders are deleted, their cancellation time is the changed_at of the order change feed.
+    :param cursor: (obj) sqlite3 cursor
+    :return: None
+    """
+    from orders import rebuild_daily_sales_rollup
+
+    for table_name in ORDER_TABLES:
+        for column_name in ('order_taken_at', 'order_prepared_at'):
+            add_column(cursor, table_name, column_name, 'INTEGER')
+        # The date and hour strings are local time, 'utc' converts them to epoch seconds
+        cursor.execute(f'''UPDATE {table_name} SET order_taken_at =
+                           CAST(strftime('%s', order_taken_date || ' ' || order_taken_hour, 'utc') AS INTEGER)
+                           WHERE order_taken_at IS NULL''')
+        cursor.execute(f'''UPDATE {table_name} SET order_prepared_at =
+                           CAST(strftime('%s', order_taken_date || ' ' || order_prepared_hour, 'utc') AS INTEGER)
+                           + CASE WHEN order_prepared_hour < order_taken_hour THEN 86400 ELSE 0 END
+                           WHERE order_prepared_at IS NULL AND order_prepared_hour IS NOT NULL''')
+    cursor.execute('DROP INDEX IF EXISTS idx_finished_orders_taken_date')
+    cursor.execute('''CREATE INDEX IF NOT EXISTS idx_finished_orders_taken_at
+                      ON finished_orders (order_taken_at, total_price)''')
+
+    cursor.execute('DROP TABLE IF EXISTS daily_sales_rollup')
+    cursor.execute('''
+        CREATE TABLE daily_sales_rollup (
+            sales_day INTEGER PRIMARY KEY,
+            sales_month INTEGER NOT NULL,
+            order_count INTEGER NOT NULL,
+            total_sales REAL NOT NULL
+        )
+    ''')
+    rebuild_daily_sales_rollup(cursor)
+
+
+def create_product_sales_rollup(cursor):
+    """
+    Stores the unit price of the ordered items and creates the per day and per product sales rollup of the dashboard.
+    The unit price of the existing items is filled from the current menu prices.
+    :param cursor: (obj) sqlite3 cursor
+    :return: None
+    """
+    from orders import rebuild_product_sales_rollup
+
+    add_column(cursor, 'order_details', 'unit_price', 'REAL')
+    cursor.execute('''UPDATE order_details SET unit_price =
+                      (SELECT price FROM products WHERE products.type = order_details.item_type
+                                                    AND products.id = order_details.item_id)
+                      WHERE unit_price IS NULL''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_sales_rollup (
+            sales_day INTEGER NOT NULL,
+            item_type INTEGER NOT NULL,
+            item_id INTEGER NOT NULL,
+            sales_month INTEGER NOT NULL,
+            item_name VARCHAR(200),
+            units INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (sales_day, item_type, item_id)
+        )
+    ''')
+    rebuild_product_sales_rollup(cursor)
+
+
+# Ordered schema migrations: (version, description, function)
+MIGRATIONS = [
+    (1, "initial tables", create_initial_tables),
+    (2, "unified products table", create_products),
+    (3, "order and customer indexes", create_indexes),
+    (4, "order change feed", create_order_changes),
+    (5, "daily sales rollup", create_daily_sales_rollup),
+    (6, "data version counters", create_data_versions),
+    (7, "order timestamps", create_order_timestamps),
+    (8, "product sales rollup", create_product_sales_rollup),
+]
+
+_migrated_databases = set()
+_migration_lock = threading.Lock()
+
+
+def schema_version(conn):
+    """
+    Returns the latest migration version applied to the database.
+    :param conn: (obj) sqlite3 connection
+    :return: (int) Version number (0 for an empty database)
+    """
+    if not table_exists(conn.cursor(), 'schema_version'):
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Applies every pending migration in order. Each migration runs in its own transaction together with its
+    schema_version record, so a failed migration leaves the database at the previous version.
+    :param conn: (obj) sqlite3 connection
+    :return: (list) Versions applied by this call.
+    """
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME NOT NULL
+        )
+    ''')
+    conn.commit()
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        try:
+            # Takes the write lock first so two terminals starting together do not apply the same migration
+            cursor.execute('BEGIN IMMEDIATE')
+            if cursor.execute('SELECT 1 FROM schema_version WHERE version=?', (version,)).fetchone():
+                conn.rollback()
+                continue
+            migration(cursor)
+            cursor.execute('INSERT INTO schema_version (version, description, applied_at) VALUES (?,?,?)',
+                           (version, description, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            conn.commit()
+            applied.append(version)
+            logger.info("Schema migration %d applied: %s", version, description)
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    return applied
+
+
+def ensure_schema():
+    """
+    Migrates the database of the shared connection pool once per process. Later calls do not run any SQL.
+    :return: None
+    """
+    from database import get_pool
+
+    pool = get_pool()
+    if pool.db_path in _migrated_databases:
+        return
+    with _migration_lock:
+        if pool.db_path not in _migrated_databases:
+            conn = pool.acquire()
+            try:
+                migrate(conn)
+            finally:
+                pool.release(conn)
+            _migrated_databases.add(pool.db_path)
+
+
+def prune_order_changes(conn, retention_hours=ORDER_CHANGE_RETENTION_HOURS, now=None):
+    """
+    Deletes the order changes older than the retention window. The latest change is always kept so the change cursor
+    never goes back, and the id of the latest pruned change is stored so get_changes can tell a cursor that is too
+    old to be answered from the feed.
+    :param conn: (obj) sqlite3 connection
+    :param retention_hours: (int) Hours of changes to keep.
+    :param now: (obj) datetime of now.
+    :return: (int) Number of deleted changes.
+    """
+    cutoff = ((now or datetime.now()) - timedelta(hours=retention_hours)).strftime('%Y-%m-%d %H:%M:%S')
+    cursor = conn.cursor()
+    try:
+        pruned_id = cursor.execute('''SELECT MAX(id) FROM order_changes
+                                      WHERE changed_at < ? AND id < (SELECT MAX(id) FROM order_changes)''',
+                                   (cutoff,)).fetchone()[0]
+        if pruned_id is None:
+            return 0
+        cursor.execute('DELETE FROM order_changes WHERE id <= ?', (pruned_id,))
+        deleted = cursor.rowcount
+        cursor.execute('''INSERT INTO data_versions (name, version) VALUES (?, ?)
+                          ON CONFLICT (name) DO UPDATE SET version = MAX(version, excluded.version)''',
+                       (PRUNED_CHANGES_VERSION, pruned_id))
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    logger.info("Order change feed pruned: %d changes deleted", deleted)
+    return deleted
+
+
+def maintain_indexes(conn):
+    """
+    Prunes the order change feed and lets SQLite refresh the planner statistics of the indexes that need it.
+    :param conn: (obj) sqlite3 connection
+    :return: None
+    """
+    prune_order_changes(conn)
+    conn.execute('PRAGMA optimize')
+
+
+def explain_query_plan(conn, query, params=()):
+    """
+    Returns the query plan that SQLite chooses for a query.
+    :param conn: (obj) sqlite3 connection
+    :param query: (str) SQL query
+    :param params: (iterable) Parameters of the query.
+    :return: (list) Plan steps as strings.
+    """
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()]
+
+
+def trace_query_plans(conn, func, *args, **kwargs):
+    """
+    Runs a function and returns the query plan of every SELECT statement it executes on the connection.
+    :param conn: (obj) sqlite3 connection the function works on.
+    :param func: (callable) Function to run.
+    :return: (list) (query, plan steps) tuples.
+    """
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        func(*args, **kwargs)
+    finally:
+        conn.set_trace_callback(None)
+    return [(statement, explain_query_plan(conn, statement)) for statement in statements
+            if statement.lstrip().upper().startswith(("SELECT", "WITH"))]
+
+
+def report_query_plans():
+    """
+    Prints the query plans of the order screens and the dashboard so the index usage can be checked.
+    :return: (dict) Screen name as key and its traced (query, plan steps) tuples as value.
+    """
+    from orders import ActiveOrders, FinishedOrders
+
+    active_orders = ActiveOrders()
+    finished_orders = FinishedOrders()
+    report = {
+        "Active Orders": trace_query_plans(active_orders.conn, active_orders.get_active_orders),
+        "Finished Orders": trace_query_plans(finished_orders.conn, finished_orders.get_finished_orders),
+        "Finished Orders Page": trace_query_plans(finished_orders.conn, finished_orders.get_finished_orders_page,
+                                                  1000000, start='2024-01-01', table_no=1),
+    }
+    try:
+        from dashboard import SalesData
+    except ImportError as e:
+        print(f"Dashboard plans skipped: {e}")
+    else:
+        sales_data = SalesData()
+        for period in ('Daily Sales', 'Weekly Sales', 'Monthly Sales'):
+            report[period] = trace_query_plans(sales_data.conn, sales_data.fetch_sales_data, period)
+        report["Customer Segments"] = trace_query_plans(sales_data.conn, sales_data.fetch_customer_segment_data)
+
+    for screen, queries in report.items():
+        print(f"== {screen}")
+        for query, plan in queries:
+            print(" ".join(query.split()))
+            for step in plan:
+                print(f"    {step}")
+    return report
+
+
+if __name__ == "__main__":
+    report_query_plans()
@@ -0,0 +1,201 @@
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import ttk
+
+# Constant values
+TABLE_CHUNK_SIZE = 200
+COLUMN_WIDTH = 100
+
+
+class TableView:
+    """
+    Class representing a table of rows shown in a ttk.Treeview.
+    Every row is identified by its primary key, which is also its Treeview item id, so the selection and the scroll
+    position survive a refresh. A refresh only deletes, updates and inserts the rows that changed, and new rows are
+    inserted in chunks from after_idle callbacks, so a large table never blocks the Tk main loop.
+    """
+    def __init__(self, parent, columns, widths=None, key=None, chunk_size=TABLE_CHUNK_SIZE, selectmode="browse"):
+        """
+        Initialize a table view instance. The Treeview is created but not placed, the caller packs or grids
+        TableView.tree.
+        :param parent: (obj) Expects a tkinter frame instance.
+        :param columns: (tuple) Column names, also used as headings.
+        :param widths: (dict) Column name as key and width in pixels as value.
+        :param key: (callable) Returns the primary key of a row. Defaults to the first value of the row.
+        :param chunk_size: (int) Number of rows inserted by each after_idle callback.
+        :param selectmode: (str) Treeview selectmode.
+        """
+        self.columns = tuple(columns)
+        self.key = key or (lambda row: row[0])
+        self.chunk_size = chunk_size
+        self.tree = ttk.Treeview(parent, show="headings", selectmode=selectmode)
+        self.tree["columns"] = self.columns
+        for column in self.columns:
+            self.tree.column(column, anchor="center", width=(widths or {}).get(column, COLUMN_WIDTH))
+            self.tree.heading(column, text=column)
+        # Values of every row, shown or waiting for insertion, by item id
+        self._rows = {}
+        # Rows waiting for insertion and the item id they follow ("" for the top, None for the end)
+        self._pending = OrderedDict()
+        # Item id each removed row followed, so the pending rows placed after it take its place
+        self._moved = {}
+        self._after_id = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    def row_id(self, row):
+        """
+        Returns the Treeview item id of a row.
+        :param row: (tuple) Row values.
+        :return: (str) Item id
+        """
+        return str(self.key(row))
+
+    def set_rows(self, rows):
+        """
+        Makes the table show exactly the given rows. Rows that stay keep their place.
+        :param rows: (iterable) Row values in display order.
+        :return: None
+        """
+        rows = [(self.row_id(row), tuple(row)) for row in rows]
+        new_ids = {item_id for item_id, _ in rows}
+        self.remove_rows([item_id for item_id in self._rows if item_id not in new_ids])
+        # New rows after the last kept row go to the end, the others are placed after their predecessor
+        last_kept = max((position for position, (item_id, _) in enumerate(rows) if item_id in self._rows), default=-1)
+        previous_id = ""
+        for position, (item_id, values) in enumerate(rows):
+            if item_id in self._rows:
+                self._update(item_id, values)
+            else:
+                self._queue(item_id, values, previous_id if position < last_kept else None)
+            previous_id = item_id
+        self._schedule()
+
+    def append_rows(self, rows):
+        """
+        Adds rows at the end of the table, updating the rows that are already shown.
+        :param rows: (iterable) Row values.
+        :return: None
+        """
+        for row in rows:
+            item_id, values = self.row_id(row), tuple(row)
+            if item_id in self._rows:
+                self._update(item_id, values)
+            else:
+                self._queue(item_id, values, None)
+        self._schedule()
+
+    def remove_rows(self, item_ids):
+        """
+        Removes rows with a single Treeview call.
+        :param item_ids: (iterable) Primary keys or item ids of the rows.
+        :return: None
+        """
+        shown_ids = []
+        for item_id in map(str, item_ids):
+            if self._rows.pop(item_id, None) is None:
+                continue
+            pending = self._pending.pop(item_id, None)
+            if pending is None:
+                shown_ids.append(item_id)
+                if self._pending:
+                    self._moved[item_id] = self.tree.prev(item_id)
+            elif self._pending:
+                self._moved[item_id] = pending[1]
+        if shown_ids:
+            self.tree.delete(*shown_ids)
+        if not self._pending:
+            self._moved.clear()
+
+    def apply_changes(self, added_rows, removed_ids):
+        """
+        Applies a change feed: removes the removed rows, then adds or updates the added ones.
+        :param added_rows: (iterable) Rows to insert, or to update if they are already shown.
+        :param removed_ids: (iterable) Primary keys of the removed rows. None means added_rows holds every row.
+        :return: None
+        """
+        if removed_ids is None:
+            self.set_rows(added_rows)
+            return
+        self.remove_rows(removed_ids)
+        self.append_rows(added_rows)
+
+    def clear(self):
+        """
+        Removes every row.
+        :return: None
+        """
+        self.remove_rows(list(self._rows))
+
+    def flush(self):
+        """
+        Inserts the pending rows right away.
+        :return: None
+        """
+        while self._pending:
+            self._insert_chunk()
+
+    def _update(self, item_id, values):
+        """
+        Updates the values of a row if they changed.
+        :return: None
+        """
+        if self._rows[item_id] == values:
+            return
+        self._rows[item_id] = values
+        if item_id in self._pending:
+            self._pending[item_id] = (values, self._pending[item_id][1])
+        else:
+            self.tree.item(item_id, values=values)
+
+    def _queue(self, item_id, values, previous_id):
+        """
+        Queues a new row for insertion.
+        :return: None
+        """
+        self._rows[item_id] = values
+        self._pending[item_id] = (values, previous_id)
+
+    def _insert_index(self, previous_id):
+        """
+        Returns the Treeview index of a row placed after previous_id. A removed predecessor is replaced by the row it
+        followed, and a predecessor that is not shown sends the row to the end.
+        :param previous_id: (str) Item id of the predecessor, "" for the top, None for the end.
+        :return: (int or str) Index for Treeview.insert
+        """
+        seen = set()
+        while previous_id:
+            if self.tree.exists(previous_id):
+                return self.tree.index(previous_id) + 1
+            if previous_id in seen:
+                return "end"
+            seen.add(previous_id)
+            previous_id = self._moved.get(previous_id)
+        return "end" if previous_id is None else 0
+
+    def _schedule(self):
+        """
+        Schedules the insertion of the next chunk of pending rows.
+        :return: None
+        """
+        if self._pending and self._after_id is None:
+            self._after_id = self.tree.after_idle(self._insert_chunk)
+
+    def _insert_chunk(self):
+        """
+        Inserts one chunk of pending rows and schedules the next one.
+        :return: None
+        """
+        self._after_id = None
+        try:
+            if not self.tree.winfo_exists():
+                return
+        except tk.TclError:
+            return
+        for _ in range(min(self.chunk_size, len(self._pending))):
+            item_id, (values, previous_id) = self._pending.popitem(last=False)
+            self.tree.insert("", self._insert_index(previous_id), iid=item_id, values=values)
+        if not self._pending:
+            self._moved.clear()
+        self._schedule()
@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def pool(tmp_path):
+    """
+    Points the shared connection pool at an empty database file for the duration of a test.
+    """
+    pool = database.configure_pool(str(tmp_path / "pizza_restaurant.db"))
+    yield pool
+    pool.close_all()
+    database.configure_pool()
+
+
+@pytest.fixture
+def active_orders(pool):
+    """
+    Returns an ActiveOrders instance on the test database, with one pizza on the menu.
+    """
+    from orders import ActiveOrders
+    from products import Pizza
+
+    pizza = Pizza()
+    pizza.add_product("Margherita", 10.0, "tomato, mozzarella")
+    active_orders = ActiveOrders()
+    yield active_orders
+    active_orders.close_connection()
+    pizza.close_connection()
+
+
+@pytest.fixture
+def take_orders(active_orders):
+    """
+    Returns a function that takes orders of one Margherita for a new table customer and returns their ids.
+    """
+    from customers import Customers
+
+    customers = Customers()
+
+    def take_orders(count=1):
+        order_ids = []
+        for table_no in range(1, count + 1):
+            customer_id = customers.add_temp_customer(table_no, "Guest", str(table_no))
+            active_orders.take_order(0, customer_id, [(1, 0, "Margherita", 10.0, 1)], 0)
+            order_ids.append(active_orders.cursor.execute('SELECT MAX(id) FROM active_orders').fetchone()[0])
+        return order_ids
+
+    yield take_orders
+    customers.close_connection()
@@ -0,0 +1,79 @@
+import base64
+
+import pytest
+
+from analysis_pipeline import AnalysisPipeline
+
+
+class FakeWindow:
+    """
+    Stands in for the Tk window: after callbacks are collected and run by the test.
+    """
+    def __init__(self):
+        self.callbacks = {}
+        self.next_id = 0
+
+    def after(self, ms, callback):
+        self.next_id += 1
+        self.callbacks[self.next_id] = callback
+        return self.next_id
+
+    def after_cancel(self, after_id):
+        self.callbacks.pop(after_id, None)
+
+    def run_pending(self):
+        callbacks, self.callbacks = self.callbacks, {}
+        for callback in callbacks.values():
+            callback()
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = AnalysisPipeline(FakeWindow())
+    yield pipeline
+    pipeline.shutdown()
+
+
+def collect(pipeline, analysis_type, **kwargs):
+    events = []
+    pipeline.submit(analysis_type, 400, 300, lambda message: events.append(("progress", message)),
+                    lambda kind, result: events.append((kind, result)), lambda error: events.append(("error", error)),
+                    **kwargs)
+    return events
+
+
+def finish(pipeline):
+    future = pipeline.future
+    future.result(timeout=60)
+    pipeline.window.run_pending()
+
+
+def test_figure_analysis_is_delivered_as_png(pipeline, take_orders):
+    take_orders(3)
+    events = collect(pipeline, "Daily Sales")
+    finish(pipeline)
+    assert events[0][0] == "progress"
+    kind, result = events[-1]
+    assert kind == "image"
+    assert base64.b64decode(result).startswith(b"\x89PNG")
+
+
+def test_superseded_request_is_never_delivered(pipeline, take_orders):
+    take_orders(1)
+    first_events = collect(pipeline, "Daily Sales")
+    second_events = collect(pipeline, "Monthly Sales Summary")
+    finish(pipeline)
+    assert first_events == []
+    assert second_events[-1][0] == "text"
+
+
+def test_cancelled_worker_posts_nothing(pipeline, pool):
+    pipeline.cancel()
+    pipeline._run(pipeline.generation - 1, "Daily Sales", 400, 300)
+    assert pipeline._messages.empty()
+
+
+def test_failed_analysis_is_delivered_as_error(pipeline, pool):
+    events = collect(pipeline, "Unknown Analysis")
+    finish(pipeline)
+    assert events[-1][0] == "error"
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+from datetime import date
+
+import pytest
+
+from analytics import ANALYSIS_RANGES, date_range_bounds
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_date_range_bounds_include_today():
+    assert date_range_bounds("Last 30 Days", date(2024, 3, 31)) == ("2024-03-02", "2024-03-31")
+    assert date_range_bounds("Last 365 Days", date(2024, 12, 31)) == ("2024-01-02", "2024-12-31")
+
+
+def test_all_time_has_open_bounds():
+    assert date_range_bounds("All Time") == (None, None)
+
+
+def test_unknown_range_raises():
+    with pytest.raises(KeyError):
+        date_range_bounds("Last Century")
+
+
+def test_every_range_has_bounds():
+    for range_name in ANALYSIS_RANGES:
+        start, end = date_range_bounds(range_name, date(2024, 6, 15))
+        assert (start is None) == (end is None)
+
+
+def test_facade_does_not_import_pandas():
+    code = "import analytics, sys; assert 'pandas' not in sys.modules and 'matplotlib' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT)
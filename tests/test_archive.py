@@ -0,0 +1,89 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+import archive
+from archive import OrderArchive, attach_archives, detach_archives, list_archives, archive_from_environment
+from schema import get_data_version
+
+
+@pytest.fixture
+def old_orders(active_orders, take_orders):
+    """
+    Finishes one order taken on January 1st of each year from 2010 to 2019 and returns their ids.
+    """
+    order_ids = take_orders(10)
+    for year, order_id in enumerate(order_ids, start=2010):
+        active_orders.finished_order(order_id)
+        taken_at = int(datetime(year, 1, 1, 12).timestamp())
+        active_orders.cursor.execute('UPDATE finished_orders SET order_taken_at=? WHERE id=?', (taken_at, order_id))
+    active_orders.conn.commit()
+    return order_ids
+
+
+@pytest.fixture
+def order_archive(pool, tmp_path):
+    order_archive = OrderArchive(str(tmp_path / "archives"))
+    yield order_archive
+    order_archive.close_connection()
+
+
+def test_archive_orders_moves_old_orders_and_bumps_the_sales_version(order_archive, old_orders, active_orders):
+    version = get_data_version(active_orders.cursor)
+    assert order_archive.archive_orders() == len(old_orders)
+    assert len(list_archives(order_archive.archive_dir)) == len(old_orders)
+    assert active_orders.cursor.execute('SELECT COUNT(*) FROM finished_orders').fetchone()[0] == 0
+    assert active_orders.cursor.execute('SELECT COUNT(*) FROM order_details').fetchone()[0] == 0
+    assert get_data_version(active_orders.cursor) > version
+
+
+def test_archive_pass_without_old_orders_keeps_the_sales_version(order_archive, active_orders):
+    version = get_data_version(active_orders.cursor)
+    assert order_archive.archive_orders() == 0
+    assert get_data_version(active_orders.cursor) == version
+
+
+def test_attach_archives_beyond_the_attach_limit(order_archive, old_orders, active_orders):
+    order_archive.archive_orders()
+    conn = active_orders.conn
+    names = attach_archives(conn, order_archive.archive_dir)
+    try:
+        assert len(names) == archive.MAX_ATTACHED_ARCHIVES - 1
+        order_ids = [row[0] for row in conn.execute('SELECT id FROM all_finished_orders ORDER BY id')]
+        assert order_ids == old_orders
+        assert conn.execute('SELECT COUNT(*) FROM all_order_details').fetchone()[0] == len(old_orders)
+    finally:
+        detach_archives(conn, names)
+    assert [row[1] for row in conn.execute('PRAGMA database_list')] == ['main', 'temp']
+    assert conn.execute("SELECT COUNT(*) FROM temp.sqlite_master").fetchone()[0] == 0
+
+
+def test_archive_from_environment_runs_only_when_configured(monkeypatch, pool, old_orders, active_orders):
+    monkeypatch.delenv(archive.ARCHIVE_ON_STARTUP_ENV, raising=False)
+    assert archive_from_environment() == 0
+    monkeypatch.setenv(archive.ARCHIVE_ON_STARTUP_ENV, "30")
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", "archives_from_environment")
+    assert archive_from_environment() == len(old_orders)
+
+
+def test_move_interrupted_after_the_copy_loses_no_order(monkeypatch, order_archive, old_orders, active_orders):
+    def fail():
+        raise sqlite3.OperationalError("disk I/O error")
+
+    monkeypatch.setattr(order_archive, "delete_archived_orders", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        order_archive.archive_orders()
+    cursor = active_orders.cursor
+    assert cursor.execute('SELECT COUNT(*) FROM finished_orders').fetchone()[0] == len(old_orders)
+
+    monkeypatch.undo()
+    assert order_archive.archive_orders() == len(old_orders)
+    assert cursor.execute('SELECT COUNT(*) FROM finished_orders').fetchone()[0] == 0
+    archived_ids = []
+    for path in list_archives(order_archive.archive_dir):
+        conn = sqlite3.connect(path)
+        archived_ids += [row[0] for row in conn.execute('SELECT id FROM finished_orders')]
+        assert conn.execute('SELECT COUNT(*) FROM order_details').fetchone()[0] == 1
+        conn.close()
+    assert sorted(archived_ids) == old_orders
@@ -0,0 +1,34 @@
+import gc
+
+import pytest
+
+import assets
+
+
+class FakeRoot:
+    """
+    Stands in for a Tk root, which is its own root.
+    """
+    def _root(self):
+        return self
+
+
+def test_registry_is_shared_by_the_widgets_of_a_root():
+    root = FakeRoot()
+    assert assets.get_assets(root) is assets.get_assets(root)
+
+
+def test_registry_does_not_keep_its_root_alive():
+    root = FakeRoot()
+    registry = assets.get_assets(root)
+    del root
+    gc.collect()
+    assert len(assets._registries) == 0
+    with pytest.raises(RuntimeError):
+        registry.get("logo")
+
+
+def test_unknown_asset_raises():
+    root = FakeRoot()
+    with pytest.raises(ValueError):
+        assets.get_assets(root).get("missing")
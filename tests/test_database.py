@@ -0,0 +1,71 @@
+import logging
+import sqlite3
+import threading
+
+import pytest
+
+from database import ConnectionPool
+
+
+def test_acquire_returns_the_same_connection_to_a_thread(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "test.db"), size=2)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is second
+    pool.release(second)
+    pool.release(first)
+    assert pool.stats()["in_use"] == 0
+    assert pool.stats()["idle"] == 1
+    pool.close_all()
+
+
+def test_acquire_times_out_when_the_pool_is_full(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "test.db"), size=1, timeout=0.05)
+    held = threading.Event()
+    done = threading.Event()
+
+    def hold():
+        conn = pool.acquire()
+        held.set()
+        done.wait(5)
+        pool.release(conn)
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    held.wait(5)
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+    done.set()
+    worker.join()
+    conn = pool.acquire()
+    pool.release(conn)
+    pool.close_all()
+
+
+def test_release_from_another_thread_is_logged(tmp_path, caplog):
+    pool = ConnectionPool(str(tmp_path / "test.db"), size=2)
+    conn = pool.acquire()
+    worker = threading.Thread(target=pool.release, args=(conn,))
+    with caplog.at_level(logging.WARNING, logger="crazy_pizza.database"):
+        worker.start()
+        worker.join()
+    assert "does not hold it" in caplog.text
+    assert pool.stats()["in_use"] == 1
+    pool.release(conn)
+    pool.close_all()
+
+
+def test_close_all_closes_borrowed_connections(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "test.db"), size=2)
+    conn = pool.acquire()
+    pool.close_all()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    # The late release of the closed connection is ignored and the thread gets a new one
+    pool.release(conn)
+    new_conn = pool.acquire()
+    assert new_conn is not conn
+    assert new_conn.execute("SELECT 1").fetchone() == (1,)
+    pool.release(new_conn)
+    pool.close_all()
+    assert pool.stats()["open"] == 0
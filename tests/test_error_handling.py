@@ -0,0 +1,47 @@
+import logging
+
+import pytest
+
+import error_handling
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(record.getMessage())
+
+
+@pytest.fixture
+def handler():
+    handler = ListHandler()
+    error_handling.configure_logging("DEBUG", 1.0, handler)
+    yield handler
+    error_handling.stop_logging()
+    # Gives the application logger back to pytest's log capture
+    app_logger = error_handling.logger
+    for queue_handler in list(app_logger.handlers):
+        app_logger.removeHandler(queue_handler)
+    app_logger.setLevel(logging.NOTSET)
+    app_logger.propagate = True
+
+
+def test_arguments_are_logged_as_they_were_at_the_call(handler):
+    rows = [(1, "Margherita")]
+    error_handling.get_logger("test").info("Active orders: %s", rows)
+    rows.append((2, "Diavola"))
+    error_handling.stop_logging()
+    assert handler.lines == ["Active orders: [(1, 'Margherita')]"]
+
+
+def test_sampled_out_debug_records_are_not_formatted(handler):
+    class Unformattable:
+        def __str__(self):
+            raise AssertionError("formatted")
+
+    error_handling.configure_logging("DEBUG", 0.0, handler)
+    error_handling.get_logger("test").debug("Order: %s", Unformattable())
+    error_handling.stop_logging()
+    assert handler.lines == []
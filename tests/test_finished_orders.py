@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+
+from orders import FinishedOrders, epoch_bounds
+
+
+@pytest.fixture
+def finished_orders(active_orders, take_orders):
+    """
+    Finishes seven orders, one per table, taken on the first seven days of March 2024.
+    """
+    order_ids = take_orders(7)
+    for day, order_id in enumerate(order_ids, start=1):
+        active_orders.finished_order(order_id)
+        taken_at = int(datetime(2024, 3, day, 12).timestamp())
+        active_orders.cursor.execute('UPDATE finished_orders SET order_taken_at=? WHERE id=?', (taken_at, order_id))
+    active_orders.conn.commit()
+    finished_orders = FinishedOrders()
+    yield finished_orders, order_ids
+    finished_orders.close_connection()
+
+
+def page_ids(page):
+    return [order[0] for order in page]
+
+
+def test_pages_walk_every_order_newest_first(finished_orders):
+    finished_orders, order_ids = finished_orders
+    pages, before_id = [], None
+    while True:
+        page = finished_orders.get_finished_orders_page(before_id, limit=3)
+        if not page:
+            break
+        pages.append(page_ids(page))
+        before_id = page[-1][0]
+    assert pages == [order_ids[:3:-1], order_ids[3:0:-1], order_ids[:1]]
+
+
+def test_page_rows_match_the_full_listing(finished_orders):
+    finished_orders, _ = finished_orders
+    assert finished_orders.get_finished_orders_page() == sorted(finished_orders.get_finished_orders(), reverse=True)
+
+
+def test_pages_filter_by_date_range_and_table(finished_orders):
+    finished_orders, order_ids = finished_orders
+    page = finished_orders.get_finished_orders_page(start='2024-03-02', end='2024-03-04')
+    assert page_ids(page) == order_ids[3:0:-1]
+    page = finished_orders.get_finished_orders_page(table_no=5)
+    assert page_ids(page) == [order_ids[4]]
+    page = finished_orders.get_finished_orders_page(before_id=order_ids[2], start='2024-03-02')
+    assert page_ids(page) == [order_ids[1]]
+
+
+def test_epoch_bounds_cover_whole_days():
+    start_at, end_at = epoch_bounds('2024-03-01', '2024-03-01')
+    assert end_at - start_at == 24 * 3600 - 1
+    assert epoch_bounds() == (None, None)
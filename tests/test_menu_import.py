@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from products import MenuRepository, export_menu, import_menu, read_menu_file, validate_menu_rows
+
+
+@pytest.fixture
+def repository(pool):
+    MenuRepository._instance = None
+    yield MenuRepository.get_instance()
+    MenuRepository._instance = None
+
+
+def test_validate_accepts_type_names_and_numbers():
+    rows = [{"type": "pizza", "name": " Margherita ", "price": "9.5", "ingredients": "tomato"},
+            {"type": 2, "name": "Cola", "price": 2, "ingredients": None}]
+    assert validate_menu_rows(rows) == [(0, "Margherita", 9.5, "tomato"), (2, "Cola", 2.0, "")]
+
+
+@pytest.mark.parametrize("row, message", [
+    ({"type": "Dessert", "name": "Tiramisu", "price": "5"}, "unknown product type"),
+    ({"type": "Pizza", "name": " ", "price": "5"}, "missing product name"),
+    ({"type": "Pizza", "name": "Diavola", "price": "cheap"}, "invalid price"),
+    ({"type": "Pizza", "name": "Diavola", "price": "-1"}, "invalid price"),
+])
+def test_validate_rejects_bad_rows(row, message):
+    with pytest.raises(ValueError, match=message):
+        validate_menu_rows([row])
+
+
+def test_validate_rejects_duplicates_and_reports_every_bad_row():
+    rows = [{"type": "Pizza", "name": "Diavola", "price": "9"}] * 2 + [{"type": "Pie", "name": "x", "price": "1"}]
+    with pytest.raises(ValueError) as error:
+        validate_menu_rows(rows)
+    assert "row 2: duplicate product 'Diavola'" in str(error.value)
+    assert "row 3: unknown product type 'Pie'" in str(error.value)
+
+
+def test_read_csv_with_byte_order_mark(tmp_path):
+    path = tmp_path / "menu.csv"
+    path.write_bytes("type,name,price,ingredients\r\nPizza,Jalapeño,11,peppers\r\n".encode("utf-8-sig"))
+    assert read_menu_file(str(path)) == [{"type": "Pizza", "name": "Jalapeño", "price": "11",
+                                          "ingredients": "peppers"}]
+
+
+def test_read_json_must_hold_a_list_of_objects(tmp_path):
+    path = tmp_path / "menu.json"
+    path.write_text(json.dumps({"type": "Pizza"}), encoding="utf-8")
+    with pytest.raises(ValueError):
+        read_menu_file(str(path))
+
+
+def test_unsupported_format_raises(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported menu file format"):
+        read_menu_file(str(tmp_path / "menu.xlsx"))
+
+
+def test_import_adds_then_updates_products(tmp_path, repository):
+    path = tmp_path / "menu.csv"
+    path.write_text("type,name,price,ingredients\nPizza,Margherita,9,tomato\nDrink,Cola,2,\n", encoding="utf-8")
+    assert import_menu(str(path)) == (2, 0)
+    path.write_text("type,name,price,ingredients\nPizza,Margherita,10,tomato\nPizza,Diavola,11,salami\n",
+                    encoding="utf-8")
+    assert import_menu(str(path)) == (1, 1)
+    assert [(product[1], product[0], product[2], product[3]) for product in repository.list_products(0)] == [
+        (0, 1, "Margherita", 10.0), (0, 2, "Diavola", 11.0)]
+
+
+def test_invalid_file_changes_nothing(tmp_path, repository):
+    path = tmp_path / "menu.csv"
+    path.write_text("type,name,price,ingredients\nPizza,Margherita,9,tomato\nPizza,Diavola,free,\n",
+                    encoding="utf-8")
+    with pytest.raises(ValueError):
+        import_menu(str(path))
+    assert repository.list_products(0) == []
+
+
+@pytest.mark.parametrize("extension", [".csv", ".json"])
+def test_export_reads_back(tmp_path, repository, extension):
+    source = tmp_path / "menu.json"
+    source.write_text(json.dumps([{"type": "Snack", "name": "Fries", "price": 3.5, "ingredients": "potato"},
+                                  {"type": "Pizza", "name": "Margherita", "price": 9, "ingredients": "tomato"}]),
+                      encoding="utf-8")
+    import_menu(str(source))
+    exported = tmp_path / f"export{extension}"
+    assert export_menu(str(exported)) == 2
+    assert validate_menu_rows(read_menu_file(str(exported))) == [(0, "Margherita", 9.0, "tomato"),
+                                                                 (1, "Fries", 3.5, "potato")]
@@ -0,0 +1,43 @@
+import sqlite3
+
+import pytest
+
+from products import MenuRepository, Pizza, MENU_VERSION
+from schema import bump_data_version
+
+
+@pytest.fixture
+def repository(pool):
+    MenuRepository._instance = None
+    yield MenuRepository.get_instance()
+    MenuRepository._instance = None
+
+
+def add_from_another_terminal(db_path, name):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute('UPDATE product_sequences SET last_id = last_id + 1 WHERE type=0')
+    cursor.execute('''INSERT INTO products (type, id, name, price, ingredients)
+                      VALUES (0, (SELECT last_id FROM product_sequences WHERE type=0), ?, 10, 'cheese')''', (name,))
+    bump_data_version(cursor, MENU_VERSION)
+    conn.commit()
+    conn.close()
+
+
+def test_catalog_is_reloaded_after_a_local_change(repository):
+    assert repository.list_products(0) == []
+    Pizza().add_product("Margherita", 9.5, "tomato, mozzarella")
+    assert [product[2] for product in repository.list_products(0)] == ["Margherita"]
+
+
+def test_catalog_is_reloaded_after_a_change_from_another_connection(repository, pool):
+    assert repository.list_products(0) == []
+    add_from_another_terminal(pool.db_path, "Diavola")
+    assert repository.select_product(0, "Diavola") is not None
+    assert [product[2] for product in repository.search("diav")] == ["Diavola"]
+
+
+def test_catalog_is_kept_while_the_menu_version_is_unchanged(repository):
+    Pizza().add_product("Margherita", 9.5, "tomato, mozzarella")
+    catalog = repository._get_catalog()
+    assert repository._get_catalog() is catalog
@@ -0,0 +1,55 @@
+from menu_search import MenuSearchIndex, deletes, normalize, tokenize
+
+PRODUCTS = [
+    (1, 0, "Margherita", 9.0, "tomato, mozzarella, basil"),
+    (2, 0, "Diavola", 11.0, "tomato, mozzarella, spicy salami"),
+    (3, 0, "Jalapeño Special", 12.0, "tomato, jalapeño, onion"),
+    (1, 1, "Garlic Bread", 4.0, "bread, garlic, butter"),
+    (1, 2, "Tomato Juice", 3.0, "tomato"),
+]
+
+
+def names(results):
+    return [product[2] for product in results]
+
+
+def test_normalize_and_tokenize_drop_case_and_accents():
+    assert normalize("JALAPEÑO") == "jalapeno"
+    assert tokenize("Spicy-Salami, Jalapeño!") == ["spicy", "salami", "jalapeno"]
+    assert tokenize(None) == []
+
+
+def test_deletes_holds_every_one_character_deletion():
+    assert deletes("abc") == {"abc", "bc", "ac", "ab"}
+
+
+def test_prefix_matches_for_type_ahead():
+    index = MenuSearchIndex(PRODUCTS)
+    assert names(index.search("marg")) == ["Margherita"]
+    assert names(index.search("jalap")) == ["Jalapeño Special"]
+
+
+def test_name_matches_rank_above_ingredient_matches():
+    index = MenuSearchIndex(PRODUCTS)
+    assert names(index.search("tomato"))[0] == "Tomato Juice"
+    assert names(index.search("garlic")) == ["Garlic Bread"]
+
+
+def test_every_term_must_match():
+    index = MenuSearchIndex(PRODUCTS)
+    assert names(index.search("tomato salami")) == ["Diavola"]
+    assert index.search("tomato chocolate") == []
+
+
+def test_one_typo_matches_longer_terms_only():
+    index = MenuSearchIndex(PRODUCTS)
+    assert names(index.search("margerita")) == ["Margherita"]
+    assert names(index.search("diavla")) == ["Diavola"]
+    assert index.search("bsl") == []
+
+
+def test_product_type_filter_and_limit():
+    index = MenuSearchIndex(PRODUCTS)
+    assert names(index.search("tomato", product_type=2)) == ["Tomato Juice"]
+    assert len(index.search("tomato", limit=2)) == 2
+    assert index.search("   ") == []
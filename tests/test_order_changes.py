@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+
+from schema import prune_order_changes
+
+
+def test_get_changes_returns_added_and_removed_orders(active_orders, take_orders):
+    cursor = active_orders.get_change_cursor()
+    first_id, second_id = take_orders(2)
+    cursor, added, removed = active_orders.get_changes(cursor)
+    assert [order[0] for order in added] == [first_id, second_id]
+    assert removed == []
+
+    active_orders.finished_order(first_id)
+    cursor, added, removed = active_orders.get_changes(cursor)
+    assert added == []
+    assert removed == [first_id]
+    assert active_orders.get_changes(cursor) == (cursor, [], [])
+
+
+def test_prune_keeps_recent_changes(active_orders, take_orders):
+    take_orders(3)
+    assert prune_order_changes(active_orders.conn) == 0
+    assert active_orders.cursor.execute('SELECT COUNT(*) FROM order_changes').fetchone()[0] == 3
+
+
+def test_prune_deletes_old_changes_but_keeps_the_latest(active_orders, take_orders):
+    take_orders(3)
+    latest = active_orders.get_change_cursor()
+    assert prune_order_changes(active_orders.conn, now=datetime.now() + timedelta(days=2)) == 2
+    assert active_orders.cursor.execute('SELECT id FROM order_changes').fetchall() == [(latest,)]
+    assert active_orders.get_change_cursor() == latest
+
+
+def test_cursor_older_than_the_pruned_feed_gets_every_active_order(active_orders, take_orders):
+    order_ids = take_orders(3)
+    active_orders.finished_order(order_ids[0])
+    prune_order_changes(active_orders.conn, now=datetime.now() + timedelta(days=2))
+    cursor, added, removed = active_orders.get_changes(0)
+    assert cursor == active_orders.get_change_cursor()
+    assert [order[0] for order in added] == order_ids[1:]
+    assert removed is None
+    assert active_orders.get_changes(cursor) == (cursor, [], [])
@@ -0,0 +1,33 @@
+import pytest
+
+from profiling import Histogram, HISTOGRAM_BOUNDS_MS
+
+
+def test_empty_histogram():
+    histogram = Histogram()
+    assert histogram.count == 0
+    assert histogram.percentile(0.5) == 0.0
+
+
+def test_percentiles_are_bucket_upper_bounds():
+    histogram = Histogram()
+    for elapsed_ms in [0.05] * 50 + [3] * 40 + [40] * 9 + [400]:
+        histogram.add(elapsed_ms)
+    assert histogram.percentile(0.5) == 0.1
+    assert histogram.percentile(0.9) == 5
+    assert histogram.percentile(0.99) == 50
+    assert histogram.percentile(1.0) == 400
+
+
+def test_percentile_is_capped_by_the_slowest_call():
+    histogram = Histogram()
+    histogram.add(1.2)
+    assert histogram.percentile(0.5) == 1.2
+
+
+def test_slow_calls_land_in_the_last_bucket():
+    histogram = Histogram()
+    histogram.add(HISTOGRAM_BOUNDS_MS[-1] * 4)
+    assert histogram.buckets[-1] == 1
+    assert histogram.percentile(0.99) == HISTOGRAM_BOUNDS_MS[-1] * 4
+    assert histogram.min == histogram.max == pytest.approx(HISTOGRAM_BOUNDS_MS[-1] * 4)
@@ -0,0 +1,37 @@
+from orders import rebuild_daily_sales_rollup, rebuild_product_sales_rollup
+
+
+def rollup_rows(cursor, table_name):
+    return cursor.execute(f'SELECT * FROM {table_name} ORDER BY 1, 2, 3').fetchall()
+
+
+def test_finished_orders_update_the_daily_rollup_like_a_rebuild(active_orders, take_orders):
+    for order_id in take_orders(3):
+        active_orders.finished_order(order_id)
+    cursor = active_orders.cursor
+    incremental = rollup_rows(cursor, 'daily_sales_rollup')
+    assert [(row[2], row[3]) for row in incremental] == [(3, 30.0)]
+    rebuild_daily_sales_rollup(cursor)
+    assert rollup_rows(cursor, 'daily_sales_rollup') == incremental
+
+
+def test_active_orders_stay_out_of_the_daily_rollup(active_orders, take_orders):
+    take_orders(2)
+    assert rollup_rows(active_orders.cursor, 'daily_sales_rollup') == []
+
+
+def test_finished_orders_update_the_product_rollup_like_a_rebuild(active_orders, take_orders):
+    for order_id in take_orders(3):
+        active_orders.finished_order(order_id)
+    cursor = active_orders.cursor
+    incremental = rollup_rows(cursor, 'product_sales_rollup')
+    assert [(row[4], row[5], row[6]) for row in incremental] == [("Margherita", 3, 30.0)]
+    rebuild_product_sales_rollup(cursor)
+    assert rollup_rows(cursor, 'product_sales_rollup') == incremental
+
+
+def test_product_rollup_keeps_the_price_paid(active_orders, take_orders):
+    order_id, = take_orders(1)
+    active_orders.cursor.execute("UPDATE products SET price = 99 WHERE name = 'Margherita'")
+    active_orders.finished_order(order_id)
+    assert active_orders.cursor.execute('SELECT revenue FROM product_sales_rollup').fetchall() == [(10.0,)]
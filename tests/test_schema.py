@@ -0,0 +1,80 @@
+import sqlite3
+
+import pytest
+
+from schema import MIGRATIONS, migrate, schema_version, table_exists
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """
+    Returns a connection to a database created by the release before the schema migrations, with a few rows.
+    """
+    conn = sqlite3.connect(str(tmp_path / "baseline.db"))
+    cursor = conn.cursor()
+    for table_name, product_type in (('pizzas', 0), ('snacks', 1), ('drinks', 2)):
+        cursor.execute(f'''CREATE TABLE {table_name} (id INTEGER PRIMARY KEY AUTOINCREMENT, type INTEGER NOT NULL,
+                           name VARCHAR(200) NOT NULL, price REAL NOT NULL, ingredients TEXT)''')
+        cursor.execute(f'INSERT INTO {table_name} (type, name, price, ingredients) VALUES (?, ?, ?, ?)',
+                       (product_type, f"{table_name} 1", 5.0 + product_type, "something"))
+    cursor.execute('''CREATE TABLE temp_customers (id INTEGER PRIMARY KEY AUTOINCREMENT, table_no TINYINT NOT NULL,
+                      first_name VARCHAR(100), last_name VARCHAR(100))''')
+    cursor.execute('''CREATE TABLE order_details (id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER,
+                      item_id INTEGER, item_type INTEGER, item_name VARCHAR(200), quantity INTEGER)''')
+    for table_name in ('active_orders', 'finished_orders', 'canceled_orders'):
+        cursor.execute(f'''CREATE TABLE {table_name} (id INTEGER PRIMARY KEY AUTOINCREMENT, temp_customer_id INTEGER,
+                           customer_id INTEGER, total_price REAL NOT NULL, order_taken_date DATETIME NOT NULL,
+                           order_taken_hour DATETIME NOT NULL, order_prepared_hour DATETIME)''')
+    cursor.execute("INSERT INTO temp_customers (table_no, first_name, last_name) VALUES (1, 'Guest', 'One')")
+    # The second order is prepared after midnight
+    cursor.executemany('''INSERT INTO finished_orders (id, temp_customer_id, total_price, order_taken_date,
+                          order_taken_hour, order_prepared_hour) VALUES (?, 1, ?, ?, ?, ?)''',
+                       [(1, 10.0, '2024-03-01', '12:00:00', '12:20:00'),
+                        (2, 5.0, '2024-03-01', '23:50:00', '00:10:00')])
+    cursor.executemany('''INSERT INTO order_details (order_id, item_id, item_type, item_name, quantity)
+                          VALUES (?, 1, 0, 'pizzas 1', ?)''', [(1, 2), (2, 1)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def column_names(conn, table_name):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table_name})')]
+
+
+def test_migrate_applies_every_migration_once(baseline_db):
+    assert migrate(baseline_db) == [version for version, _, _ in MIGRATIONS]
+    assert schema_version(baseline_db) == MIGRATIONS[-1][0]
+    assert migrate(baseline_db) == []
+
+
+def test_legacy_product_tables_move_into_products(baseline_db):
+    migrate(baseline_db)
+    assert baseline_db.execute('SELECT type, id, name, price FROM products ORDER BY type').fetchall() == [
+        (0, 1, 'pizzas 1', 5.0), (1, 1, 'snacks 1', 6.0), (2, 1, 'drinks 1', 7.0)]
+    # The legacy names stay readable
+    assert baseline_db.execute('SELECT name FROM pizzas').fetchall() == [('pizzas 1',)]
+
+
+def test_order_timestamps_are_filled_from_the_date_and_hour_strings(baseline_db):
+    migrate(baseline_db)
+    rows = baseline_db.execute('''SELECT order_prepared_at - order_taken_at FROM finished_orders
+                                  ORDER BY id''').fetchall()
+    assert rows == [(20 * 60,), (20 * 60,)]
+    assert 'order_cancelled_at' not in column_names(baseline_db, 'finished_orders')
+
+
+def test_sales_rollups_are_built_from_the_existing_orders(baseline_db):
+    migrate(baseline_db)
+    assert baseline_db.execute('SELECT order_count, total_sales FROM daily_sales_rollup').fetchall() == [(2, 15.0)]
+    assert baseline_db.execute('SELECT item_name, units, revenue FROM product_sales_rollup').fetchall() == [
+        ('pizzas 1', 3, 15.0)]
+    assert baseline_db.execute('SELECT unit_price FROM order_details').fetchall() == [(5.0,), (5.0,)]
+
+
+def test_migrate_creates_an_empty_database(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "empty.db"))
+    migrate(conn)
+    for table_name in ('customers', 'products', 'order_changes', 'data_versions', 'product_sales_rollup'):
+        assert table_exists(conn.cursor(), table_name)
+    conn.close()
@@ -0,0 +1,142 @@
+import pytest
+
+import table_view
+from table_view import TableView
+
+
+class FakeTree:
+    """
+    Stands in for a ttk.Treeview: keeps the item ids in display order and collects the after_idle callbacks.
+    """
+    def __init__(self, parent, **options):
+        self.order = []
+        self.values = {}
+        self.idle_callbacks = []
+        self.calls = {"insert": 0, "delete": 0, "item": 0}
+
+    def __setitem__(self, key, value):
+        pass
+
+    def column(self, column, **options):
+        pass
+
+    def heading(self, column, **options):
+        pass
+
+    def insert(self, parent, index, iid, values):
+        assert iid not in self.values
+        self.calls["insert"] += 1
+        self.order.insert(len(self.order) if index == "end" else index, iid)
+        self.values[iid] = values
+
+    def delete(self, *item_ids):
+        self.calls["delete"] += 1
+        for item_id in item_ids:
+            self.order.remove(item_id)
+            del self.values[item_id]
+
+    def item(self, item_id, values):
+        self.calls["item"] += 1
+        self.values[item_id] = values
+
+    def index(self, item_id):
+        return self.order.index(item_id)
+
+    def exists(self, item_id):
+        return item_id in self.values
+
+    def prev(self, item_id):
+        position = self.order.index(item_id)
+        return self.order[position - 1] if position else ""
+
+    def after_idle(self, callback):
+        self.idle_callbacks.append(callback)
+        return len(self.idle_callbacks)
+
+    def winfo_exists(self):
+        return True
+
+    def run_idle(self):
+        while self.idle_callbacks:
+            self.idle_callbacks.pop(0)()
+
+
+@pytest.fixture
+def table(monkeypatch):
+    monkeypatch.setattr(table_view.ttk, "Treeview", FakeTree)
+    return TableView(None, ("ID", "Name"), chunk_size=2)
+
+
+def rows(*ids):
+    return [(item_id, f"row {item_id}") for item_id in ids]
+
+
+def shown(table):
+    return [int(item_id) for item_id in table.tree.order]
+
+
+def test_rows_are_inserted_in_chunks_from_idle_callbacks(table):
+    table.set_rows(rows(1, 2, 3, 4, 5))
+    assert shown(table) == []
+    assert len(table) == 5
+    table.tree.idle_callbacks.pop(0)()
+    assert shown(table) == [1, 2]
+    table.tree.run_idle()
+    assert shown(table) == [1, 2, 3, 4, 5]
+
+
+def test_refresh_only_touches_changed_rows(table):
+    table.set_rows(rows(1, 2, 3))
+    table.flush()
+    table.tree.calls.update(insert=0, delete=0, item=0)
+    table.set_rows([(1, "row 1"), (2, "changed"), (4, "row 4")])
+    table.flush()
+    assert shown(table) == [1, 2, 4]
+    assert table.tree.values["2"] == (2, "changed")
+    assert table.tree.calls == {"insert": 1, "delete": 1, "item": 1}
+
+
+def test_new_rows_keep_their_place_between_kept_rows(table):
+    table.set_rows(rows(1, 4))
+    table.flush()
+    table.set_rows(rows(0, 1, 2, 3, 4, 5))
+    table.flush()
+    assert shown(table) == [0, 1, 2, 3, 4, 5]
+
+
+def test_apply_changes_and_full_refresh(table):
+    table.set_rows(rows(1, 2, 3))
+    table.flush()
+    table.apply_changes(rows(4), [2])
+    table.flush()
+    assert shown(table) == [1, 3, 4]
+    table.apply_changes(rows(3, 5), None)
+    table.flush()
+    assert shown(table) == [3, 5]
+
+
+def test_removed_pending_predecessor_is_replaced_by_its_own_predecessor(table):
+    table.set_rows(rows(1, 5))
+    table.flush()
+    table.set_rows(rows(1, 2, 3, 4, 5))
+    table.remove_rows(["2"])
+    table.flush()
+    assert shown(table) == [1, 3, 4, 5]
+
+
+def test_removed_shown_predecessor_is_replaced_by_its_own_predecessor(table):
+    table.set_rows(rows(1, 2, 5))
+    table.flush()
+    table.set_rows(rows(1, 2, 3, 4, 5))
+    table.remove_rows(["2"])
+    table.flush()
+    assert shown(table) == [1, 3, 4, 5]
+
+
+def test_clear_drops_pending_rows(table):
+    table.set_rows(rows(1, 2, 3))
+    table.tree.idle_callbacks.pop(0)()
+    table.clear()
+    table.tree.run_idle()
+    assert shown(table) == []
+    assert len(table) == 0